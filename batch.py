@@ -0,0 +1,161 @@
+"""Headless batch reports for every hub in one or more arrival CSVs.
+
+Usage: python batch.py ARRIVALS.csv|DIR [-o reports] [--jobs 8] [--mode manual]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from calibration import model_params
+from gantt import (OCCUPANCY_RESOLUTIONS, OPERATION_COLORS, build_schedule, map_vehicle_types, schedule_time_table,
+                   unknown_vehicle_types)
+from profiling import StageTimer
+from timeline import create_horizon_gantt, horizon_bounds, horizon_occupancy
+
+def find_csvs(paths):
+    """CSV files named directly or found (non-recursively) in the given directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(".csv")))
+        else:
+            files.append(path)
+    return files
+
+def hub_dirname(hub):
+    """Filesystem-safe directory name for a hub code"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(hub)) or "_"
+
+def process_hub(hub, df, output_dir, operation_mode="manual", num_workers=1, resolution=60, base_date=None,
+                profile=False):
+    """Write one hub's time table, workload timeline and Gantt; return its summary row.
+
+    Arrivals with only a clock time are placed on base_date (default today).
+    With profile the row's "Profile" holds the hub's per-stage timings.
+    """
+    timer = StageTimer(profile, hub=str(hub))
+    params, calibration = model_params(hub)
+    timer.lap("Cost model lookup")
+    schedule = build_schedule(df, operation_mode, num_workers, params=params)
+    timer.lap("Time calculation", rows=len(df))
+    hub_dir = os.path.join(output_dir, hub_dirname(hub))
+    os.makedirs(hub_dir, exist_ok=True)
+
+    schedule_time_table(schedule, num_workers).to_csv(os.path.join(hub_dir, "time_table.csv"), index=False)
+    timer.lap("Time table", rows=len(schedule))
+    occupancy = horizon_occupancy(schedule, resolution, base_date)
+    occupancy["timeline"].to_csv(os.path.join(hub_dir, "workload.csv"))
+    timer.lap("Workload", rows=len(occupancy["timeline"]))
+    horizon_start, horizon_end = horizon_bounds(schedule, base_date)
+    fig = create_horizon_gantt(
+        schedule, horizon_start, horizon_end,
+        title=f"Vehicle Loading/Unloading Schedule ({operation_mode.title()}) - {hub}",
+        colors=OPERATION_COLORS, base_date=base_date
+    )
+    if fig is not None:
+        timer.lap("Gantt build", figure=fig)
+        fig.write_html(os.path.join(hub_dir, "gantt.html"), include_plotlyjs="cdn")
+        timer.lap("Gantt write")
+
+    row = {
+        "Hub Code": hub,
+        "Vehicles": len(df),
+        "Scheduled": len(schedule),
+        "Skipped Arrivals": len(schedule.attrs["malformed_arrivals"]),
+        "Unmapped Types": "; ".join(f"{t} ({n})" for t, n in schedule.attrs["unmapped_types"].items()),
+        "Busy Hours": round(float(schedule["hours"].sum()), 2),
+        "Peak Vehicles": occupancy["peak"],
+        "Peak Time": f"{occupancy['peak_at']:%Y-%m-%d %H:%M}",
+        "Cost Model": "notebook" if calibration is None else f"{calibration['scope']} v{calibration['version']}",
+    }
+    if profile:
+        row["Profile"] = timer.records()
+    return row
+
+def run_batch(paths, output_dir, operation_mode="manual", num_workers=1, resolution=60, jobs=None,
+              log=print, base_date=None, profile=False):
+    """Process every hub found in `paths` on a process pool and write a summary.csv.
+
+    Returns the summary DataFrame, one row per hub; hubs that fail are
+    reported through `log` and listed with their error. With profile every
+    hub's stage timings are written to profile.jsonl, one JSON record per
+    hub and stage, and the slowest stages over all hubs are logged.
+    """
+    files = find_csvs(paths)
+    if not files:
+        raise FileNotFoundError(f"no CSV files found in {', '.join(paths)}")
+    df = pd.concat([pd.read_csv(path) for path in files], ignore_index=True)
+    hubs = list(df.groupby('Hub Code', sort=False))
+    os.makedirs(output_dir, exist_ok=True)
+    log(f"{len(df):,} arrivals across {len(hubs)} hub(s) from {len(files)} file(s)")
+    unmapped = unknown_vehicle_types(map_vehicle_types(df["Vehicle Type"]), df["Vehicle Type"])
+    if unmapped:
+        log("Vehicle types without a cost model, skipped: "
+            + ", ".join(f"{vehicle_type} ({count} rows)" for vehicle_type, count in unmapped.items()))
+
+    started = time.perf_counter()
+    rows = []
+    profiles = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(process_hub, hub, hub_df, output_dir, operation_mode, num_workers, resolution,
+                        base_date, profile): hub
+            for hub, hub_df in hubs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            hub = futures[future]
+            try:
+                row = future.result()
+                profiles.extend(row.pop("Profile", []))
+                log(f"[{done}/{len(hubs)}] {hub}: {row['Scheduled']} vehicles, "
+                    f"peak {row['Peak Vehicles']} at {row['Peak Time']}")
+            except Exception as e:
+                row = {"Hub Code": hub, "Error": str(e)}
+                log(f"[{done}/{len(hubs)}] {hub}: failed - {e}")
+            rows.append(row)
+
+    summary = pd.DataFrame(rows).sort_values("Hub Code", key=lambda s: s.astype(str)).reset_index(drop=True)
+    summary.to_csv(os.path.join(output_dir, "summary.csv"), index=False)
+    if profile:
+        with open(os.path.join(output_dir, "profile.jsonl"), "w") as f:
+            f.writelines(json.dumps(record) + "\n" for record in profiles)
+        if profiles:
+            timings = pd.DataFrame(profiles)
+            slowest = timings.loc[timings.groupby("stage", sort=False)["seconds"].idxmax()].set_index("stage")
+            totals = timings.groupby("stage", sort=False)["seconds"].sum().sort_values(ascending=False)
+            for stage, seconds in totals.items():
+                log(f"{stage}: {seconds:.2f}s over all hubs, slowest {slowest.at[stage, 'hub']} "
+                    f"({slowest.at[stage, 'seconds']:.2f}s)")
+    log(f"Done in {time.perf_counter() - started:.1f}s; reports in {output_dir}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write loading/unloading reports for every hub.")
+    parser.add_argument("inputs", nargs="+", help="arrival CSV file(s) or directories of them")
+    parser.add_argument("-o", "--output-dir", default="reports", help="where to write reports (default: reports)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--mode", choices=["manual", "machine"], default="manual", help="operation mode")
+    parser.add_argument("--workers", type=int, default=1, help="workers per vehicle (default: 1)")
+    parser.add_argument("--resolution", choices=list(OCCUPANCY_RESOLUTIONS), default="1 hour",
+                        help="workload timeline bin width (default: '1 hour')")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every stage of every hub into profile.jsonl")
+    parser.add_argument("--date", type=pd.Timestamp, default=None,
+                        help="day to place arrivals that only have a clock time on (default: today)")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.inputs, args.output_dir, args.mode, args.workers,
+                        OCCUPANCY_RESOLUTIONS[args.resolution], args.jobs, base_date=args.date,
+                        profile=args.profile)
+    return 1 if "Error" in summary.columns else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
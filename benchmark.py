@@ -0,0 +1,245 @@
+"""Benchmarks of the scheduling hot paths on synthetic arrival files.
+
+Usage: python benchmark.py [--rows 1k,10k,100k] [--stages build_schedule,...] [--repeat 3] [-o benchmarks]
+
+Every stage is timed on synthetic arrivals of each size (median and best of
+--repeat runs, and rows per second) and its peak traced memory measured in
+one more run. Results are appended to benchmarks/results.jsonl tagged with
+the git commit, and each stage is compared with the previous run of the
+same stage and size, so regressions between versions show up.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from gantt import (build_schedule, calculate_hourly_workload, compute_operation_times, compute_times,
+                   create_time_based_gantt_chart, map_vehicle_types, parse_arrival_minutes, parse_time,
+                   schedule_time_table, staff_schedule)
+from incremental import IncrementalSchedule
+from ingest import read_arrival_chunks
+from network import network_overview
+from synthetic import generate_arrivals, parse_rows, write_arrivals
+from timeline import GANTT_WINDOWS, create_horizon_gantt, horizon_bounds, horizon_occupancy
+
+BENCHMARK_DIR = os.environ.get("BENCHMARK_DIR", "benchmarks")
+RESULTS_FILE = "results.jsonl"
+DEFAULT_ROWS = "1k,10k,100k"
+# Stages that loop over rows in Python are only timed up to this size
+SCALAR_MAX_ROWS = 100_000
+# A stage whose median time grew by more than this share since the last run is flagged
+REGRESSION_THRESHOLD = 0.10
+# ...and by more than this many seconds, so millisecond timer noise is not flagged
+MIN_REGRESSION_SECONDS = 0.005
+
+def _largest_hub(data):
+    return data["df"][data["df"]["Hub Code"] == data["df"]["Hub Code"].value_counts().index[0]]
+
+def _app_hub_pipeline(data):
+    """What main() computes for one hub: schedule, table, first Gantt window and workload"""
+    hub_df = _largest_hub(data)
+    def run():
+        schedule = staff_schedule(build_schedule(hub_df), 1)
+        schedule_time_table(schedule, 1)
+        start, _ = horizon_bounds(schedule)
+        create_horizon_gantt(schedule, start, start + GANTT_WINDOWS["1 day"], title="benchmark")
+        horizon_occupancy(schedule, 60)
+    return run
+
+def _incremental_update(data):
+    """Re-upload of the largest hub with 1% of its rows replaced, alternating with the original"""
+    hub_df = _largest_hub(data)
+    edit = max(1, len(hub_df) // 100)
+    replacement = generate_arrivals(edit, hubs=1, seed=1).assign(**{"Hub Code": hub_df["Hub Code"].iloc[0]})
+    edited = pd.concat([hub_df.iloc[edit:], replacement], ignore_index=True)
+    uploads = itertools.cycle([edited, hub_df.reset_index(drop=True)])
+    schedule = IncrementalSchedule(hub_df.reset_index(drop=True))
+    return lambda: schedule.update(next(uploads))
+
+# name: (what is timed, prepare(data) -> zero-argument callable, loops over rows in Python, reads the CSV file)
+STAGES = {
+    "parse_time": ("legacy per-row time parsing",
+                   lambda data: lambda: [parse_time(t) for t in data["df"]["Arrival Time"]], True, False),
+    "compute_times_scalar": ("per-vehicle scalar cost model",
+                             lambda data: lambda: [compute_times(t) for t in data["mapped"]], True, False),
+    "parse_arrival_minutes": ("vectorized time parsing",
+                              lambda data: lambda: parse_arrival_minutes(data["df"]["Arrival Time"], True),
+                              False, False),
+    "compute_operation_times": ("vectorized cost model",
+                                lambda data: lambda: compute_operation_times(data["mapped"], data["df"]["Type"]),
+                                False, False),
+    "read_arrival_chunks": ("chunked CSV read",
+                            lambda data: lambda: sum(len(c) for c in read_arrival_chunks(data["path"])), False, True),
+    "build_schedule": ("whole-file schedule", lambda data: lambda: build_schedule(data["df"]), False, False),
+    "horizon_occupancy": ("multi-day occupancy", lambda data: lambda: horizon_occupancy(data["schedule"], 60),
+                          False, False),
+    "calculate_hourly_workload": ("legacy hourly workload",
+                                  lambda data: lambda: calculate_hourly_workload(data["df"], "loading", "manual"),
+                                  False, False),
+    "create_time_based_gantt_chart": ("legacy Gantt figure",
+                                      lambda data: lambda: create_time_based_gantt_chart(data["df"], "loading",
+                                                                                         "manual"), False, False),
+    "network_overview": ("every hub's totals and hourly occupancy from CSV",
+                         lambda data: lambda: network_overview(data["path"]), False, True),
+    "app_hub_pipeline": ("app views of the largest hub", _app_hub_pipeline, False, False),
+    "incremental_update": ("1% edit of the largest hub re-uploaded", _incremental_update, False, False),
+}
+
+def git_version(cwd=None):
+    """Short commit of the working tree, with '-dirty' for uncommitted changes; None outside git"""
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cwd, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def measure(fn, repeat=3, memory=True):
+    """Median and best wall time of repeat calls, and peak traced memory (MB) of one more call.
+
+    tracemalloc sees NumPy and Python allocations; buffers pyarrow allocates
+    itself are not counted. The memory run is first, which also warms caches
+    for the timed runs.
+    """
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    times = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return {"median_s": statistics.median(times), "best_s": min(times), "peak_mb": peak_mb}
+
+def benchmark_data(rows, workdir, days=1, seed=0, need_file=True):
+    """Synthetic arrivals of one size and what the stages are prepared from"""
+    df = generate_arrivals(rows, days=days, seed=seed)
+    data = {"df": df, "mapped": np.asarray(map_vehicle_types(df["Vehicle Type"]), dtype=object)}
+    data["schedule"] = build_schedule(df)
+    if need_file:
+        data["path"] = write_arrivals(os.path.join(workdir, f"arrivals-{rows}.csv"), rows, days=days, seed=seed)
+    return data
+
+def run_benchmarks(sizes, stages=None, repeat=3, memory=True, days=1, seed=0, log=print):
+    """Time every stage at every size; returns one result dict per (stage, size).
+
+    Stages that loop over rows in Python are skipped above SCALAR_MAX_ROWS.
+    """
+    stages = list(stages or STAGES)
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+    need_file = any(STAGES[name][3] for name in stages)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in sizes:
+            started = time.perf_counter()
+            data = benchmark_data(rows, workdir, days, seed, need_file)
+            log(f"{rows:,} rows: generated in {time.perf_counter() - started:.1f}s")
+            for name in stages:
+                description, prepare, scalar, _ = STAGES[name]
+                if scalar and rows > SCALAR_MAX_ROWS:
+                    log(f"  {name}: skipped above {SCALAR_MAX_ROWS:,} rows")
+                    continue
+                result = {"stage": name, "rows": rows, "repeat": repeat, **measure(prepare(data), repeat, memory)}
+                result["rows_per_s"] = rows / result["median_s"] if result["median_s"] > 0 else None
+                memory_note = "" if result["peak_mb"] is None else f", peak {result['peak_mb']:,.1f} MB"
+                log(f"  {name} ({description}): {result['median_s'] * 1000:,.1f} ms median{memory_note}")
+                results.append(result)
+            del data
+    return results
+
+def load_results(root=BENCHMARK_DIR):
+    """Every stored result, oldest first, as a DataFrame"""
+    path = os.path.join(root, RESULTS_FILE)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+def save_results(results, root=BENCHMARK_DIR, label=None):
+    """Append a run's results, tagged with its run id, version and environment; returns the run id"""
+    os.makedirs(root, exist_ok=True)
+    run = datetime.now().isoformat(timespec="milliseconds")
+    environment = {
+        "run": run,
+        "label": label,
+        "version": git_version(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    with open(os.path.join(root, RESULTS_FILE), "a") as f:
+        for result in results:
+            f.write(json.dumps({**environment, **result}) + "\n")
+    return run
+
+def compare_with_previous(history, run, threshold=REGRESSION_THRESHOLD):
+    """Each stage and size of a run next to the most recent earlier run that timed it.
+
+    "Change" is the relative change in median time; rows slower by more
+    than threshold (and MIN_REGRESSION_SECONDS) are marked as regressions.
+    """
+    current = history[history["run"] == run]
+    earlier = history[history["run"] < run].drop_duplicates(["stage", "rows"], keep="last")
+    table = current.merge(earlier[["stage", "rows", "run", "version", "median_s"]], on=["stage", "rows"],
+                          how="left", suffixes=("", "_previous"))
+    table["Change"] = table["median_s"] / table["median_s_previous"] - 1
+    table["Regression"] = ((table["Change"] > threshold)
+                           & (table["median_s"] - table["median_s_previous"] > MIN_REGRESSION_SECONDS))
+    return table[["stage", "rows", "median_s", "peak_mb", "version_previous", "median_s_previous", "Change",
+                  "Regression"]]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scheduling hot paths on synthetic arrivals.")
+    parser.add_argument("--rows", default=DEFAULT_ROWS,
+                        help=f"comma-separated sizes, e.g. 1k,100k,10M (default: {DEFAULT_ROWS})")
+    parser.add_argument("--stages", default=None, help=f"comma-separated stages (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (default: 3)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--days", type=int, default=1, help="days of arrivals in the synthetic files (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic files (default: 0)")
+    parser.add_argument("--label", default=None, help="name stored with this run, e.g. a release")
+    parser.add_argument("-o", "--output-dir", default=BENCHMARK_DIR,
+                        help=f"where results are kept (default: {BENCHMARK_DIR})")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help=f"slowdown counted as a regression (default: {REGRESSION_THRESHOLD:.0%})")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with 1 if any stage regressed")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_rows(size) for size in args.rows.split(",") if size.strip()]
+    stages = [name.strip() for name in args.stages.split(",")] if args.stages else None
+    results = run_benchmarks(sizes, stages, args.repeat, not args.no_memory, args.days, args.seed)
+    run = save_results(results, args.output_dir, args.label)
+
+    comparison = compare_with_previous(load_results(args.output_dir), run, args.threshold)
+    print(comparison.to_string(index=False, float_format=lambda x: f"{x:,.4g}"))
+    regressions = comparison[comparison["Regression"]]
+    for row in regressions.itertuples():
+        print(f"Regression: {row.stage} at {row.rows:,} rows is {row.Change:.0%} slower than {row.version_previous}")
+    print(f"Results appended to {os.path.join(args.output_dir, RESULTS_FILE)}")
+    return 1 if args.fail_on_regression and len(regressions) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""Calibration of the cost model parameters against benchmark or observed durations.
+
+Usage: python calibration.py [OBSERVED.csv] [--per-hub] [--starts 16] [--jobs 8] [-o calibrations]
+
+Without a file the parameters are refitted to the notebook's benchmark
+durations. Each fit is saved as the next version of its scope (the network,
+or one hub), and the app and batch reports load the latest version.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from gantt import FATIGUE_THRESHOLDS, OPTIMIZED_PARAMS, VEHICLES, lower_labels, map_vehicle_types
+
+PARAM_NAMES = ["f1", "f2", "f3", "f4", "alpha", "tturn", "v_walk", "v_load", "d_load", "d_unld"]
+# Search box and starting point of the notebook's L-BFGS-B fit
+PARAM_BOUNDS = {
+    "f1": (1.0, 2.0), "f2": (1.0, 2.0), "f3": (1.0, 2.0), "f4": (1.0, 2.0),
+    "alpha": (0.3, 1.0), "tturn": (0.5, 5.0),
+    "v_walk": (0.5, 2.0), "v_load": (0.3, 1.5),
+    "d_load": (5.0, 20.0), "d_unld": (5.0, 20.0)
+}
+INITIAL_PARAMS = {
+    "f1": 1.1, "f2": 1.2, "f3": 1.3, "f4": 1.4,
+    "alpha": 0.6, "tturn": 2.0,
+    "v_walk": 0.9, "v_load": 0.67,
+    "d_load": 13.8, "d_unld": 10.21
+}
+
+# Benchmark manual durations (hours) the notebook fitted against
+BENCHMARK_LOADING = {
+    "50 ft ODC Trailer / Container": 24,
+    "32 ft Container MXL": 15,
+    "32 ft Container SXL": 9,
+    "24 ft Box/Container Truck": 9,
+    "Tata 22 ft Container": 6.125,
+    "Eicher 19 ft": 4.5,
+    "Eicher 17 ft": 2.8125,
+    "Eicher 14 ft (LCV)": 2.1875,
+    "Tata 407 / Dost Bada": 1.875,
+    "Mahindra Bolero Pickup": 0.825,
+    "Tata Ace / Dost": 0.525
+}
+BENCHMARK_UNLOADING = {
+    "50 ft ODC Trailer / Container": 19.5,
+    "32 ft Container MXL": 12.5,
+    "32 ft Container SXL": 7,
+    "24 ft Box/Container Truck": 7,
+    "Tata 22 ft Container": 4.8125,
+    "Eicher 19 ft": 3.75,
+    "Eicher 17 ft": 2.1875,
+    "Eicher 14 ft (LCV)": 1.625,
+    "Tata 407 / Dost Bada": 1.375,
+    "Mahindra Bolero Pickup": 0.6,
+    "Tata Ace / Dost": 0.3
+}
+
+CALIBRATION_DIR = os.environ.get("CALIBRATION_DIR", "calibrations")
+NETWORK_SCOPE = "network"
+DURATION_COLUMN = "Duration (hours)"
+DEFAULT_STARTS = 16
+DEFAULT_CHUNKSIZE = 250_000
+# Hubs with fewer usable observations keep the network calibration
+MIN_HUB_OBSERVATIONS = 50
+
+VEHICLE_LENGTHS = np.array([v["L"] for v in VEHICLES], dtype=float)
+VEHICLE_PARCELS = np.array([v["parcels"] for v in VEHICLES], dtype=float)
+FEET_TO_METRES = 0.3048
+
+# --- LOSS STATISTICS ---
+def empty_stats():
+    """Loss statistics of no observations; cells are (vehicle type, operation, fatigue tier)"""
+    shape = (len(VEHICLES), 2, len(FATIGUE_THRESHOLDS) + 1)
+    return {"count": np.zeros(shape), "sum_ratio": np.zeros(shape), "sum_ratio_sq": np.zeros(shape)}
+
+def add_stats(total, stats):
+    """Accumulate stats into total in place"""
+    for key in total:
+        total[key] += stats[key]
+    return total
+
+def observation_stats(vehicle_types, operations, durations, parcels=None, groups=None, n_groups=1):
+    """Reduce observed manual durations to sufficient statistics of the loss.
+
+    The model predicts n * g hours for a row with n parcels, where g only
+    depends on the vehicle type, operation and fatigue tier. The squared
+    relative error (n * g / observed - 1)^2 summed over one such cell is
+    g^2 * S2 - 2 * g * S1 + count, with S1 and S2 the sums of n / observed
+    and its square, so any number of rows reduces to three small arrays.
+
+    groups (ints in [0, n_groups), -1 to drop) splits the rows, e.g. by hub.
+    Rows with an unknown vehicle type or operation, or a duration that is
+    not positive, are dropped. Returns (list of n_groups stats, dropped).
+    """
+    mapped = map_vehicle_types(vehicle_types)
+    type_index = pd.Index([v["type"] for v in VEHICLES]).get_indexer(mapped.categories)
+    types = np.append(type_index, -1)[mapped.codes]
+    ops = lower_labels(operations)
+    op_index = np.where(ops == "loading", 0, np.where(ops == "unloading", 1, -1))
+    durations = pd.to_numeric(pd.Series(np.asarray(durations)), errors="coerce").to_numpy(dtype=float)
+
+    n = VEHICLE_PARCELS[np.maximum(types, 0)]
+    if parcels is not None:
+        custom = pd.to_numeric(pd.Series(np.asarray(parcels)), errors="coerce").to_numpy(dtype=float)
+        n = np.where(np.isnan(custom), n, custom)
+    tiers = np.minimum(np.searchsorted(FATIGUE_THRESHOLDS, n, side="left"), len(FATIGUE_THRESHOLDS))
+    groups = np.zeros(len(types), dtype=np.int64) if groups is None else np.asarray(groups)
+
+    ok = (types >= 0) & (op_index >= 0) & (durations > 0) & np.isfinite(durations) & (groups >= 0)
+    ok &= np.isfinite(n) & (n >= 0)
+    shape = empty_stats()["count"].shape
+    cells = np.ravel_multi_index((groups[ok], types[ok], op_index[ok], tiers[ok]), (n_groups,) + shape)
+    ratio = n[ok] / durations[ok]
+    size = n_groups * int(np.prod(shape))
+    sums = {
+        "count": np.bincount(cells, minlength=size),
+        "sum_ratio": np.bincount(cells, weights=ratio, minlength=size),
+        "sum_ratio_sq": np.bincount(cells, weights=ratio * ratio, minlength=size),
+    }
+    sums = {key: value.astype(float).reshape((n_groups,) + shape) for key, value in sums.items()}
+    return [{key: value[g] for key, value in sums.items()} for g in range(n_groups)], int(np.sum(~ok))
+
+def benchmark_stats():
+    """Loss statistics of the notebook benchmarks, each type loaded and unloaded with its default parcels"""
+    types = [v["type"] for v in VEHICLES]
+    durations = [BENCHMARK_LOADING[t] for t in types] + [BENCHMARK_UNLOADING[t] for t in types]
+    (stats,), _ = observation_stats(types * 2, ["Loading"] * len(types) + ["Unloading"] * len(types), durations)
+    return stats
+
+def read_observation_stats(source, per_hub=False, duration_column=DURATION_COLUMN, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream a CSV of observed durations into loss statistics.
+
+    Needs 'Vehicle Type', 'Type' and duration_column (hours of manual work
+    by one worker); 'Parcels' is used when present and 'Hub Code' when
+    per_hub. Returns ({scope: stats}, dropped rows), where the scopes are hub
+    codes when per_hub and NETWORK_SCOPE otherwise.
+    """
+    wanted = {"Vehicle Type", "Type", "Parcels", "Hub Code", duration_column}
+    reader = pd.read_csv(
+        source,
+        usecols=lambda column: column in wanted,
+        dtype={"Vehicle Type": "category", "Type": "category", "Hub Code": "category"},
+        chunksize=chunksize,
+    )
+    required = {"Vehicle Type", "Type", duration_column} | ({"Hub Code"} if per_hub else set())
+    totals = {}
+    dropped = 0
+    with reader:
+        for chunk in reader:
+            missing = required - set(chunk.columns)
+            if missing:
+                raise ValueError(f"observations need columns {sorted(missing)}")
+            if per_hub:
+                groups, scopes = pd.factorize(chunk["Hub Code"])
+            else:
+                groups, scopes = None, [NETWORK_SCOPE]
+            stats, skipped = observation_stats(
+                chunk["Vehicle Type"], chunk["Type"], chunk[duration_column],
+                chunk["Parcels"] if "Parcels" in chunk.columns else None,
+                groups, len(scopes)
+            )
+            dropped += skipped
+            for scope, scope_stats in zip(scopes, stats):
+                add_stats(totals.setdefault(str(scope), empty_stats()), scope_stats)
+    return totals, dropped
+
+# --- LOSS AND FIT ---
+def loss_and_gradient(theta, stats):
+    """Mean squared relative error of the manual-mode model and its gradient.
+
+    theta holds the parameters in PARAM_NAMES order. The loss is evaluated
+    per cell from the statistics, so its cost does not depend on how many
+    observations they summarise; the gradient is the analytic chain rule
+    through g = fm * (walk + delay + tturn) / 3600.
+    """
+    theta = np.asarray(theta, dtype=float)
+    fatigue = theta[:4]
+    alpha, tturn, v_walk, v_load, d_load, d_unld = theta[4:]
+    count, s1, s2 = stats["count"], stats["sum_ratio"], stats["sum_ratio_sq"]
+    total = count.sum()
+
+    length = FEET_TO_METRES * VEHICLE_LENGTHS[:, None, None]
+    pace = 1 / v_walk + 1 / v_load
+    seconds = length * alpha * pace + np.array([d_load, d_unld])[None, :, None] + tturn  # per parcel
+    rate = fatigue[None, None, :] * seconds / 3600  # hours per parcel, g above
+
+    loss = np.sum(rate * rate * s2 - 2 * rate * s1 + count) / total
+    d_rate = 2 * (rate * s2 - s1) / total
+    d_seconds = d_rate * fatigue[None, None, :] / 3600
+    gradient = np.concatenate([
+        np.sum(d_rate * seconds / 3600, axis=(0, 1)),
+        [
+            np.sum(d_seconds * length * pace),
+            np.sum(d_seconds),
+            -np.sum(d_seconds * length * alpha) / v_walk ** 2,
+            -np.sum(d_seconds * length * alpha) / v_load ** 2,
+            np.sum(d_seconds[:, 0, :]),
+            np.sum(d_seconds[:, 1, :]),
+        ],
+    ])
+    return float(loss), gradient
+
+def start_points(starts=DEFAULT_STARTS, seed=0):
+    """The notebook's initial guess, the current parameters, then uniform draws inside the bounds"""
+    low, high = np.array([PARAM_BOUNDS[name] for name in PARAM_NAMES]).T
+    fixed = np.array([[INITIAL_PARAMS[name] for name in PARAM_NAMES],
+                      [OPTIMIZED_PARAMS[name] for name in PARAM_NAMES]])
+    drawn = np.random.default_rng(seed).uniform(low, high, size=(max(starts - len(fixed), 0), len(PARAM_NAMES)))
+    return np.vstack([fixed, drawn])[:max(starts, 1)]
+
+def _fit_from(start, stats):
+    """One L-BFGS-B run; module-level so process pools can pickle it"""
+    from scipy.optimize import minimize  # only fitting needs scipy, not loading parameters
+
+    bounds = [PARAM_BOUNDS[name] for name in PARAM_NAMES]
+    result = minimize(loss_and_gradient, start, args=(stats,), jac=True, bounds=bounds, method="L-BFGS-B")
+    return result.x, float(result.fun)
+
+def calibrate_scopes(stats_by_scope, starts=DEFAULT_STARTS, jobs=None, seed=0):
+    """Multi-start fits of several scopes, every (scope, start) run on one process pool.
+
+    Returns {scope: {"params", "loss", "rms_error", "observations",
+    "starts"}} with the best run of each scope; rms_error is the root of
+    the loss, the typical relative error of a predicted duration.
+    """
+    for scope, stats in stats_by_scope.items():
+        if not stats["count"].sum():
+            raise ValueError(f"no usable observations to calibrate {scope} against")
+    points = start_points(starts, seed)
+    runs = [(scope, point) for scope in stats_by_scope for point in points]
+    if jobs == 1:
+        fits = [_fit_from(point, stats_by_scope[scope]) for scope, point in runs]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            fits = list(pool.map(_fit_from, [point for _, point in runs],
+                                 [stats_by_scope[scope] for scope, _ in runs], chunksize=max(1, len(points) // 4)))
+
+    results = {}
+    for (scope, _), (theta, loss) in zip(runs, fits):
+        if scope not in results or loss < results[scope]["loss"]:
+            results[scope] = {
+                "params": {name: round(float(value), 6) for name, value in zip(PARAM_NAMES, theta)},
+                "loss": loss,
+                "rms_error": float(np.sqrt(loss)),
+                "observations": int(stats_by_scope[scope]["count"].sum()),
+                "starts": len(points),
+            }
+    return results
+
+def calibrate(stats, starts=DEFAULT_STARTS, jobs=None, seed=0):
+    """Multi-start fit of one set of statistics; see calibrate_scopes"""
+    return calibrate_scopes({NETWORK_SCOPE: stats}, starts, jobs, seed)[NETWORK_SCOPE]
+
+# --- VERSIONED PARAMETER SETS ---
+def _scope_prefix(scope):
+    scope = NETWORK_SCOPE if scope is None else str(scope)
+    return NETWORK_SCOPE if scope == NETWORK_SCOPE else f"hub={quote(scope, safe='')}"
+
+def list_versions(scope=None, root=CALIBRATION_DIR):
+    """Saved version numbers of a scope (None for the network), oldest first"""
+    if not os.path.isdir(root):
+        return []
+    pattern = re.compile(rf"^{re.escape(_scope_prefix(scope))}-v(\d+)\.json$")
+    return sorted(int(m.group(1)) for m in map(pattern.match, os.listdir(root)) if m)
+
+def save_params(result, scope=None, root=CALIBRATION_DIR, source=None):
+    """Save a calibration result as the next version of its scope and return the record"""
+    os.makedirs(root, exist_ok=True)
+    version = (list_versions(scope, root) or [0])[-1] + 1
+    record = {
+        "scope": NETWORK_SCOPE if scope is None else str(scope),
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        **result,
+    }
+    path = os.path.join(root, f"{_scope_prefix(scope)}-v{version:04d}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return record
+
+def load_params(scope=None, version=None, root=CALIBRATION_DIR):
+    """A saved calibration record (the latest version by default), or None if there is none"""
+    versions = list_versions(scope, root)
+    if version is None and versions:
+        version = versions[-1]
+    if version not in versions:
+        return None
+    with open(os.path.join(root, f"{_scope_prefix(scope)}-v{version:04d}.json")) as f:
+        return json.load(f)
+
+def model_params(hub=None, root=CALIBRATION_DIR):
+    """Parameters to cost a hub with, and the calibration record they came from.
+
+    The hub's latest calibration wins, then the network's; with neither the
+    notebook's OPTIMIZED_PARAMS are used and the record is None.
+    """
+    record = (load_params(hub, root=root) if hub is not None else None) or load_params(root=root)
+    if record is None:
+        return OPTIMIZED_PARAMS, None
+    return {name: float(record["params"][name]) for name in PARAM_NAMES}, record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the loading/unloading cost model.")
+    parser.add_argument("observations", nargs="?",
+                        help=f"CSV of observed manual durations in '{DURATION_COLUMN}' "
+                             "(default: refit to the notebook benchmarks)")
+    parser.add_argument("--per-hub", action="store_true", help="calibrate every hub separately")
+    parser.add_argument("--duration-column", default=DURATION_COLUMN, help="column of observed hours")
+    parser.add_argument("--min-observations", type=int, default=MIN_HUB_OBSERVATIONS,
+                        help=f"skip hubs with fewer usable rows (default: {MIN_HUB_OBSERVATIONS})")
+    parser.add_argument("--starts", type=int, default=DEFAULT_STARTS,
+                        help=f"optimizer starting points per scope (default: {DEFAULT_STARTS})")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random starting points")
+    parser.add_argument("-o", "--output-dir", default=CALIBRATION_DIR,
+                        help=f"where parameter versions are kept (default: {CALIBRATION_DIR})")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.observations is None:
+        stats_by_scope = {NETWORK_SCOPE: benchmark_stats()}
+        source = "notebook benchmarks"
+    else:
+        stats_by_scope, dropped = read_observation_stats(args.observations, args.per_hub, args.duration_column)
+        source = os.path.basename(args.observations)
+        print(f"Read {sum(int(s['count'].sum()) for s in stats_by_scope.values()):,} observations "
+              f"({dropped:,} unusable rows dropped)")
+        if args.per_hub:
+            for scope in [s for s, stats in stats_by_scope.items() if stats["count"].sum() < args.min_observations]:
+                print(f"{scope}: only {int(stats_by_scope.pop(scope)['count'].sum())} observations, skipped")
+    if not stats_by_scope:
+        print("Nothing to calibrate")
+        return 1
+
+    results = calibrate_scopes(stats_by_scope, args.starts, args.jobs, args.seed)
+    for scope, result in results.items():
+        record = save_params(result, None if scope == NETWORK_SCOPE else scope, args.output_dir, source)
+        print(f"{scope} v{record['version']}: RMS relative error {result['rms_error']:.1%} "
+              f"over {result['observations']:,} observations")
+    print(f"Done in {time.perf_counter() - started:.1f}s; parameters in {args.output_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Manual vs machine cost per vehicle, break-even job counts and hub savings"""
+import numpy as np
+import pandas as pd
+
+from gantt import MACHINE_BUFFER, build_schedule, compute_operation_times
+from ingest import DEFAULT_CHUNKSIZE, read_arrival_chunks
+
+# Cost assumptions from the notebook
+MANUAL_COST_PER_HOUR_PER_WORKER = 105  # INR per worker per hour
+MACHINE_COST = {
+    "capex": 1400000,  # INR
+    "opex_per_hour": 60,  # machine operation cost per hour
+    "life_years": 10,
+    "daily_hours": 15,  # usage per day
+    "days_per_month": 25
+}
+
+def machine_hourly_cost(machine_cost=MACHINE_COST):
+    """Capex amortized over the machine's working life per hour, plus opex"""
+    life_hours = machine_cost["life_years"] * 12 * machine_cost["days_per_month"] * machine_cost["daily_hours"]
+    return machine_cost["capex"] / life_hours + machine_cost["opex_per_hour"]
+
+def break_even_jobs(capex, margin):
+    """Jobs needed for per-job margins to pay back capex, NaN where the margin is not positive.
+
+    Closed form of the first n with n * margin >= capex, i.e. the notebook's
+    scan over np.arange(0, 20001) without its 20,000-job horizon.
+    """
+    margin = np.asarray(margin, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(margin > 0, np.ceil(capex / np.where(margin > 0, margin, 1.0)), np.nan)
+
+def _cost_columns(schedule, num_workers, wage, machine_cost, params, machine_buffer):
+    """COST_TOTALS and the per-job columns of vehicle_costs, as arrays"""
+    mapped, operations, parcels = schedule["mapped_type"], schedule["operation"], schedule["parcels"]
+    manual_hours = compute_operation_times(mapped, operations, "manual", parcels, params)
+    machine_hours = compute_operation_times(mapped, operations, "machine", parcels, params, machine_buffer)
+    machine_clock = machine_hours / num_workers
+
+    manual_cost = manual_hours * wage
+    machine_cost_per_job = machine_hours * wage + machine_clock * machine_hourly_cost(machine_cost)
+    return {
+        "Manual Time (h/job)": manual_hours / num_workers,
+        "Machine Time (h/job)": machine_clock,
+        "Time Saved (h)": (manual_hours - machine_hours) / num_workers,
+        "Manual Cost (₹)": manual_cost,
+        "Machine Cost (₹)": machine_cost_per_job,
+        "Saving (₹)": manual_cost - machine_cost_per_job,
+        "Opex Margin (₹)": manual_cost - (machine_hours * wage + machine_clock * machine_cost["opex_per_hour"]),
+    }
+
+def vehicle_costs(schedule, num_workers=1, wage=MANUAL_COST_PER_HOUR_PER_WORKER, machine_cost=MACHINE_COST,
+                  params=None, machine_buffer=MACHINE_BUFFER):
+    """Manual and machine cost of every vehicle in a schedule, in one vectorized pass.
+
+    Both modes are costed from the schedule's mapped types, operations and
+    parcels, whichever mode it was built for. A crew of num_workers is paid
+    wage per worker-hour either way, and the machine also costs its
+    amortized hourly rate for the crew's wall-clock time. The break-even is
+    counted as in the notebook, with capex paid up front and only opex
+    charged per job.
+    """
+    columns = _cost_columns(schedule, num_workers, wage, machine_cost, params, machine_buffer)
+    costs = pd.DataFrame({
+        "vehicle": schedule["vehicle"].to_numpy(),
+        "vehicle_type": schedule["vehicle_type"].to_numpy(),
+        "mapped_type": schedule["mapped_type"].to_numpy(),
+        "operation": schedule["operation"].to_numpy(),
+        **columns,
+    })
+    costs["Break-even Jobs"] = break_even_jobs(machine_cost["capex"], columns["Opex Margin (₹)"])
+    return costs
+
+COST_TOTALS = ["Manual Cost (₹)", "Machine Cost (₹)", "Saving (₹)", "Opex Margin (₹)", "Time Saved (h)"]
+
+def summarize_costs(totals, vehicles, machine_cost=MACHINE_COST):
+    """Add break-even and payback columns to per-hub cost totals.
+
+    totals holds the summed COST_TOTALS of each hub's vehicles. A hub's
+    break-even is counted in jobs of its own vehicle mix, and its payback in
+    days, taking its schedule as one day of arrivals.
+    """
+    summary = totals.copy()
+    summary.insert(0, "Vehicles", vehicles)
+    summary["Break-even Jobs"] = break_even_jobs(machine_cost["capex"], summary["Opex Margin (₹)"] / vehicles)
+    summary["Payback Days"] = break_even_jobs(machine_cost["capex"], summary["Opex Margin (₹)"])
+    return summary
+
+def hub_costs(costs, machine_cost=MACHINE_COST):
+    """One-row totals of a hub's vehicle_costs"""
+    totals = costs[COST_TOTALS].sum().to_frame().T
+    return summarize_costs(totals, len(costs), machine_cost).iloc[0]
+
+def network_costs(source, num_workers=1, wage=MANUAL_COST_PER_HOUR_PER_WORKER, machine_cost=MACHINE_COST,
+                  params=None, machine_buffer=MACHINE_BUFFER, hubs=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Cost totals of every hub in an arrival file, one row per hub.
+
+    The file is read in chunks and each chunk costed in one pass, so
+    hundreds of hubs cost no more than one pass over the rows. The totals
+    over all hubs are the column sums.
+    """
+    totals = {}
+    for chunk in read_arrival_chunks(source, hubs=hubs, chunksize=chunksize):
+        schedule = build_schedule(chunk, params=params)
+        columns = _cost_columns(schedule, num_workers, wage, machine_cost, params, machine_buffer)
+        hub_ids, chunk_hubs = pd.factorize(chunk["Hub Code"])
+        hub_ids = pd.Series(hub_ids, index=chunk.index).loc[schedule["vehicle"] - 1].to_numpy()
+        # factorize gives -1 for a blank Hub Code; those rows count towards no hub
+        kept = hub_ids >= 0
+        hub_ids = hub_ids[kept]
+        # Only hubs x columns of sums are kept between chunks
+        sums = [np.bincount(hub_ids, minlength=len(chunk_hubs))]
+        sums += [np.bincount(hub_ids, weights=np.asarray(columns[name])[kept], minlength=len(chunk_hubs))
+                 for name in COST_TOTALS]
+        for k, hub in enumerate(chunk_hubs):
+            hub_totals = totals.setdefault(hub, np.zeros(len(sums)))
+            hub_totals += [column[k] for column in sums]
+
+    table = pd.DataFrame(list(totals.values()), columns=["Vehicles"] + COST_TOTALS,
+                         index=pd.Index(list(totals), name="Hub Code", dtype=object))
+    summary = summarize_costs(table[COST_TOTALS], table["Vehicles"].to_numpy(dtype=np.int64), machine_cost)
+    return summary.reset_index()
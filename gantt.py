@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.figure_factory as ff
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
+import bisect
+import hashlib
+import heapq
 import io
+import itertools
+
+from profiling import DISABLED, StageTimer
 
 # Vehicle data and benchmarks from the notebook
 VEHICLES = [
@@ -42,54 +47,169 @@ VEHICLE_MAPPING = {
 
 def compute_times(vehicle_type, operation_type="manual", custom_parcels=None):
     """Compute loading/unloading times for a vehicle type"""
-    # Find vehicle data
-    vehicle_data = None
-    for v in VEHICLES:
-        if v["type"] == vehicle_type:
-            vehicle_data = v
-            break
-    
-    if not vehicle_data:
+    # One vehicle is a dict lookup and a bisect into the compiled rate table, without compute_times_batch's
+    # per-call array setup
+    model = compile_cost_model()
+    code = model.type_codes.get(vehicle_type, -1)
+    if code < 0:
         return None
-    
-    # Use custom parcels if provided, otherwise use default
-    n = custom_parcels if custom_parcels is not None else vehicle_data['parcels']
-    L_ft = vehicle_data['L']
-    
-    # Fatigue multiplier
-    if n <= 100:
-        fm = OPTIMIZED_PARAMS["f1"]
-    elif n <= 200:
-        fm = OPTIMIZED_PARAMS["f2"]
-    elif n <= 300:
-        fm = OPTIMIZED_PARAMS["f3"]
-    else:
-        fm = OPTIMIZED_PARAMS["f4"]
-    
-    # Walking distance (m)
-    d = L_ft * 0.3048 * OPTIMIZED_PARAMS["alpha"]
-    
-    # Walking time (hr)
-    walk_hr = ((d / OPTIMIZED_PARAMS["v_walk"]) + (d / OPTIMIZED_PARAMS["v_load"])) * n * fm / 3600
-    
-    # Handling time (hr)
-    load_hr = (OPTIMIZED_PARAMS["d_load"] + OPTIMIZED_PARAMS["tturn"]) * n * fm / 3600
-    unld_hr = (OPTIMIZED_PARAMS["d_unld"] + OPTIMIZED_PARAMS["tturn"]) * n * fm / 3600
-    
-    # Machine times (hr) with 50% buffer
-    machL = load_hr * 1.5
-    machU = unld_hr * 1.5
-    
-    if operation_type == "manual":
-        return {
-            "loading": walk_hr + load_hr,
-            "unloading": walk_hr + unld_hr
-        }
-    else:  # machine
-        return {
-            "loading": machL,
-            "unloading": machU
-        }
+    try:
+        n = float(custom_parcels)
+    except (TypeError, ValueError):
+        n = np.nan
+    if np.isnan(n):
+        n = model.default_parcels[code]
+    tier = min(bisect.bisect_left(model.fatigue_bounds, n), len(model.fatigue_bounds))
+    mode = 0 if str(operation_type).lower() == "manual" else 1
+    rates = model.rate_table[code][mode]
+    return {operation: float(n * rates[k][tier]) for k, operation in enumerate(COST_OPERATIONS)}
+
+# Upper parcel bounds of the f1..f3 fatigue tiers; anything above uses f4
+FATIGUE_THRESHOLDS = np.array([100, 200, 300])
+# Machine handling takes 50% longer than the manual handling it replaces
+MACHINE_BUFFER = 1.5
+
+def lower_labels(values):
+    """Lower-case an array of labels, touching each distinct value only once"""
+    # Categorical columns factorize straight from their codes
+    codes, uniques = pd.factorize(values if isinstance(values, pd.Series) else np.ravel(values))
+    lowered = np.array([str(u).lower() for u in uniques] + [""], dtype=object)
+    # factorize marks missing values with -1, which picks the trailing ""
+    return lowered[codes]
+
+def map_vehicle_types(vehicle_types):
+    """Apply VEHICLE_MAPPING (unmapped names pass through) as a Categorical"""
+    codes, uniques = pd.factorize(vehicle_types if isinstance(vehicle_types, pd.Series)
+                                  else np.ravel(vehicle_types))
+    mapped = pd.Index([VEHICLE_MAPPING.get(u, u) for u in uniques], dtype=object)
+    categories = mapped.unique()
+    # A trailing -1 picks "missing" for factorize's -1, even when every value is missing
+    return pd.Categorical.from_codes(np.append(categories.get_indexer(mapped), -1)[codes], categories)
+
+# Axes of a CostModel's rate table besides vehicle type and fatigue tier
+COST_MODES = ["manual", "machine"]
+COST_OPERATIONS = ["loading", "unloading"]
+
+class CostModel:
+    """The cost model compiled for one parameter set and machine buffer.
+
+    Walking distance, speed terms and handling constants depend only on the
+    vehicle and the parameters, so hours per parcel are worked out once into
+    rates[type, mode, operation, fatigue tier]; a duration is then a gather
+    from that table times the parcel count. Vehicle types are addressed by
+    their position in VEHICLES (the `types` index), -1 for unknown ones.
+    """
+
+    def __init__(self, params=None, machine_buffer=MACHINE_BUFFER):
+        self.params = OPTIMIZED_PARAMS if params is None else params
+        self.machine_buffer = machine_buffer
+        self.types = pd.Index([v["type"] for v in VEHICLES])
+        self.default_parcels = np.array([v["parcels"] for v in VEHICLES], dtype=float)
+        # Plain-Python copies for costing one vehicle at a time (compute_times)
+        self.type_codes = {vehicle_type: k for k, vehicle_type in enumerate(self.types)}
+        self.fatigue_bounds = FATIGUE_THRESHOLDS.tolist()
+
+        p = self.params
+        d = np.array([v["L"] for v in VEHICLES], dtype=float) * 0.3048 * p["alpha"]
+        walk = d / p["v_walk"] + d / p["v_load"]
+        handling = np.array([p["d_load"], p["d_unld"]]) + p["tturn"]
+        seconds = np.stack([walk[:, None] + handling, np.broadcast_to(handling * machine_buffer, (len(d), 2))],
+                           axis=1)
+        fatigue = np.array([p["f1"], p["f2"], p["f3"], p["f4"]])
+        self.rates = seconds[..., None] * fatigue / 3600
+        self.rate_table = self.rates.tolist()
+
+    def vehicle_codes(self, vehicle_types):
+        """Code of each mapped vehicle type, looking each distinct name up once; -1 if unknown"""
+        codes, uniques = pd.factorize(vehicle_types if isinstance(vehicle_types, (pd.Series, pd.Categorical))
+                                      else np.ravel(vehicle_types))
+        return np.append(self.types.get_indexer(uniques), -1)[codes]
+
+    def hours(self, codes, operation_codes, mode_codes, parcels=None):
+        """Hours of each row; NaN where the type (code -1) or operation (-1) is unknown.
+
+        mode_codes and operation_codes index COST_MODES and COST_OPERATIONS and
+        may be scalars; NaN parcels fall back to the vehicle's default count.
+        """
+        codes = np.asarray(codes)
+        known = (codes >= 0) & (np.asarray(operation_codes) >= 0)
+        safe_codes = np.where(codes >= 0, codes, 0)
+        n = self.default_parcels[safe_codes]
+        if parcels is not None:
+            custom = pd.to_numeric(pd.Series(np.atleast_1d(parcels)), errors="coerce").to_numpy(dtype=float)
+            n = np.where(np.isnan(custom), n, custom)
+        # Fatigue tier: searchsorted maps n<=100 to f1, n<=200 to f2, ...
+        tiers = np.minimum(np.searchsorted(FATIGUE_THRESHOLDS, n, side="left"), len(FATIGUE_THRESHOLDS))
+        rate = self.rates[safe_codes, mode_codes, np.maximum(operation_codes, 0), tiers]
+        return np.where(known, n * rate, np.nan)
+
+def _model_key(params, machine_buffer):
+    return (None if params is None else tuple(sorted(params.items())), machine_buffer)
+
+# Parameter sets kept compiled; a calibration or sweep session only uses a handful
+COMPILED_MODELS_MAX = 32
+_compiled_models = {}
+
+def compile_cost_model(params=None, machine_buffer=MACHINE_BUFFER):
+    """The CostModel of a parameter set, compiled once per process and reused"""
+    key = _model_key(params, machine_buffer)
+    if key not in _compiled_models:
+        if len(_compiled_models) >= COMPILED_MODELS_MAX:
+            _compiled_models.clear()
+        _compiled_models[key] = CostModel(params, machine_buffer)
+    return _compiled_models[key]
+
+def label_codes(values, labels):
+    """Position of each value in a list of lower-case labels, ignoring case; -1 if absent.
+
+    Like lower_labels, each distinct value is looked up only once.
+    """
+    codes, uniques = pd.factorize(values if isinstance(values, (pd.Series, pd.Categorical)) else np.ravel(values))
+    positions = {label: k for k, label in enumerate(labels)}
+    lookup = np.array([positions.get(str(u).lower(), -1) for u in uniques] + [-1], dtype=np.int64)
+    return lookup[codes]
+
+def _mode_codes(operation_mode):
+    """COST_MODES index of one mode or of a mode per row (anything but manual is machine)"""
+    return np.where(label_codes(np.atleast_1d(operation_mode), ["manual"]) == 0, 0, 1)
+
+def unknown_vehicle_types(mapped_types, vehicle_types=None):
+    """Rows per vehicle type the cost model does not know, e.g. {"40'": 12}.
+
+    Counted by the file's own label when vehicle_types is given, else by the
+    mapped name, so a missing VEHICLE_MAPPING entry can be reported once.
+    """
+    unknown = compile_cost_model().vehicle_codes(mapped_types) < 0
+    labels = pd.Series(np.asarray(mapped_types if vehicle_types is None else vehicle_types, dtype=object)[unknown])
+    return {str(label): int(count) for label, count in labels.fillna("(missing)").value_counts().items()}
+
+def compute_times_batch(vehicle_types, operation_mode="manual", custom_parcels=None, params=None,
+                        machine_buffer=MACHINE_BUFFER):
+    """Vectorized compute_times over arrays of mapped vehicle types.
+
+    Returns {"loading": ndarray, "unloading": ndarray} in hours. Rows whose
+    vehicle type is not in VEHICLES come back as NaN, and NaN/None entries in
+    custom_parcels fall back to the vehicle's default parcel count.
+    operation_mode may be a single mode or one mode per row; machine times
+    are the handling time scaled by machine_buffer.
+    """
+    model = compile_cost_model(params, machine_buffer)
+    codes = model.vehicle_codes(vehicle_types)
+    modes = _mode_codes(operation_mode)
+    return {
+        operation: model.hours(codes, k, modes, custom_parcels)
+        for k, operation in enumerate(COST_OPERATIONS)
+    }
+
+def compute_operation_times(vehicle_types, operation_types, operation_mode="manual", custom_parcels=None, params=None,
+                            machine_buffer=MACHINE_BUFFER):
+    """Duration in hours of each row's own operation ('Loading' or 'Unloading').
+
+    NaN marks rows with an unknown vehicle type or operation.
+    """
+    model = compile_cost_model(params, machine_buffer)
+    operations = label_codes(operation_types, COST_OPERATIONS)
+    return model.hours(model.vehicle_codes(vehicle_types), operations, _mode_codes(operation_mode), custom_parcels)
 
 def parse_time(time_str):
     """Parse time string to datetime"""
@@ -98,225 +218,527 @@ def parse_time(time_str):
     except:
         return datetime.strptime(time_str, "%H:%M:%S")
 
-def create_gantt_chart(df, operation_type, operation_mode):
-    """Create Gantt chart from vehicle data"""
-    tasks = []
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', 
-              '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
-    
-    current_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    for idx, row in df.iterrows():
-        vehicle_type = row['Vehicle Type']
-        arrival_time = parse_time(row['Arrival Time'])
-        
-        # Map vehicle type to full name
-        mapped_type = VEHICLE_MAPPING.get(vehicle_type, vehicle_type)
-        
-        # Calculate operation time
-        times = compute_times(mapped_type, operation_mode)
-        if times is None:
-            continue
-            
-        operation_time = times[operation_type.lower()]
-        
-        # Convert to hours and minutes
-        hours = int(operation_time)
-        minutes = int((operation_time - hours) * 60)
-        
-        # Calculate start and end times
-        start_time = current_time + timedelta(hours=arrival_time.hour, minutes=arrival_time.minute)
-        end_time = start_time + timedelta(hours=hours, minutes=minutes)
-        
-        tasks.append(dict(
-            Task=f"Vehicle {idx+1} ({vehicle_type})",
-            Start=start_time,
-            Finish=end_time,
-            Resource=mapped_type
-        ))
-    
-    if not tasks:
+# H:MM or HH:MM:SS(.fff), the formats arrival exports normally use
+CLOCK_TIME_PATTERN = r"^\s*(\d{1,2}):(\d{2})(?::\d{2}(?:\.\d+)?)?\s*$"
+
+# A calendar date inside an arrival time: 2024-03-05, 05/03/2024, 05.03.2024 or a month name
+DATE_PART_PATTERN = (r"\d{1,4}[-/]\d{1,2}|\d{1,2}\.\d{1,2}\.\d{2,4}"
+                     r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b")
+
+def _in_timestamp_range(values):
+    """Mask of datetimes that fit pandas' nanosecond Timestamp range; NaT is out"""
+    return values.notna() & (values >= pd.Timestamp.min) & (values <= pd.Timestamp.max)
+
+def parse_arrival_minutes(values, with_dates=False):
+    """Parse a whole column of arrival times to minutes since midnight.
+
+    Accepts H:MM, HH:MM:SS and full date-times; seconds are dropped, as in
+    parse_time. Returns (minutes, malformed): an int64 array and a boolean
+    mask of entries that could not be parsed (their minutes are 0), so bad
+    rows can be reported together instead of failing the whole file.
+    with_dates adds a third array, the midnight of each full date-time's
+    day (datetime64[ns]), which is NaT for plain clock times.
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.where(_in_timestamp_range(values))
+        malformed = values.isna().to_numpy()
+        minutes = (values.dt.hour * 60 + values.dt.minute).fillna(0)
+        dates = values.dt.tz_localize(None) if values.dt.tz is not None else values
+        dates = dates.dt.normalize().to_numpy(dtype="datetime64[ns]")
+        result = minutes.to_numpy(dtype=np.int64), malformed
+        return result + (dates,) if with_dates else result
+
+    # A day has at most 86,400 distinct clock readings, so parse each once
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques).astype("string")
+    parts = text.str.extract(CLOCK_TIME_PATTERN)
+    hours = pd.to_numeric(parts[0])
+    mins = pd.to_numeric(parts[1])
+    minutes = (hours * 60 + mins).where((hours < 24) & (mins < 60))
+    dates = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+
+    # Anything that is not a plain clock time gets one pass of the datetime parser
+    other = minutes.isna() & text.notna() & parts[0].isna()
+    if other.any():
+        # pandas >= 2 infers one format from the first value unless told otherwise
+        kwargs = {"format": "mixed"} if int(pd.__version__.split(".")[0]) >= 2 else {}
+        parsed = pd.to_datetime(text[other], errors="coerce", **kwargs)
+        # Datetimes outside the nanosecond range (e.g. "9:5" read as year 1) are malformed
+        parsed = parsed.where(_in_timestamp_range(parsed))
+        minutes[other] = parsed.dt.hour * 60 + parsed.dt.minute
+        # Time-only text such as "10:00 PM" is given today's date by the parser; keep it undated
+        dated = parsed.notna() & text[other].str.contains(DATE_PART_PATTERN, case=False, regex=True)
+        dates[dated[dated].index] = parsed[dated].dt.normalize().astype("datetime64[ns]")
+
+    # factorize gives missing values code -1, which picks the trailing NaN
+    minutes = np.append(minutes.to_numpy(dtype=float), np.nan)[codes]
+    malformed = np.isnan(minutes)
+    result = np.where(malformed, 0, minutes).astype(np.int64), malformed
+    if not with_dates:
+        return result
+    return result + (np.append(dates.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))[codes],)
+
+def build_schedule(df, operation_mode="manual", num_workers=1, operation_type=None, params=None):
+    """Turn an arrival frame into the columnar schedule every view reads from.
+
+    Vehicle mapping, parcel defaults, time parsing and costing all happen here
+    once. operation_type overrides the per-row 'Type' column when given;
+    params replaces OPTIMIZED_PARAMS, e.g. with a calibrated set.
+    Rows whose vehicle type or operation cannot be costed are left out, as
+    the per-row loops used to skip them, and the unknown vehicle types are
+    counted in schedule.attrs["unmapped_types"] so they can be reported once;
+    rows with an unreadable arrival time are left out too and listed in
+    schedule.attrs["malformed_arrivals"].
+    arrival_date is the arrival day's midnight, from full date-times or an
+    optional 'Arrival Date' column, and NaT for plain clock times.
+    """
+    vehicle_types = df['Vehicle Type'].to_numpy(dtype=object)
+    mapped_types = map_vehicle_types(df['Vehicle Type'])
+    if operation_type is None:
+        operations = df['Type'].to_numpy(dtype=object)
+    else:
+        operations = np.full(len(df), operation_type, dtype=object)
+
+    # Get custom parcels if available in CSV
+    if 'Parcels' in df.columns:
+        parcels = pd.to_numeric(df['Parcels'], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    else:
+        parcels = np.full(len(df), np.nan)
+    model = compile_cost_model(params)
+    codes = model.vehicle_codes(mapped_types)
+    default_parcels = np.where(codes >= 0, model.default_parcels[codes], np.nan)
+
+    start_min, malformed, arrival_date = parse_arrival_minutes(df['Arrival Time'], with_dates=True)
+    if 'Arrival Date' in df.columns:
+        # A separate date column dates plain clock times; unreadable dates are malformed
+        given = df['Arrival Date'].notna().to_numpy()
+        dates = pd.to_datetime(df['Arrival Date'], errors="coerce").dt.normalize().to_numpy(dtype="datetime64[ns]")
+        malformed |= given & np.isnat(dates)
+        arrival_date = np.where(np.isnat(arrival_date), dates, arrival_date)
+
+    base_hours = compute_operation_times(mapped_types, operations, operation_mode, parcels, params)
+    mapped_types = np.asarray(mapped_types, dtype=object)
+
+    schedule = pd.DataFrame({
+        "vehicle": np.asarray(df.index) + 1,
+        "arrival_time": df['Arrival Time'].to_numpy(dtype=object),
+        "vehicle_type": vehicle_types,
+        "mapped_type": mapped_types,
+        "operation": operations,
+        "parcels": parcels,
+        "default_parcels": default_parcels,
+        "base_hours": base_hours,
+        "start_min": start_min,
+        "arrival_date": arrival_date,
+    })
+    bad_rows = schedule.loc[malformed, ["vehicle", "arrival_time"]]
+    schedule = schedule[~np.isnan(base_hours) & ~malformed].reset_index(drop=True)
+    # Unreadable arrival times are skipped and reported together
+    schedule.attrs["malformed_arrivals"] = bad_rows.rename(
+        columns={"vehicle": "Vehicle", "arrival_time": "Arrival Time"}
+    ).to_dict("records")
+    schedule.attrs["unmapped_types"] = unknown_vehicle_types(mapped_types, vehicle_types)
+    return staff_schedule(schedule, num_workers)
+
+def staff_schedule(schedule, num_workers=1):
+    """Spread each schedule row's base duration over num_workers.
+
+    Fills in hours, end_min (absolute minutes, may run past midnight) and the
+    wraps flag, which marks rows whose end clock time falls before their start.
+    """
+    schedule = schedule.copy()
+    schedule["hours"] = schedule["base_hours"] / num_workers
+    schedule["end_min"] = np.floor(schedule["start_min"] + schedule["hours"] * 60).astype(np.int64)
+    schedule["wraps"] = (schedule["end_min"] % 1440) < schedule["start_min"]
+    return schedule
+
+def schedule_time_table(schedule, num_workers=1):
+    """Time calculations table shown in the app"""
+    parcels_used = np.where(
+        np.isnan(schedule["parcels"]),
+        schedule["default_parcels"].map(lambda p: f"{p:g} (default)"),
+        schedule["parcels"].astype(object)
+    )
+    table = pd.DataFrame({
+        "Arrival Time": schedule["arrival_time"],
+        "Original Type": schedule["vehicle_type"],
+        "Mapped Type": schedule["mapped_type"],
+        "Operation": schedule["operation"],
+        "Parcels Used": parcels_used,
+    })
+    # One time column per operation, as each row only fills its own
+    for operation in pd.unique(schedule["operation"]):
+        table[f"{operation} Time (hours)"] = schedule["base_hours"].round(2).where(schedule["operation"] == operation)
+    table[f"Adjusted Time ({num_workers} workers)"] = schedule["hours"].round(2)
+    return table
+
+def schedule_segments(schedule, split_midnight=True):
+    """Gantt bar segments of a schedule as columns of minutes since midnight.
+
+    With split_midnight, rows that wrap are drawn as "Part 1" up to midnight
+    and "Part 2" from the start of the same day, matching the workload view;
+    otherwise bars simply run past 24:00.
+    """
+    end = schedule["end_min"] % 1440 if split_midnight else schedule["end_min"]
+    wraps = schedule["wraps"].to_numpy() if split_midnight else np.zeros(len(schedule), dtype=bool)
+    whole = schedule.assign(start=schedule["start_min"], end=end, part=0)[~wraps]
+    part1 = schedule.assign(start=schedule["start_min"], end=1440, part=1)[wraps]
+    part2 = schedule.assign(start=0, end=end, part=2)[wraps]
+    return pd.concat([whole, part1, part2]).sort_values(["vehicle", "part"], kind="stable").reset_index(drop=True)
+
+def pack_lanes(start, end):
+    """Assign each interval a lane so that overlapping intervals never share one.
+
+    Greedy interval partitioning: intervals are taken in start order and
+    reuse the lane that frees up earliest, which needs only as many lanes as
+    the peak number of overlapping intervals. O(n log n).
+    """
+    start = np.asarray(start)
+    end = np.asarray(end)
+    lanes = np.empty(len(start), dtype=np.int64)
+    free = []  # heap of (end, lane) for the last interval in each lane
+    for i in np.argsort(start, kind="stable"):
+        if free and free[0][0] <= start[i]:
+            lanes[i] = free[0][1]
+            heapq.heapreplace(free, (end[i], lanes[i]))
+        else:
+            lanes[i] = len(free)
+            heapq.heappush(free, (end[i], lanes[i]))
+    return lanes
+
+# Bin widths (minutes) offered for the workload timeline
+OCCUPANCY_RESOLUTIONS = {"1 min": 1, "5 min": 5, "15 min": 15, "1 hour": 60}
+
+def minute_occupancy(start_min, end_min, minutes_per_day=1440, groups=None, n_groups=None):
+    """Concurrent vehicles in each minute of the day via a difference array.
+
+    Each vehicle occupies [start_min, end_min), and at least its start minute.
+    Work past midnight folds back onto the same day with modular indexing,
+    and every full day a job runs adds one to all minutes. O(rows + minutes).
+    With integer group ids (0..n_groups-1, e.g. hubs) the result is one row
+    of minutes per group, still from a single pass.
+    """
+    start = np.asarray(start_min, dtype=np.int64)
+    length = np.maximum(np.asarray(end_min, dtype=np.int64) - start, 1)
+    full_days, remainder = np.divmod(length, minutes_per_day)
+    first = start % minutes_per_day
+    last = first + remainder
+
+    # Intervals may run up to one day past midnight before being folded back
+    size = 2 * minutes_per_day + 1
+    grouped = groups is not None
+    if not grouped:
+        groups, n_groups = np.zeros(len(start), dtype=np.int64), 1
+    groups = np.asarray(groups, dtype=np.int64)
+    if n_groups is None:
+        n_groups = int(groups.max()) + 1 if len(groups) else 0
+    offset = groups * size
+    diff = (np.bincount(offset + first, minlength=n_groups * size)
+            - np.bincount(offset + last, minlength=n_groups * size))
+    running = np.cumsum(diff.reshape(n_groups, size), axis=1)
+    occupancy = running[:, :minutes_per_day] + running[:, minutes_per_day:2 * minutes_per_day]
+    occupancy += np.bincount(groups, weights=full_days, minlength=n_groups).astype(np.int64)[:, None]
+    return occupancy if grouped else occupancy[0]
+
+# Bars drawn individually up to this many segments; above it the Gantt is aggregated
+GANTT_MAX_TASKS = 2000
+GANTT_MAX_HEIGHT = 1600
+OPERATION_COLORS = {'Loading': '#1f77b4', 'Unloading': '#ff7f0e'}
+DEFAULT_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', 
+                  '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+def _format_day_axis(fig, end_minute=1440):
+    """Label a minutes-since-midnight x-axis with clock hours along the top"""
+    hours = range(0, int(np.ceil(end_minute / 60)) + 1)
+    fig.update_xaxes(
+        tickmode='array',
+        tickvals=[h * 60 for h in hours],
+        ticktext=[f"{h % 24:02d}:00" for h in hours],
+        range=[0, max(end_minute, 1440)],
+        side='top'  # Move time labels to top
+    )
+
+def create_schedule_gantt(schedule, title, color_by="operation", colors=None,
+                          split_midnight=True, max_tasks=GANTT_MAX_TASKS):
+    """Gantt chart of a schedule with one batched horizontal bar trace per colour.
+
+    Bars are packed into lanes so vehicles that do not overlap share a row.
+    color_by names a schedule column (None draws everything in one colour).
+    Above max_tasks segments the chart shows how many vehicles are being
+    worked at once per colour instead, keeping the figure small.
+    Returns None for an empty schedule.
+    """
+    segments = schedule_segments(schedule, split_midnight)
+    if segments.empty:
         return None
-    
-    # Create Gantt chart
-    fig = ff.create_gantt(tasks, 
-                          colors=colors,
-                          index_col='Resource',
-                          show_colorbar=True,
-                          group_tasks=True,
-                          title=f"Vehicle {operation_type.title()} Schedule ({operation_mode.title()})")
-    
+    groups = segments[color_by] if color_by else pd.Series("Vehicle", index=segments.index)
+    if isinstance(colors, dict):
+        palette = colors
+    else:
+        palette = dict(zip(pd.unique(groups), itertools.cycle(colors or DEFAULT_COLORS)))
+
+    fig = go.Figure()
+    if len(segments) > max_tasks:
+        # Aggregated view: concurrent vehicles per 5 minutes for each group
+        bin_starts = np.arange(0, 1440, 5)
+        for key, group in segments.groupby(groups, sort=False):
+            occupancy = minute_occupancy(group["start"], group["end"]).reshape(-1, 5).max(axis=1)
+            fig.add_trace(go.Scatter(
+                x=bin_starts, y=occupancy, name=str(key), mode='lines',
+                line=dict(shape='hv', color=palette.get(key)), fill='tozeroy'
+            ))
+        fig.update_layout(
+            title=f"{title} ({len(segments):,} bars aggregated)",
+            yaxis_title="Vehicles at Once",
+            height=400
+        )
+        _format_day_axis(fig)
+        return fig
+
+    lanes = pack_lanes(segments["start"].to_numpy(), segments["end"].to_numpy())
+    for key, idx in segments.groupby(groups, sort=False).indices.items():
+        group = segments.iloc[idx]
+        start = group["start"].to_numpy()
+        end = group["end"].to_numpy()
+        fig.add_trace(go.Bar(
+            orientation='h', y=lanes[idx], base=start, x=end - start,
+            name=str(key), marker_color=palette.get(key),
+            customdata=np.column_stack([
+                group["vehicle"], group["vehicle_type"],
+                [f"{s // 60 % 24:02d}:{s % 60:02d}" for s in start],
+                [f"{e // 60 % 24:02d}:{e % 60:02d}" for e in end],
+            ]),
+            hovertemplate="Vehicle %{customdata[0]} (%{customdata[1]})<br>%{customdata[2]} – %{customdata[3]}<extra>%{fullData.name}</extra>"
+        ))
+    n_lanes = int(lanes.max()) + 1
     fig.update_layout(
-        xaxis_title="Time",
-        yaxis_title="Vehicles",
-        height=400 + len(tasks) * 30
+        title=title,
+        barmode='overlay',
+        bargap=0.3,
+        height=min(200 + n_lanes * 15, GANTT_MAX_HEIGHT)
     )
-    
+    fig.update_yaxes(showticklabels=False, autorange='reversed')
+    _format_day_axis(fig, int(segments["end"].max()))
+    return fig
+
+def create_gantt_chart(df, operation_type, operation_mode):
+    """Create Gantt chart from vehicle data"""
+    schedule = build_schedule(df, operation_mode, operation_type=operation_type)
+    fig = create_schedule_gantt(schedule,
+                                title=f"Vehicle {operation_type.title()} Schedule ({operation_mode.title()})",
+                                color_by="mapped_type",
+                                split_midnight=False)
+    if fig is not None:
+        fig.update_layout(xaxis_title="Time", yaxis_title="Vehicles")
     return fig
 
 def calculate_hourly_workload(df, operation_type, operation_mode, num_workers=1):
-    """Calculate number of vehicles being worked on per hour"""
-    hourly_data = {}
-    
-    for idx, row in df.iterrows():
-        vehicle_type = row['Vehicle Type']
-        arrival_time = parse_time(row['Arrival Time'])
-        
-        # Get custom parcels if available in CSV
-        custom_parcels = None
-        if 'Parcels' in df.columns:
-            custom_parcels = row.get('Parcels')
-            if pd.isna(custom_parcels):
-                custom_parcels = None
-        
-        mapped_type = VEHICLE_MAPPING.get(vehicle_type, vehicle_type)
-        times = compute_times(mapped_type, operation_mode, custom_parcels)
-        
-        if times is None:
-            continue
-            
-        operation_time = times[operation_type.lower()]
-        
-        # Divide operation time by number of workers
-        operation_time = operation_time / num_workers
-        
-        # Calculate total minutes and proper clock wrapping
-        total_minutes = arrival_time.hour * 60 + arrival_time.minute + (operation_time * 60)
-        end_hour = int((total_minutes // 60) % 24)  # Wrap around 24 hours, convert to int
-        end_minute = int(total_minutes % 60)  # Convert to int
-        
-        start_hour = arrival_time.hour
-        
-        # Handle operations that cross midnight
-        if end_hour < start_hour:
-            # Operation crosses midnight
-            # Add vehicle to hours from start to 23
-            for hour in range(start_hour, 24):
-                if hour not in hourly_data:
-                    hourly_data[hour] = 0
-                hourly_data[hour] += 1
-            
-            # Add vehicle to hours from 0 to end_hour
-            for hour in range(0, end_hour + 1):
-                if hour not in hourly_data:
-                    hourly_data[hour] = 0
-                hourly_data[hour] += 1
-        else:
-            # Normal case: operation within same day
-            # Add vehicle to each hour it's being worked on
-            for hour in range(start_hour, end_hour + 1):
-                if hour not in hourly_data:
-                    hourly_data[hour] = 0
-                hourly_data[hour] += 1
-    
-    return hourly_data
+    """Calculate the most vehicles being worked on at once in each hour"""
+    schedule = build_schedule(df, operation_mode, num_workers, operation_type=operation_type)
+    if schedule.empty:
+        return {}
+    from timeline import horizon_occupancy  # imports gantt, so not at module level
+    timeline = horizon_occupancy(schedule, 60)["timeline"]
+    # Hours count on from the first arrival day's midnight, so 25 is 01:00 the next day
+    hours = np.arange(len(timeline))[timeline["Vehicles"].to_numpy() > 0]
+    return dict(zip(hours.tolist(), timeline["Vehicles"].to_numpy()[hours].tolist()))
 
 def create_time_based_gantt_chart(df, operation_type, operation_mode, num_workers=1):
     """Create time-based Gantt chart showing actual vehicle operation times"""
-    tasks = []
-    
-    current_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    for idx, row in df.iterrows():
-        vehicle_type = row['Vehicle Type']
-        arrival_time = parse_time(row['Arrival Time'])
-        
-        # Get custom parcels if available in CSV
-        custom_parcels = None
-        if 'Parcels' in df.columns:
-            custom_parcels = row.get('Parcels')
-            if pd.isna(custom_parcels):
-                custom_parcels = None
-        
-        mapped_type = VEHICLE_MAPPING.get(vehicle_type, vehicle_type)
-        times = compute_times(mapped_type, operation_mode, custom_parcels)
-        
-        if times is None:
-            continue
-            
-        operation_time = times[operation_type.lower()]
-        
-        # Divide operation time by number of workers
-        operation_time = operation_time / num_workers
-        
-        # Calculate actual start and end times
-        start_time = current_time + timedelta(hours=arrival_time.hour, minutes=arrival_time.minute)
-        
-        # Calculate end time with proper clock wrapping
-        total_minutes = arrival_time.hour * 60 + arrival_time.minute + (operation_time * 60)
-        end_hour = int((total_minutes // 60) % 24)  # Wrap around 24 hours, convert to int
-        end_minute = int(total_minutes % 60)  # Convert to int
-        
-        end_time = current_time + timedelta(hours=end_hour, minutes=end_minute)
-        
-        # If end time is before start time, it means it wrapped around midnight
-        if end_time < start_time:
-            # Create two separate tasks: one from start to midnight, one from midnight to end
-            midnight = current_time + timedelta(hours=24)
-            
-            # First part: from start to midnight
-            tasks.append(dict(
-                Task=f"Vehicle {idx+1} (Part 1)",
-                Start=start_time,
-                Finish=midnight,
-                Resource="Vehicle"
-            ))
-            
-            # Second part: from midnight to end
-            tasks.append(dict(
-                Task=f"Vehicle {idx+1} (Part 2)",
-                Start=current_time,
-                Finish=end_time,
-                Resource="Vehicle"
-            ))
+    schedule = build_schedule(df, operation_mode, num_workers, operation_type=operation_type)
+    fig = create_schedule_gantt(schedule,
+                                title=f"Vehicle {operation_type.title()} Schedule ({operation_mode.title()}) - {num_workers} Workers",
+                                color_by=None,
+                                split_midnight=False)
+    if fig is not None:
+        fig.update_layout(showlegend=False)
+    return fig
+
+# --- CACHED PIPELINE STAGES ---
+# Bounds for every st.cache_* entry: enough for a few files x hubs x modes
+CACHE_MAX_ENTRIES = 64
+CACHE_TTL_SECONDS = 3600
+
+def file_digest(file_bytes):
+    """Content hash used to key every cached stage of an uploaded file"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_hub_codes(file_hash, _file_bytes):
+    """Hub codes of an uploaded file, from a chunked pass over that column only"""
+    from ingest import list_hubs
+    return list_hubs(io.BytesIO(_file_bytes))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_base_schedule(file_hash, hub, operation_mode, params, _file_bytes, _timer=DISABLED):
+    """Single-worker schedule of one hub; staff_schedule rescales it per worker count.
+
+    Backed by the on-disk schedule cache, so a file already costed in an
+    earlier session (or by another hub's first selection) is not parsed again.
+    _timer only sees the cache stages when this call is not memoized. None when
+    the hub is not in the cached file.
+    """
+    from schedule_cache import hub_schedule
+    return hub_schedule(io.BytesIO(_file_bytes), file_hash, hub, operation_mode, params=params, timer=_timer)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_monte_carlo(file_hash, hub, operation_mode, params, num_workers, scenarios, seed, variability, base_date,
+                       _schedule):
+    """Monte Carlo bands of one hub; variability scales every entry of PARAM_SPREAD"""
+    from stochastic import PARAM_SPREAD, monte_carlo
+    spread = {name: sd * variability for name, sd in PARAM_SPREAD.items()}
+    return monte_carlo(_schedule, operation_mode, num_workers, params, scenarios, seed, spread,
+                       base_date=base_date)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_workforce(file_hash, hub, operation_mode, params, target_hours, window, base_date, _schedule):
+    """Minimum workforce per staffing window of one hub"""
+    from workforce import optimize_workforce
+    return optimize_workforce(_schedule, target_hours=target_hours, window=window, base_date=base_date)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_sweep(file_hash, hub, params, machine_buffers, workers, parcel_overrides, late_after_hours, base_date,
+                 _schedule):
+    """What-if grid of one hub; parcel_overrides is a tuple of (vehicle type, parcels) tuples"""
+    from sweep import SWEEP_MODES, run_sweep, scenario_grid
+    overrides = [dict(pairs) for pairs in parcel_overrides]
+    grid = scenario_grid(SWEEP_MODES, workers, machine_buffers, overrides)
+    return run_sweep(_schedule, grid, params, overrides, late_after_hours, base_date=base_date)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_network_costs(file_hash, num_workers, wage, machine_cost, params, _file_bytes):
+    """Cost totals of every hub in an uploaded file"""
+    from costs import network_costs
+    return network_costs(io.BytesIO(_file_bytes), num_workers, wage, machine_cost, params)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def cached_network_overview(file_hash, operation_mode, num_workers, params, base_date, _file_bytes):
+    """Per-hub totals and hub x hour occupancy of every hub in an uploaded file"""
+    from network import network_overview
+    return network_overview(io.BytesIO(_file_bytes), operation_mode, num_workers, params, base_date)
+
+# Hubs whose IncrementalSchedule a session keeps for patching on re-upload
+INCREMENTAL_MAX_HUBS = 4
+
+def incremental_hub_schedule(file_hash, hub, operation_mode, params, file_bytes, timer=DISABLED):
+    """The session's IncrementalSchedule of one hub, brought up to date with the uploaded file.
+
+    Kept in st.session_state per hub, mode and params, so re-uploading an
+    edited file only parses and costs the rows that changed since the last
+    upload. Its last_update is None when nothing had to be read.
+    """
+    from incremental import IncrementalSchedule
+    from ingest import load_hub
+    store = st.session_state.setdefault("incremental_schedules", {})
+    key = (hub, operation_mode, _model_key(params, MACHINE_BUFFER))
+    seen_hash, incremental = store.pop(key, (None, None))
+    if seen_hash != file_hash:
+        df = load_hub(io.BytesIO(file_bytes), hub)
+        timer.lap("CSV read", rows=len(df))
+        if incremental is None:
+            incremental = IncrementalSchedule(df, operation_mode, params=params)
+            timer.lap("Time calculation", rows=len(df))
         else:
-            # Normal case: start and end on same day
-            tasks.append(dict(
-                Task=f"Vehicle {idx+1}",
-                Start=start_time,
-                Finish=end_time,
-                Resource="Vehicle"
-            ))
-    
-    if not tasks:
-        return None
-    
-    # Create Gantt chart without grouping
-    fig = ff.create_gantt(tasks, 
-                          colors=['#1f77b4'],  # Single blue color
-                          index_col='Resource',
-                          show_colorbar=False,
-                          group_tasks=False,  # Don't group tasks
-                          title=f"Vehicle {operation_type.title()} Schedule ({operation_mode.title()}) - {num_workers} Workers")
-    
+            incremental.update(df, timer)
+    else:
+        incremental.last_update = None
+    # Most recently used last, so the oldest hub is dropped first
+    store[key] = (file_hash, incremental)
+    while len(store) > INCREMENTAL_MAX_HUBS:
+        store.pop(next(iter(store)))
+    return incremental
+
+def show_network_overview(file_hash, file_bytes, timer=DISABLED):
+    """Network overview mode: every hub side by side, with drill-down from the precomputed aggregates"""
+    st.header("🌐 Network Overview")
+    from calibration import model_params  # imports gantt, so not at module level
+    network_params, _ = model_params()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        operation_mode = st.selectbox("Select Operation Mode:", ["Manual", "Machine"])
+    with col2:
+        num_workers = st.number_input("Number of Workers:", min_value=1, max_value=20, value=1, step=1)
+    with col3:
+        base_date = pd.Timestamp(st.date_input(
+            "Date for arrivals without one:",
+            help="Rows with a plain clock time and no 'Arrival Date' are placed on this day"
+        ))
+    timer.lap("Settings")
+    with st.spinner("Aggregating every hub..."):
+        overview = cached_network_overview(file_hash, operation_mode.lower(), num_workers, network_params,
+                                           base_date, file_bytes)
+    summary = overview["summary"]
+    timer.lap("Network aggregates", rows=len(summary))
+    if summary.empty:
+        st.warning("⚠️ No hubs found in this file.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hubs", len(summary))
+    col2.metric("Vehicles", f"{summary['Vehicles'].sum():,}")
+    col3.metric("Busy Hours", f"{summary['Busy Hours'].sum():,.1f}")
+    col4.metric("Highest Hub Peak", int(summary["Peak Vehicles"].max()))
+    skipped = int(summary["Skipped"].sum())
+    if skipped:
+        st.warning(f"⚠️ Skipped {skipped:,} row(s) with an unreadable arrival time or a vehicle type "
+                   "that has no cost model.")
+
+    sort_by = st.selectbox("Sort Hubs By:", ["Peak Vehicles", "Busy Hours", "Vehicles", "Loading Hours",
+                                              "Unloading Hours", "Hub Code"])
+    summary = summary.sort_values(sort_by, ascending=sort_by == "Hub Code", kind="stable")
+    st.dataframe(summary.round({"Loading Hours": 2, "Unloading Hours": 2, "Busy Hours": 2}), hide_index=True,
+                 use_container_width=True)
+
+    hourly = overview["hourly"].loc[summary["Hub Code"]]
+    fig = go.Figure(data=[
+        go.Heatmap(z=hourly.to_numpy(), x=hourly.columns, y=hourly.index, colorscale='YlOrRd',
+                   colorbar=dict(title="Vehicles"),
+                   hovertemplate="%{y}<br>%{x|%a %d %b %H:%M}<br>Peak vehicles: %{z}<extra></extra>")
+    ])
     fig.update_layout(
-        xaxis_title="",
-        yaxis_title="",
-        height=200 + len(tasks) * 15,  # Reduced height and spacing
-        showlegend=False
-    )
-    
-    # Update x-axis to show time labels at the top
-    fig.update_xaxes(
-        tickformat="%H:%M",
-        tickmode='array',
-        tickvals=[current_time + timedelta(hours=h) for h in range(0, 24)],
-        ticktext=[f"{h:02d}:00" for h in range(0, 24)],
-        side='top',  # Move time labels to top
-        rangeslider_visible=False,  # Disable range slider
-        rangeselector_visible=False  # Disable range selector buttons (1y, 1w, 1m)
+        title=f"Most Vehicles at Once per Hour by Hub ({operation_mode}) - {num_workers} Workers",
+        xaxis_title="Time",
+        yaxis_title="Hub",
+        height=min(max(300, 20 * len(hourly) + 150), GANTT_MAX_HEIGHT)
     )
-    
-    # Remove y-axis labels and make lines thinner
-    fig.update_yaxes(showticklabels=False)
-    
-    # Make the bars thinner by updating the layout
+    fig.update_yaxes(autorange='reversed', type='category')
+    timer.lap("Network heatmap", figure=fig)
+    st.plotly_chart(fig, use_container_width=True)
+
+    # --- Drill-down: read from the aggregates, nothing is recomputed ---
+    from network import hub_profile
+    hub = st.selectbox("Drill into Hub:", summary["Hub Code"].tolist())
+    row = summary.set_index("Hub Code").loc[hub]
+    profile_df = hub_profile(overview, hub)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Vehicles", f"{row['Vehicles']:,}")
+    col2.metric("Loading / Unloading Hours", f"{row['Loading Hours']:,.1f} / {row['Unloading Hours']:,.1f}")
+    col3.metric("Peak Concurrent Vehicles", int(row["Peak Vehicles"]))
+    col4.metric("Time at Peak", "-" if pd.isna(row["Peak Time"]) else f"{row['Peak Time']:%a %d %b %H:%M}")
+    fig = go.Figure(data=[
+        go.Bar(x=profile_df.index, y=profile_df["Vehicles"], marker_color='lightblue', name="Most"),
+        go.Scatter(x=profile_df.index, y=profile_df["Average Vehicles"], mode='lines', line=dict(shape='hv'),
+                   name="Average")
+    ])
     fig.update_layout(
-        bargap=0.8,  # Increase gap between bars
-        bargroupgap=0.1  # Reduce gap between groups
+        title=f"Vehicles Being Worked at Once per 1 hour ({operation_mode}) - {num_workers} Workers - {hub}",
+        xaxis_title="Time",
+        yaxis_title="Number of Vehicles",
+        height=400
     )
-    
-    return fig
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("Untick 🌐 Network overview in the sidebar and select this hub for its Gantt chart, costs and "
+               "what-if views.")
+    timer.lap("Hub drill-down", figure=fig)
+
+def show_performance(timer):
+    """Performance panel: the page's stages timed by timer"""
+    with st.expander("⏱️ Performance", expanded=True):
+        st.metric("Measured Time (ms)", f"{timer.total_seconds * 1000:,.0f}")
+        st.dataframe(timer.to_frame())
+        st.download_button("Download as JSON", timer.to_json(), file_name="profile.json",
+                           mime="application/json")
 
 # --- MAIN APP ---
 def main():
@@ -324,6 +746,20 @@ def main():
     
     st.title("🚛 Vehicle Loading/Unloading Analysis")
     st.markdown("---")
+    profile = st.sidebar.checkbox(
+        "⏱️ Profile page stages",
+        help="Time every stage of this page and show the breakdown in a Performance panel at the bottom"
+    )
+    incremental = st.sidebar.checkbox(
+        "♻️ Incremental re-uploads",
+        help="Keep each hub's schedule in this session and, when an edited file is uploaded, only recost the "
+             "rows that changed and redraw the Gantt bars they touch"
+    )
+    network = st.sidebar.checkbox(
+        "🌐 Network overview",
+        help="Compare every hub of the file on one screen: per-hub totals, peaks and an hour-by-hour heatmap "
+             "from one pass over all hubs"
+    )
     
     # File upload
     st.header("📁 Upload Data")
@@ -334,14 +770,32 @@ def main():
     
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
+            timer = StageTimer(profile)
+            file_bytes = uploaded_file.getvalue()
+            file_hash = file_digest(file_bytes)
+            timer.lap("Upload", rows=file_bytes.count(b"\n") if profile else 0)
+            hub_codes = cached_hub_codes(file_hash, file_bytes)
+            timer.lap("Hub list")
             st.success("✅ File uploaded successfully!")
+            if not hub_codes:
+                st.warning("⚠️ No rows with a 'Hub Code' found in this file.")
+                return
+            if network:
+                show_network_overview(file_hash, file_bytes, timer)
+                if profile:
+                    show_performance(timer)
+                return
             
             # --- Hub selection ---
             st.header("🏢 Select Hub")
-            hub_codes = df['Hub Code'].unique().tolist()
             selected_hub = st.selectbox("Select Hub Code:", hub_codes)
-            df = df[df['Hub Code'] == selected_hub]
+            from calibration import model_params  # imports gantt, so not at module level
+            params, calibration = model_params(selected_hub)
+            if calibration is None:
+                st.caption("Cost model: notebook parameters")
+            else:
+                st.caption(f"Cost model: {calibration['scope']} calibration v{calibration['version']} "
+                           f"({calibration['created']}, RMS error {calibration['rms_error']:.1%})")
             
             # --- Operation Mode and Workers ---
             st.header("⚙️ Operation Settings")
@@ -360,170 +814,403 @@ def main():
                     step=1
                 )
             
+            # --- Build the schedule once for every view ---
+            timer.lap("Settings")
+            if incremental:
+                hub_state = incremental_hub_schedule(file_hash, selected_hub, operation_mode.lower(), params,
+                                                     file_bytes, timer)
+                hub_state.configure(num_workers=num_workers)
+                # The staffed schedule keeps base_hours, so it also serves as the base schedule
+                base_schedule = schedule = hub_state.schedule
+                timer.lap("Staffing")
+                if hub_state.last_update is not None:
+                    change = hub_state.last_update
+                    st.caption(f"♻️ Re-upload: +{change['added']:,} / −{change['removed']:,} rows"
+                               + (" (recomputed in full)" if change["rebuilt"] else ""))
+            else:
+                hub_state = None
+                base_schedule = cached_base_schedule(file_hash, selected_hub, operation_mode.lower(), params,
+                                                     file_bytes, timer)
+                if base_schedule is None:
+                    # Not in the cached file's manifest, e.g. pruned by another session meanwhile; forget
+                    # the miss so the next rerun costs the file again
+                    cached_base_schedule.clear(file_hash, selected_hub, operation_mode.lower(), params, file_bytes)
+                    st.error(f"❌ No arrivals found for hub {selected_hub}. Please try again.")
+                    return
+                timer.lap("Hub schedule", rows=len(base_schedule))
+                schedule = staff_schedule(base_schedule, num_workers)
+                timer.lap("Staffing")
+            malformed = schedule.attrs["malformed_arrivals"]
+            if len(malformed):
+                st.warning(f"⚠️ Skipped {len(malformed)} row(s) with an unreadable 'Arrival Time'.")
+                with st.expander("Show skipped rows"):
+                    st.dataframe(pd.DataFrame(malformed))
+            unmapped = schedule.attrs["unmapped_types"]
+            if unmapped:
+                st.warning(f"⚠️ Skipped {sum(unmapped.values())} row(s) whose vehicle type has no cost model: "
+                           + ", ".join(f"{vehicle_type} ({count})" for vehicle_type, count in unmapped.items())
+                           + ". Add them to VEHICLE_MAPPING to include them.")
+            
+            # --- Horizon: plain clock times are placed on a chosen day ---
+            from timeline import GANTT_WINDOWS, create_horizon_gantt, horizon_bounds, horizon_occupancy
+            base_date = None
+            if schedule["arrival_date"].isna().any():
+                base_date = pd.Timestamp(st.date_input(
+                    "Date for arrivals without one:",
+                    help="Rows with a plain clock time and no 'Arrival Date' are placed on this day"
+                ))
+                if hub_state is not None:
+                    hub_state.configure(base_date=base_date)
+            horizon_start, horizon_end = horizon_bounds(schedule, base_date)
+            horizon_days = (horizon_end - horizon_start).days
+            
             # --- Time Calculations Table ---
             st.header("⏱️ Time Calculations")
-            time_data = []
-            for idx, row in df.iterrows():
-                vehicle_type = row['Vehicle Type']
-                arrival_time = row['Arrival Time']
-                operation_type = row['Type']  # Now from CSV
-                mapped_type = VEHICLE_MAPPING.get(vehicle_type, vehicle_type)
-                # Get custom parcels if available in CSV
-                custom_parcels = None
-                if 'Parcels' in df.columns:
-                    custom_parcels = row.get('Parcels')
-                    if pd.isna(custom_parcels):
-                        custom_parcels = None
-                times = compute_times(mapped_type, operation_mode.lower(), custom_parcels)
-                if times:
-                    original_time = times[operation_type.lower()]
-                    adjusted_time = original_time / num_workers
-                    # Get default parcel count for this vehicle type
-                    default_parcels = None
-                    for v in VEHICLES:
-                        if v["type"] == mapped_type:
-                            default_parcels = v['parcels']
-                            break
-                    time_data.append({
-                        "Arrival Time": arrival_time,
-                        "Original Type": vehicle_type,
-                        "Mapped Type": mapped_type,
-                        "Operation": operation_type,
-                        "Parcels Used": custom_parcels if custom_parcels is not None else f"{default_parcels} (default)",
-                        f"{operation_type} Time (hours)": round(original_time, 2),
-                        f"Adjusted Time ({num_workers} workers)": round(adjusted_time, 2)
-                    })
-            time_df = pd.DataFrame(time_data)
+            time_df = schedule_time_table(schedule, num_workers)
+            timer.lap("Time table", rows=len(time_df))
             st.dataframe(time_df)
+            timer.lap("Time table render")
             
             # --- Time-based Gantt Chart ---
             st.header("📈 Time-Based Gantt Chart")
-            gantt_tasks = []
-            current_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            for idx, row in df.iterrows():
-                vehicle_type = row['Vehicle Type']
-                arrival_time = parse_time(row['Arrival Time'])
-                operation_type = row['Type']
-                mapped_type = VEHICLE_MAPPING.get(vehicle_type, vehicle_type)
-                custom_parcels = None
-                if 'Parcels' in df.columns:
-                    custom_parcels = row.get('Parcels')
-                    if pd.isna(custom_parcels):
-                        custom_parcels = None
-                times = compute_times(mapped_type, operation_mode.lower(), custom_parcels)
-                if not times:
-                    continue
-                operation_time = times[operation_type.lower()] / num_workers
-                start_time = current_time + timedelta(hours=arrival_time.hour, minutes=arrival_time.minute)
-                total_minutes = arrival_time.hour * 60 + arrival_time.minute + (operation_time * 60)
-                end_hour = int((total_minutes // 60) % 24)
-                end_minute = int(total_minutes % 60)
-                end_time = current_time + timedelta(hours=end_hour, minutes=end_minute)
-                if end_time < start_time:
-                    midnight = current_time + timedelta(hours=24)
-                    gantt_tasks.append(dict(
-                        Task=f"Vehicle {idx+1} (Part 1)",
-                        Start=start_time,
-                        Finish=midnight,
-                        Resource=operation_type
-                    ))
-                    gantt_tasks.append(dict(
-                        Task=f"Vehicle {idx+1} (Part 2)",
-                        Start=current_time,
-                        Finish=end_time,
-                        Resource=operation_type
-                    ))
-                else:
-                    gantt_tasks.append(dict(
-                        Task=f"Vehicle {idx+1}",
-                        Start=start_time,
-                        Finish=end_time,
-                        Resource=operation_type
-                    ))
-            if gantt_tasks:
-                fig = ff.create_gantt(gantt_tasks,
-                                     colors={'Loading': '#1f77b4', 'Unloading': '#ff7f0e'},
-                                     index_col='Resource',
-                                     show_colorbar=True,
-                                     group_tasks=True,
-                                     title=f"Vehicle Loading/Unloading Schedule ({operation_mode.title()}) - {selected_hub}")
-                fig.update_layout(
-                    xaxis_title="Time",
-                    yaxis_title="Vehicles",
-                    height=200 + len(gantt_tasks) * 15,
-                    showlegend=True
-                )
-                fig.update_xaxes(
-                    tickformat="%H:%M",
-                    tickmode='array',
-                    tickvals=[current_time + timedelta(hours=h) for h in range(0, 24)],
-                    ticktext=[f"{h:02d}:00" for h in range(0, 24)],
-                    side='top',
-                    rangeslider_visible=False,
-                    rangeselector_visible=False
-                )
-                fig.update_yaxes(showticklabels=False)
+            col1, col2 = st.columns(2)
+            with col1:
+                window_label = st.selectbox("Window:", list(GANTT_WINDOWS))
+            window = GANTT_WINDOWS[window_label]
+            pages = max(1, -(-horizon_days // window.days))
+            with col2:
+                page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1, step=1)
+            window_start = horizon_start + (page - 1) * window
+            gantt_title = (f"Vehicle Loading/Unloading Schedule ({operation_mode.title()}) - {selected_hub} - "
+                           f"{window_start:%d %b %Y} to {window_start + window - pd.Timedelta(days=1):%d %b %Y}")
+            if hub_state is not None:
+                fig = hub_state.gantt(window_start, window_start + window, gantt_title, colors=OPERATION_COLORS)
+            else:
+                fig = create_horizon_gantt(schedule, window_start, window_start + window, title=gantt_title,
+                                           colors=OPERATION_COLORS, base_date=base_date)
+            if fig is not None:
+                fig.update_layout(xaxis_title="Time", yaxis_title="Vehicles", showlegend=True)
+                timer.lap("Gantt build", figure=fig)
                 st.plotly_chart(fig, use_container_width=True)
+                timer.lap("Gantt render")
+            elif len(schedule):
+                st.info("No vehicles are being worked in this window.")
             else:
                 st.warning("⚠️ Could not create time-based Gantt chart. Check vehicle type mappings.")
             
-            # --- Hourly Workload ---
-            st.header("📊 Hourly Workload Analysis")
-            hourly_data = {}
-            for idx, row in df.iterrows():
-                vehicle_type = row['Vehicle Type']
-                arrival_time = parse_time(row['Arrival Time'])
-                operation_type = row['Type']
-                mapped_type = VEHICLE_MAPPING.get(vehicle_type, vehicle_type)
-                custom_parcels = None
-                if 'Parcels' in df.columns:
-                    custom_parcels = row.get('Parcels')
-                    if pd.isna(custom_parcels):
-                        custom_parcels = None
-                times = compute_times(mapped_type, operation_mode.lower(), custom_parcels)
-                if not times:
-                    continue
-                operation_time = times[operation_type.lower()] / num_workers
-                total_minutes = arrival_time.hour * 60 + arrival_time.minute + (operation_time * 60)
-                end_hour = int((total_minutes // 60) % 24)
-                start_hour = arrival_time.hour
-                if end_hour < start_hour:
-                    for hour in range(start_hour, 24):
-                        if hour not in hourly_data:
-                            hourly_data[hour] = 0
-                        hourly_data[hour] += 1
-                    for hour in range(0, end_hour + 1):
-                        if hour not in hourly_data:
-                            hourly_data[hour] = 0
-                        hourly_data[hour] += 1
+            # --- Workload Timeline ---
+            st.header("📊 Workload Analysis")
+            resolution_label = st.selectbox(
+                "Timeline Resolution:",
+                list(OCCUPANCY_RESOLUTIONS),
+                index=list(OCCUPANCY_RESOLUTIONS).index("1 hour")
+            )
+            if len(schedule):
+                timer.restart()
+                if hub_state is not None:
+                    occupancy = hub_state.occupancy(OCCUPANCY_RESOLUTIONS[resolution_label])
                 else:
-                    for hour in range(start_hour, end_hour + 1):
-                        if hour not in hourly_data:
-                            hourly_data[hour] = 0
-                        hourly_data[hour] += 1
-            if hourly_data:
-                hours = list(hourly_data.keys())
-                counts = list(hourly_data.values())
+                    occupancy = horizon_occupancy(schedule, OCCUPANCY_RESOLUTIONS[resolution_label], base_date)
+                workload_df = occupancy["timeline"]
+                timer.lap("Workload", rows=len(workload_df))
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Peak Concurrent Vehicles", occupancy["peak"])
+                col2.metric("Time at Peak", f"{occupancy['peak_at']:%a %d %b %H:%M}")
+                col3.metric("Days in Horizon", horizon_days)
                 fig = go.Figure(data=[
-                    go.Bar(x=hours, y=counts, 
+                    go.Bar(x=workload_df.index, y=workload_df["Vehicles"],
                           marker_color='lightblue',
-                          text=counts,
+                          text=workload_df["Vehicles"] if len(workload_df) <= 96 else None,
                           textposition='auto')
                 ])
                 fig.update_layout(
-                    title=f"Number of Vehicles Being Worked per Hour ({operation_mode}) - {num_workers} Workers - {selected_hub}",
-                    xaxis_title="Hour of Day",
+                    title=f"Vehicles Being Worked at Once per {resolution_label} ({operation_mode}) - {num_workers} Workers - {selected_hub}",
+                    xaxis_title="Time",
                     yaxis_title="Number of Vehicles",
                     height=400
                 )
+                timer.lap("Workload bars", figure=fig)
                 st.plotly_chart(fig, use_container_width=True)
-                workload_df = pd.DataFrame([
-                    {"Hour": hour, "Vehicles": count}
-                    for hour, count in sorted(hourly_data.items())
-                ])
-                st.dataframe(workload_df)
+                st.dataframe(workload_df[["Vehicles", "Average Vehicles"]])
+                timer.lap("Workload render")
             else:
-                st.warning("⚠️ Could not calculate hourly workload.")
+                st.warning("⚠️ Could not calculate workload.")
+            
+            # --- Stochastic Mode ---
+            st.header("🎲 Stochastic Mode")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                scenarios = st.number_input(
+                    "Scenarios:",
+                    min_value=100,
+                    max_value=20000,
+                    value=1000,
+                    step=100
+                )
+            with col2:
+                seed = st.number_input("Random Seed:", min_value=0, value=0, step=1)
+            with col3:
+                variability = st.slider(
+                    "Variability:",
+                    min_value=0.0,
+                    max_value=3.0,
+                    value=1.0,
+                    step=0.1,
+                    help="Scales the spread of fatigue, walking speeds, handling delays and turn time"
+                )
+            run_monte_carlo = st.checkbox("Run Monte Carlo simulation")
+            timer.restart()
+            if run_monte_carlo and len(schedule):
+                with st.spinner(f"Running {scenarios:,} scenarios..."):
+                    stochastic = cached_monte_carlo(file_hash, selected_hub, operation_mode.lower(), params,
+                                                    num_workers, scenarios, seed, variability, base_date, schedule)
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Peak Vehicles (P50)", f"{stochastic['peak']['P50']:.0f}")
+                col2.metric("Peak Vehicles (P90)", f"{stochastic['peak']['P90']:.0f}")
+                col3.metric("Busy Hours (P90)", f"{stochastic['busy_hours']['P90']:.1f}")
+                hourly_df = stochastic["hourly"]
+                fig = go.Figure(data=[
+                    go.Scatter(x=hourly_df["Time"], y=hourly_df["P10"], mode='lines',
+                               line=dict(width=0, shape='hv'), showlegend=False, hoverinfo='skip'),
+                    go.Scatter(x=hourly_df["Time"], y=hourly_df["P90"], mode='lines', name='P10-P90',
+                               line=dict(width=0, shape='hv'), fill='tonexty', fillcolor='rgba(31,119,180,0.25)'),
+                    go.Scatter(x=hourly_df["Time"], y=hourly_df["P50"], mode='lines', name='P50',
+                               line=dict(color='#1f77b4', shape='hv')),
+                    go.Scatter(x=hourly_df["Time"], y=hourly_df["Deterministic"], mode='lines',
+                               name='Deterministic', line=dict(color='#ff7f0e', dash='dash', shape='hv')),
+                ])
+                fig.update_layout(
+                    title=f"Vehicles Worked at Once per Hour over {scenarios:,} Scenarios ({operation_mode}) - {selected_hub}",
+                    xaxis_title="Time",
+                    yaxis_title="Number of Vehicles",
+                    height=400
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                with st.expander("Show per-vehicle duration bands"):
+                    st.dataframe(stochastic["vehicles"].round(2))
+                timer.lap("Stochastic mode", rows=scenarios)
+            
+            # --- Dock Queue Simulation ---
+            st.header("🚦 Dock Queue Simulation")
+            from simulation import simulate_docks  # imports gantt, so not at module level
+            col1, col2 = st.columns(2)
+            with col1:
+                num_docks = st.number_input(
+                    "Number of Docks:",
+                    min_value=1,
+                    max_value=200,
+                    value=4,
+                    step=1
+                )
+            with col2:
+                discipline = st.selectbox(
+                    "Queue Order:",
+                    ["FIFO", "Priority"],
+                    help="Priority serves the shortest waiting job first"
+                )
+            timer.restart()
+            if len(schedule):
+                simulation = simulate_docks(schedule, num_docks, num_workers, discipline=discipline.lower(),
+                                            base_date=base_date)
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Average Wait (min)", f"{simulation['mean_wait']:.0f}")
+                col2.metric("Longest Wait (min)", f"{simulation['max_wait']:.0f}")
+                col3.metric("Longest Queue", simulation["max_queue"])
+                col4.metric("Dock Utilization", f"{simulation['dock_utilization'].mean():.0%}")
+                st.caption(f"{simulation['servers']} dock(s) worked at once by crews of {simulation['crew_size']} "
+                           f"from the pool of {num_workers} workers.")
+                queue_df = simulation["queue"]
+                fig = go.Figure(data=[
+                    go.Scatter(x=queue_df["Time"], y=queue_df["Queue Length"],
+                               mode='lines', line=dict(shape='hv', color='#d62728'), fill='tozeroy')
+                ])
+                fig.update_layout(
+                    title=f"Vehicles Waiting for a Dock ({operation_mode}) - {num_docks} Docks - {selected_hub}",
+                    xaxis_title="Time",
+                    yaxis_title="Vehicles Waiting",
+                    height=350
+                )
+                fig.update_xaxes(side='top')
+                st.plotly_chart(fig, use_container_width=True)
+                vehicles_df = simulation["vehicles"]
+                st.dataframe(pd.DataFrame({
+                    "Vehicle": vehicles_df["vehicle"],
+                    "Vehicle Type": vehicles_df["vehicle_type"],
+                    "Operation": vehicles_df["operation"],
+                    "Arrival": vehicles_df["arrival_at"].dt.strftime("%a %d %b %H:%M"),
+                    "Wait (min)": vehicles_df["wait_min"].round(1),
+                    "Start": vehicles_df["start_at"].dt.strftime("%a %d %b %H:%M"),
+                    "Finish": vehicles_df["finish_at"].dt.strftime("%a %d %b %H:%M"),
+                    "Dock": vehicles_df["dock"] + 1,
+                }))
+                timer.lap("Dock queue", rows=len(vehicles_df))
+            
+            # --- Minimum Workforce ---
+            st.header("👷 Minimum Workforce")
+            col1, col2 = st.columns(2)
+            with col1:
+                target_hours = st.number_input(
+                    "Target Turnaround (hours):",
+                    min_value=0.25,
+                    max_value=24.0,
+                    value=4.0,
+                    step=0.25
+                )
+            with col2:
+                staffing_window = st.selectbox("Staffing Windows:", ["Hourly", "8-hour shifts"])
+            timer.restart()
+            if len(schedule):
+                window = 60 if staffing_window == "Hourly" else 480
+                staffing = cached_workforce(file_hash, selected_hub, operation_mode.lower(), params, target_hours,
+                                            window, base_date, schedule)
+                col1, col2 = st.columns(2)
+                col1.metric("Worker-Hours", f"{staffing['worker_hours']:,.0f}")
+                col2.metric("Longest Turnaround (hours)", f"{staffing['max_turnaround_hours']:.2f}")
+                if staffing["too_long"]:
+                    st.warning(f"⚠️ {staffing['too_long']} vehicle(s) take longer than the target even with a full crew.")
+                allocation_df = staffing["allocation"]
+                fig = go.Figure(data=[
+                    go.Bar(x=allocation_df["Window"], y=allocation_df["Workers"],
+                           marker_color='#2ca02c', text=allocation_df["Workers"], textposition='auto')
+                ])
+                fig.update_layout(
+                    title=f"Workers Needed per Window ({operation_mode}) - {target_hours:g} h Target - {selected_hub}",
+                    xaxis_title="Window Start",
+                    yaxis_title="Workers",
+                    height=400
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                timer.lap("Minimum workforce", rows=len(allocation_df))
+            
+            # --- What-If Grid ---
+            st.header("🧪 What-If Grid")
+            col1, col2 = st.columns(2)
+            with col1:
+                machine_buffers = st.multiselect(
+                    "Machine Buffer Factors:",
+                    [1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0],
+                    default=[1.25, MACHINE_BUFFER, 2.0]
+                )
+                worker_range = st.slider("Workers:", min_value=1, max_value=20, value=(1, 20))
+            with col2:
+                override_type = st.selectbox("Override Parcels For:", ["(none)"] + [v["type"] for v in VEHICLES])
+                override_parcels = st.number_input("Override Parcel Count:", min_value=1, value=500, step=50)
+                late_after_hours = st.number_input(
+                    "Late After (hours):",
+                    min_value=0.25,
+                    max_value=24.0,
+                    value=4.0,
+                    step=0.25
+                )
+            timer.restart()
+            if len(schedule) and machine_buffers:
+                parcel_overrides = ((),)
+                if override_type != "(none)":
+                    parcel_overrides += (((override_type, override_parcels),),)
+                sweep_df = cached_sweep(file_hash, selected_hub, params, tuple(sorted(machine_buffers)),
+                                        tuple(range(worker_range[0], worker_range[1] + 1)), parcel_overrides,
+                                        late_after_hours, base_date, schedule)
+                metric = st.selectbox("Heatmap Metric:", ["Peak Vehicles", "Busy Hours", "Worker Hours", "Late Finishes"])
+                scenario_labels = sweep_df["Mode"].str.title() + np.where(
+                    sweep_df["Mode"] == "machine", " ×" + sweep_df["Machine Buffer"].map("{:g}".format), ""
+                )
+                if len(parcel_overrides) > 1:
+                    scenario_labels += " | " + sweep_df["Parcel Overrides"]
+                heatmap_df = sweep_df.assign(Scenario=scenario_labels).pivot(
+                    index="Scenario", columns="Workers", values=metric
+                ).reindex(pd.unique(scenario_labels))
+                fig = go.Figure(data=[
+                    go.Heatmap(z=heatmap_df.to_numpy(), x=heatmap_df.columns, y=heatmap_df.index,
+                               colorscale='YlOrRd', colorbar=dict(title=metric),
+                               text=heatmap_df.round(1).to_numpy(), texttemplate="%{text}",
+                               hovertemplate="%{y}<br>%{x} workers<br>" + metric + ": %{z:.1f}<extra></extra>")
+                ])
+                fig.update_layout(
+                    title=f"{metric} by Scenario and Workers - {selected_hub}",
+                    xaxis_title="Workers",
+                    yaxis_title="Scenario",
+                    height=max(300, 40 * len(heatmap_df) + 150)
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(sweep_df.round(2))
+                timer.lap("What-if grid", rows=len(sweep_df))
+            
+            # --- Cost and Break-Even ---
+            st.header("💰 Cost & Break-Even")
+            from costs import MACHINE_COST, MANUAL_COST_PER_HOUR_PER_WORKER, hub_costs, vehicle_costs
+            with st.expander("Cost assumptions"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    wage = st.number_input("Wage (₹ per worker-hour):", min_value=0.0,
+                                           value=float(MANUAL_COST_PER_HOUR_PER_WORKER), step=5.0)
+                    capex = st.number_input("Machine Capex (₹):", min_value=0.0,
+                                            value=float(MACHINE_COST["capex"]), step=100000.0)
+                with col2:
+                    opex_per_hour = st.number_input("Machine Opex (₹ per hour):", min_value=0.0,
+                                                    value=float(MACHINE_COST["opex_per_hour"]), step=5.0)
+                    life_years = st.number_input("Machine Life (years):", min_value=1,
+                                                 value=MACHINE_COST["life_years"], step=1)
+                with col3:
+                    daily_hours = st.number_input("Machine Use (hours per day):", min_value=1,
+                                                  max_value=24, value=MACHINE_COST["daily_hours"], step=1)
+                    days_per_month = st.number_input("Working Days per Month:", min_value=1,
+                                                     max_value=31, value=MACHINE_COST["days_per_month"], step=1)
+            machine_cost = {"capex": capex, "opex_per_hour": opex_per_hour, "life_years": life_years,
+                            "daily_hours": daily_hours, "days_per_month": days_per_month}
+            timer.restart()
+            if len(schedule):
+                costs_df = vehicle_costs(base_schedule, num_workers, wage, machine_cost, params)
+                totals = hub_costs(costs_df, machine_cost)
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Manual Cost (₹)", f"{totals['Manual Cost (₹)']:,.0f}")
+                col2.metric("Machine Cost (₹)", f"{totals['Machine Cost (₹)']:,.0f}")
+                col3.metric("Saving with Machines (₹)", f"{totals['Saving (₹)']:,.0f}")
+                col4.metric("Payback (days)",
+                            "never" if np.isnan(totals["Payback Days"]) else f"{totals['Payback Days']:,.0f}")
+                st.caption(f"Break-even after {totals['Break-even Jobs']:,.0f} jobs of this hub's vehicle mix, "
+                           "with capex paid up front and opex charged per job."
+                           if not np.isnan(totals["Break-even Jobs"]) else
+                           "Machines never break even here: opex outweighs the wage saving per job.")
+                by_type = costs_df.groupby(["mapped_type", "operation"], sort=False).agg(
+                    Jobs=("vehicle", "size"), Saving=("Saving (₹)", "mean"),
+                    Break_even=("Break-even Jobs", "first")
+                ).reset_index()
+                fig = go.Figure()
+                for operation, group in by_type.groupby("operation", sort=False):
+                    fig.add_trace(go.Bar(
+                        x=group["mapped_type"], y=group["Saving"], name=operation,
+                        marker_color=OPERATION_COLORS.get(operation),
+                        customdata=group[["Jobs", "Break_even"]],
+                        hovertemplate="%{x}<br>Saving per job: ₹%{y:,.0f}<br>Jobs: %{customdata[0]}"
+                                      "<br>Break-even (jobs): %{customdata[1]:,.0f}<extra></extra>"
+                    ))
+                fig.update_layout(
+                    title=f"Average Saving per Job by Vehicle Type - {num_workers} Workers - {selected_hub}",
+                    xaxis_title="Vehicle Type",
+                    yaxis_title="Saving (₹ per job)",
+                    barmode='group',
+                    height=400
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                with st.expander("Show per-vehicle costs"):
+                    st.dataframe(costs_df.round(2))
+                timer.lap("Costs", rows=len(costs_df))
+            if st.checkbox("Compare all hubs"):
+                timer.restart()
+                network_params, _ = model_params()
+                with st.spinner("Costing every hub..."):
+                    network_df = cached_network_costs(file_hash, num_workers, wage, machine_cost, network_params,
+                                                      file_bytes)
+                col1, col2 = st.columns(2)
+                col1.metric("Network Saving (₹)", f"{network_df['Saving (₹)'].sum():,.0f}")
+                col2.metric("Hubs Paying Back within a Year",
+                            int((network_df["Payback Days"] <= 12 * days_per_month).sum()))
+                st.dataframe(network_df.sort_values("Saving (₹)", ascending=False).round(2))
+                timer.lap("All-hub costs", rows=len(network_df))
+            
+            # --- Performance ---
+            if profile:
+                show_performance(timer)
         except Exception as e:
             st.error(f"❌ Error processing file: {str(e)}")
             st.info("Please ensure your CSV has 'Arrival Time', 'Vehicle Type', 'Type', and 'Hub Code' columns.")
@@ -547,6 +1234,9 @@ def main():
         - 14' → Eicher 14 ft (LCV)
         - 17' → Eicher 17 ft
         - 22' → Tata 22 ft Container
+
+        'Arrival Time' may be a full date-time, or an optional 'Arrival Date' column can date
+        plain clock times, to analyze several days of arrivals on one continuous timeline.
         """)
 
 if __name__ == "__main__":
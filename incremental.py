@@ -0,0 +1,330 @@
+"""Incremental updates of a hub schedule when a re-uploaded arrival plan changes only a few rows"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from gantt import (DEFAULT_COLORS, GANTT_MAX_TASKS, build_schedule, map_vehicle_types, pack_lanes, staff_schedule,
+                   unknown_vehicle_types)
+from profiling import DISABLED
+from timeline import (absolute_times, create_horizon_gantt, horizon_bar_trace, horizon_bounds,
+                      set_lane_height, window_rows)
+
+# Columns that identify an arrival row by its content
+KEY_COLUMNS = ["Arrival Time", "Arrival Date", "Vehicle Type", "Type", "Hub Code", "Parcels"]
+# Above this share of added plus removed rows a full rebuild is cheaper than patching
+REBUILD_SHARE = 0.25
+# Gantt windows kept for patching, most recently built last
+MAX_WINDOWS = 8
+_REPEAT_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+def row_keys(df):
+    """64-bit content key of every arrival row, as a unique Index.
+
+    Identical rows (two trucks of the same type at the same time) keep
+    distinct keys by counting repeats; the first of them keeps the plain
+    content hash, so adding a duplicate does not rekey the original. The
+    Index's hash table is built by the uniqueness check and reused by every
+    later lookup against it.
+    """
+    keys = np.zeros(len(df), dtype=np.uint64)
+    for column in KEY_COLUMNS:
+        if column in df.columns:
+            # Hash each distinct value once; factorizing Arrow strings is far cheaper than hashing every row
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            hashes = pd.util.hash_array(np.asarray(uniques, dtype=object), categorize=False)
+            keys = pd.util.hash_array(keys * _REPEAT_MIX + hashes[codes])
+    index = pd.Index(keys)
+    if not index.is_unique:
+        repeat = pd.Series(keys).groupby(keys).cumcount().to_numpy(dtype=np.uint64)
+        index = pd.Index(np.where(repeat > 0, pd.util.hash_array(keys + repeat * _REPEAT_MIX), keys))
+    return index
+
+def merge_unmapped(counts, added, removed):
+    """Unmapped type counts (as in schedule.attrs) with one set of counts added and another taken away"""
+    merged = dict(counts)
+    for label, count in added.items():
+        merged[label] = merged.get(label, 0) + count
+    for label, count in removed.items():
+        merged[label] = merged.get(label, 0) - count
+    return dict(sorted(((label, count) for label, count in merged.items() if count > 0), key=lambda item: -item[1]))
+
+class IncrementalSchedule:
+    """A hub's staffed schedule, its occupancy and Gantt windows, patched by row diffs.
+
+    update(df) matches a re-uploaded hub file to the current one by
+    row_keys. Only added rows are parsed and costed; removed and added jobs
+    are subtracted from and added to a difference array of minutes over the
+    horizon; and Gantt windows already drawn only rebuild the traces whose
+    rows changed. Key matching and renumbering are vectorized passes over
+    the file, but the costing, occupancy and figure work scale with the size
+    of the edit. Mode and params are fixed for the object's lifetime.
+    """
+
+    def __init__(self, df, operation_mode="manual", num_workers=1, params=None, base_date=None):
+        self.operation_mode = operation_mode
+        self.num_workers = num_workers
+        self.params = params
+        self.base_date = pd.Timestamp(base_date if base_date is not None else pd.Timestamp.today()).normalize()
+        self.last_update = None
+        self._rebuild(df)
+
+    def _build(self, df, rows=None):
+        """Schedule of the file's rows at positions rows (all by default), with the file position of each
+        scheduled and each malformed row"""
+        part = df if rows is None else df.iloc[rows]
+        rows = np.arange(len(df)) if rows is None else rows
+        schedule = build_schedule(part, self.operation_mode, self.num_workers, params=self.params)
+        malformed = pd.DataFrame(schedule.attrs["malformed_arrivals"], columns=["Vehicle", "Arrival Time"])
+        return (schedule, rows[part.index.get_indexer(schedule["vehicle"] - 1)],
+                malformed, rows[part.index.get_indexer(malformed["Vehicle"] - 1)])
+
+    def _rebuild(self, df):
+        self._keys = row_keys(df)
+        self._vehicle_types = df["Vehicle Type"]
+        self.schedule, self._schedule_rows, self._malformed, self._malformed_rows = self._build(df)
+        self._unmapped = self.schedule.attrs["unmapped_types"]
+        self._reset_occupancy()
+        self._windows = {}
+
+    def configure(self, num_workers=None, base_date=None):
+        """Change the crew size or the day of undated arrivals, rebuilding occupancy and windows if they change"""
+        base_date = self.base_date if base_date is None else pd.Timestamp(base_date).normalize()
+        num_workers = self.num_workers if num_workers is None else num_workers
+        if num_workers == self.num_workers and base_date == self.base_date:
+            return
+        if num_workers != self.num_workers:
+            attrs = self.schedule.attrs
+            self.schedule = staff_schedule(self.schedule, num_workers)
+            self.schedule.attrs = attrs
+        self.num_workers, self.base_date = num_workers, base_date
+        self._reset_occupancy()
+        self._windows = {}
+
+    def update(self, df, timer=DISABLED):
+        """Bring the schedule up to date with a new upload of the hub's arrivals; returns the schedule.
+
+        last_update records the rows added and removed and whether the edit
+        was big enough to rebuild everything instead.
+        """
+        keys = row_keys(df)
+        if keys.equals(self._keys):
+            self.last_update = {"added": 0, "removed": 0, "rebuilt": False}
+            return self.schedule
+        added = np.flatnonzero(self._keys.get_indexer(keys) < 0)
+        # Where each row of the last upload is in this one, -1 if it is gone
+        moved = keys.get_indexer(self._keys)
+        removed = np.flatnonzero(moved < 0)
+        self.last_update = {"added": len(added), "removed": len(removed), "rebuilt": False}
+        timer.lap("Row matching", rows=len(df))
+        if len(added) + len(removed) > REBUILD_SHARE * max(len(keys), 1):
+            self._rebuild(df)
+            self.last_update["rebuilt"] = True
+            timer.lap("Full rebuild", rows=len(df))
+            return self.schedule
+
+        # Only the added rows are parsed and costed
+        part, part_rows, part_malformed, part_malformed_rows = self._build(df, added)
+        removed_types = self._vehicle_types.iloc[removed]
+        self._unmapped = merge_unmapped(self._unmapped, part.attrs["unmapped_types"],
+                                        unknown_vehicle_types(map_vehicle_types(removed_types), removed_types))
+        self._vehicle_types = df["Vehicle Type"]
+        timer.lap("Time calculation", rows=len(added))
+
+        positions = moved[self._schedule_rows]
+        gone = self.schedule.iloc[np.flatnonzero(positions < 0)]
+        self._patch_occupancy(gone, -1)
+        self._patch_occupancy(part, +1)
+        timer.lap("Occupancy patch", rows=len(part) + len(gone))
+        file_rows = np.asarray(df.index)
+        for window, state in list(self._windows.items()):
+            self._patch_window(window, state, moved, file_rows, part, part_rows)
+        timer.lap("Gantt patch", rows=len(part) + len(gone))
+
+        self.schedule, self._schedule_rows = self._merge(self.schedule, "vehicle", positions, file_rows, part,
+                                                         part_rows)
+        self._malformed, self._malformed_rows = self._merge(self._malformed, "Vehicle", moved[self._malformed_rows],
+                                                            file_rows, part_malformed, part_malformed_rows)
+        self._keys = keys
+        self.schedule.attrs["malformed_arrivals"] = self._malformed.to_dict("records")
+        self.schedule.attrs["unmapped_types"] = self._unmapped
+        timer.lap("Merge", rows=len(df))
+        return self.schedule
+
+    @staticmethod
+    def _merge(frame, vehicle, positions, file_rows, part, part_rows):
+        """Rows of a frame still in the file (positions >= 0) renumbered, and part's rows, in file order.
+
+        Returns the merged frame and each of its rows' file positions.
+        """
+        kept = np.flatnonzero(positions >= 0)
+        rows = np.concatenate([positions[kept], part_rows])
+        order = np.argsort(rows, kind="stable")
+        take = np.concatenate([kept, len(frame) + np.arange(len(part))])[order]
+        merged = pd.concat([frame, part], ignore_index=True).iloc[take].reset_index(drop=True)
+        merged[vehicle] = file_rows[rows[order]] + 1
+        return merged, rows[order]
+
+    # --- Occupancy: one difference array of minutes since self._origin ---
+
+    def _intervals(self, rows):
+        start, end = absolute_times(rows, self.base_date)
+        first = ((start - self._origin.to_datetime64()) // np.timedelta64(1, "m")).astype(np.int64)
+        last = np.maximum(((end - self._origin.to_datetime64()) // np.timedelta64(1, "m")).astype(np.int64),
+                          first + 1)
+        return first, last
+
+    def _reset_occupancy(self):
+        self._origin, horizon_end = horizon_bounds(self.schedule, self.base_date)
+        size = int((horizon_end - self._origin) / pd.Timedelta(minutes=1)) + 1
+        first, last = self._intervals(self.schedule)
+        self._diff = np.bincount(first, minlength=size) - np.bincount(last, minlength=size)
+
+    def _patch_occupancy(self, rows, sign):
+        if rows.empty:
+            return
+        first, last = self._intervals(rows)
+        if first.min() < 0:
+            # Grow the horizon by whole days before the old origin
+            days = -(-int(-first.min()) // 1440)
+            self._diff = np.concatenate([np.zeros(days * 1440, dtype=self._diff.dtype), self._diff])
+            self._origin -= pd.Timedelta(days=days)
+            first, last = first + days * 1440, last + days * 1440
+        if last.max() >= len(self._diff):
+            days = -(-int(last.max() - len(self._diff) + 1) // 1440)
+            self._diff = np.concatenate([self._diff, np.zeros(days * 1440, dtype=self._diff.dtype)])
+        np.add.at(self._diff, first, sign)
+        np.add.at(self._diff, last, -sign)
+
+    def occupancy(self, resolution=60):
+        """timeline.horizon_occupancy of the current schedule, from the patched difference array"""
+        if resolution < 1 or 1440 % resolution:
+            raise ValueError(f"resolution must divide a day into whole bins, got {resolution} minutes")
+        occupancy = np.cumsum(self._diff[:-1])
+        busy = np.flatnonzero(occupancy)
+        # Every job occupies its start minute, so the busy minutes span the horizon's days
+        if len(busy):
+            first_day, last_day = busy[0] // 1440, busy[-1] // 1440 + 1
+            origin = self._origin + pd.Timedelta(days=int(first_day))
+        else:
+            first_day, last_day, origin = 0, 1, self.base_date
+        occupancy = np.pad(occupancy, (0, max(0, last_day * 1440 - len(occupancy))))[first_day * 1440:last_day * 1440]
+        bins = occupancy.reshape(-1, resolution)
+        timeline = pd.DataFrame({
+            "Vehicles": bins.max(axis=1),
+            "Average Vehicles": bins.mean(axis=1).round(2),
+        }, index=pd.date_range(origin, periods=len(bins), freq=f"{resolution}min", name="Time"))
+        peak_minute = int(np.argmax(occupancy))
+        return {
+            "timeline": timeline,
+            "peak": int(occupancy[peak_minute]),
+            "peak_at": origin + pd.Timedelta(minutes=peak_minute),
+        }
+
+    # --- Gantt windows ---
+
+    def gantt(self, window_start, window_end, title, color_by="operation", colors=None, max_tasks=GANTT_MAX_TASKS):
+        """timeline.create_horizon_gantt of one window, kept and patched by later updates.
+
+        Windows with more than max_tasks bars are aggregated and drawn from
+        scratch each time, as in create_horizon_gantt.
+        """
+        window = (pd.Timestamp(window_start), pd.Timestamp(window_end), color_by)
+        state = self._windows.get(window)
+        if state is None:
+            rows = window_rows(self.schedule, window[0], window[1], self.base_date)
+            if rows.empty or len(rows) > max_tasks:
+                return create_horizon_gantt(self.schedule, window[0], window[1], title, color_by, colors,
+                                            self.base_date, max_tasks)
+            rows = self._window_bars(rows, self._schedule_rows, color_by)
+            rows["lane"] = pack_lanes(rows["bar_start"].to_numpy().astype(np.int64),
+                                      rows["bar_end"].to_numpy().astype(np.int64))
+            if isinstance(colors, dict):
+                palette = {str(key): color for key, color in colors.items()}
+            else:
+                palette = dict(zip(pd.unique(rows["group"]), itertools.cycle(colors or DEFAULT_COLORS)))
+            fig = go.Figure()
+            for key, idx in rows.groupby("group", sort=False).indices.items():
+                fig.add_trace(horizon_bar_trace(rows.iloc[idx], rows["lane"].to_numpy()[idx], key, palette.get(key)))
+            fig.update_layout(barmode='overlay', bargap=0.3)
+            fig.update_yaxes(showticklabels=False, autorange='reversed')
+            fig.update_xaxes(type='date', range=[window[0], window[1]], side='top')
+            set_lane_height(fig, int(rows["lane"].max()) + 1)
+            state = {"fig": fig, "rows": rows, "palette": palette, "colors": colors, "max_tasks": max_tasks}
+            self._windows[window] = state
+            while len(self._windows) > MAX_WINDOWS:
+                self._windows.pop(next(iter(self._windows)))
+        state["fig"].update_layout(title=title)
+        return state["fig"]
+
+    @staticmethod
+    def _window_bars(rows, file_rows, color_by):
+        """What a window keeps of its rows (window_rows of a frame with a RangeIndex): file position, hover, group"""
+        return pd.DataFrame({
+            "row": file_rows[rows.index],
+            "vehicle": rows["vehicle"].to_numpy(),
+            "vehicle_type": rows["vehicle_type"].to_numpy(),
+            "group": (rows[color_by] if color_by else pd.Series("Vehicle", index=rows.index)).astype(str).to_numpy(),
+            "bar_start": rows["bar_start"].to_numpy(),
+            "bar_end": rows["bar_end"].to_numpy(),
+        })
+
+    def _patch_window(self, window, state, moved, file_rows, part, part_rows):
+        """Apply one update to a drawn window: drop removed bars, lane in added ones, renumber the rest"""
+        window_start, window_end, color_by = window
+        rows = state["rows"]
+        positions = moved[rows["row"].to_numpy()]
+        touched = set(rows.loc[positions < 0, "group"])
+        rows = rows[positions >= 0]
+        vehicles = file_rows[positions[positions >= 0]] + 1
+        renumbered = not np.array_equal(vehicles, rows["vehicle"].to_numpy())
+        rows = rows.assign(row=positions[positions >= 0], vehicle=vehicles)
+
+        added = self._window_bars(window_rows(part, window_start, window_end, self.base_date), part_rows, color_by)
+        if len(rows) + len(added) > state["max_tasks"] or len(rows) + len(added) == 0:
+            # Redrawn from scratch (aggregated, or None when empty) the next time it is asked for
+            del self._windows[window]
+            return
+        if len(added):
+            bar_start = rows["bar_start"].to_numpy()
+            bar_end = rows["bar_end"].to_numpy()
+            lanes = rows["lane"].to_numpy()
+            new_lanes = []
+            for start, end in zip(added["bar_start"].to_numpy(), added["bar_end"].to_numpy()):
+                # The lowest lane with no bar overlapping this one
+                taken = np.unique(lanes[(bar_start < end) & (bar_end > start)])
+                free = np.flatnonzero(taken != np.arange(len(taken)))
+                lane = int(free[0]) if len(free) else len(taken)
+                new_lanes.append(lane)
+                bar_start, bar_end = np.append(bar_start, start), np.append(bar_end, end)
+                lanes = np.append(lanes, lane)
+            added["lane"] = new_lanes
+            touched |= set(added["group"])
+            rows = pd.concat([rows, added[rows.columns]], ignore_index=True)
+
+        fig = state["fig"]
+        groups = rows.groupby("group", sort=False).indices
+        if any(trace.name not in groups for trace in fig.data):
+            fig.data = tuple(trace for trace in fig.data if trace.name in groups)
+        for trace in fig.data:
+            if trace.name in touched:
+                group = rows.iloc[groups[trace.name]]
+                replacement = horizon_bar_trace(group, group["lane"].to_numpy(), trace.name)
+                trace.update(y=replacement.y, base=replacement.base, x=replacement.x, customdata=replacement.customdata)
+            elif renumbered:
+                # Only the vehicle numbers of an untouched trace change
+                customdata = np.array(trace.customdata, dtype=object)
+                customdata[:, 0] = rows["vehicle"].to_numpy()[groups[trace.name]]
+                trace.customdata = customdata
+        drawn = {trace.name for trace in fig.data}
+        for name in groups:
+            if name not in drawn:
+                if name not in state["palette"] and not isinstance(state["colors"], dict):
+                    palette_colors = state["colors"] or DEFAULT_COLORS
+                    state["palette"][name] = palette_colors[len(state["palette"]) % len(palette_colors)]
+                group = rows.iloc[groups[name]]
+                fig.add_trace(horizon_bar_trace(group, group["lane"].to_numpy(), name, state["palette"].get(name)))
+        if len(rows):
+            set_lane_height(fig, int(rows["lane"].max()) + 1)
+        state["rows"] = rows
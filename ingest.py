@@ -0,0 +1,56 @@
+"""Chunked reading of arrival CSVs too large to load whole"""
+import pandas as pd
+
+ARRIVAL_COLUMNS = ["Arrival Time", "Arrival Date", "Vehicle Type", "Type", "Hub Code", "Parcels"]
+# Compact dtypes: repeated labels as categories; parcel counts stay float64, as build_schedule reads them
+ARRIVAL_DTYPES = {
+    "Arrival Time": "string",
+    "Arrival Date": "string",
+    "Vehicle Type": "category",
+    "Type": "category",
+    "Hub Code": "category",
+    "Parcels": "float64",
+}
+DEFAULT_CHUNKSIZE = 250_000
+
+def read_arrival_chunks(source, hubs=None, chunksize=DEFAULT_CHUNKSIZE, usecols=None):
+    """Yield an arrival CSV in compactly typed chunks, keeping only rows of `hubs`.
+
+    source is a path or file-like object. Filtering happens inside the chunk
+    loop, so memory stays bounded by chunksize however large the file is.
+    Row labels keep counting across chunks, as in one whole-file read.
+    """
+    hubs = None if hubs is None else set(hubs)
+    reader = pd.read_csv(
+        source,
+        dtype=ARRIVAL_DTYPES,
+        usecols=usecols or (lambda column: column in ARRIVAL_COLUMNS),
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            if hubs is not None:
+                chunk = chunk[chunk["Hub Code"].isin(hubs)]
+            if len(chunk):
+                yield chunk
+
+def list_hubs(source, chunksize=DEFAULT_CHUNKSIZE):
+    """Hub codes of a file in order of first appearance, reading only that column.
+
+    Rows with a blank Hub Code belong to no hub and are not listed.
+    """
+    seen = {}
+    for chunk in read_arrival_chunks(source, chunksize=chunksize, usecols=["Hub Code"]):
+        for hub in chunk["Hub Code"].dropna().unique():
+            if str(hub).strip():
+                seen.setdefault(hub, None)
+    return list(seen)
+
+def load_hub(source, hub, chunksize=DEFAULT_CHUNKSIZE):
+    """One hub's arrivals, without ever holding the rest of the network in memory"""
+    chunks = list(read_arrival_chunks(source, hubs=[hub], chunksize=chunksize))
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in ARRIVAL_DTYPES.items()
+                             if column != "Arrival Date"})
+    # Categories differ per chunk; union them so the columns stay categorical
+    return pd.concat(chunks).astype({"Vehicle Type": "category", "Type": "category", "Hub Code": "category"})
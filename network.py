@@ -0,0 +1,139 @@
+"""Network overview: per-hub totals and hub x hour occupancy of every hub from one pass over a file"""
+import numpy as np
+import pandas as pd
+
+from gantt import build_schedule, lower_labels
+from ingest import DEFAULT_CHUNKSIZE, read_arrival_chunks
+from timeline import absolute_times
+
+# Per-hub sums carried from chunk to chunk
+HUB_TOTALS = ["Vehicles", "Skipped", "Loading Hours", "Unloading Hours"]
+SUMMARY_COLUMNS = ["Hub Code"] + HUB_TOTALS + ["Busy Hours", "Peak Vehicles", "Peak Time", "Peak Hour"]
+# Occupancy events of new chunks are merged into the rest once they outnumber them, or this many
+MERGE_MIN_EVENTS = 1_000_000
+NS_PER_MINUTE = 60_000_000_000
+
+def _merge_events(parts):
+    """One (hub, minute, change) event list from several, sorted by hub and minute, one event per pair.
+
+    Changes at the same minute of a hub are summed, and those that cancel
+    out are dropped.
+    """
+    hubs, minutes, changes = (np.concatenate(arrays) for arrays in zip(*parts))
+    if not len(hubs):
+        return hubs, minutes, changes
+    order = np.lexsort((minutes, hubs))
+    hubs, minutes, changes = hubs[order], minutes[order], changes[order]
+    first = np.flatnonzero(np.concatenate([[True], (hubs[1:] != hubs[:-1]) | (minutes[1:] != minutes[:-1])]))
+    changes = np.add.reduceat(changes, first)
+    kept = changes != 0
+    return hubs[first][kept], minutes[first][kept], changes[kept]
+
+def network_overview(source, operation_mode="manual", num_workers=1, params=None, base_date=None, hubs=None,
+                     chunksize=DEFAULT_CHUNKSIZE):
+    """Workload of every hub in an arrival file from one chunked group-by pass.
+
+    Each chunk is costed once for all of its hubs, and the per-hub sums and
+    the vehicles starting and finishing are accumulated keyed by hub, on the
+    continuous timeline of horizon_occupancy. Between chunks only those
+    start and finish events are kept, merged to one per hub and minute, so
+    memory follows the minutes at which something happens rather than
+    hubs x minutes of the horizon; each hub's minute occupancy is then
+    rebuilt one hub at a time. Returns {"summary": one row per hub
+    (SUMMARY_COLUMNS), "hourly": hubs x hour starts of the most vehicles at
+    once, "hourly_average": the same of the average}; Peak Time is the first
+    minute of a hub's peak and Peak Hour its hour of the day. Hours are
+    worker-adjusted busy hours, as in the time table.
+    """
+    base = pd.Timestamp(base_date if base_date is not None else pd.Timestamp.today()).normalize()
+    index = {}
+    totals = np.zeros((0, len(HUB_TOTALS)))
+    # Vehicles starting (+1) and finishing (-1) per hub and minute since the epoch
+    no_events = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32))
+    merged, pending, pending_events = no_events, [], 0
+    first_minute = last_minute = None
+    for chunk in read_arrival_chunks(source, hubs=hubs, chunksize=chunksize):
+        schedule = build_schedule(chunk, operation_mode, num_workers, params=params)
+        codes, chunk_hubs = pd.factorize(chunk["Hub Code"])
+        row_hubs = np.append(np.array([index.setdefault(hub, len(index)) for hub in chunk_hubs], dtype=np.int64),
+                             -1)[codes]
+        hub_ids = row_hubs[chunk.index.get_indexer(schedule["vehicle"] - 1)]
+        kept = hub_ids >= 0
+        hub_ids = hub_ids[kept]
+        n_hubs = len(index)
+        totals = np.pad(totals, ((0, n_hubs - len(totals)), (0, 0)))
+
+        hours = schedule["hours"].to_numpy()[kept]
+        is_loading = lower_labels(schedule["operation"].to_numpy()[kept]) == "loading"
+        vehicles = np.bincount(hub_ids, minlength=n_hubs)
+        totals += np.column_stack([
+            vehicles,
+            np.bincount(row_hubs[row_hubs >= 0], minlength=n_hubs) - vehicles,
+            np.bincount(hub_ids[is_loading], weights=hours[is_loading], minlength=n_hubs),
+            np.bincount(hub_ids[~is_loading], weights=hours[~is_loading], minlength=n_hubs),
+        ])
+        if not len(hub_ids):
+            continue
+
+        start, end = absolute_times(schedule[kept], base)
+        first = start.astype("datetime64[ns]").view(np.int64) // NS_PER_MINUTE
+        last = np.maximum(end.astype("datetime64[ns]").view(np.int64) // NS_PER_MINUTE, first + 1)
+        first_minute = int(first.min()) if first_minute is None else min(first_minute, int(first.min()))
+        last_minute = int(last.max()) if last_minute is None else max(last_minute, int(last.max()))
+        pending.append(_merge_events([(hub_ids, first, np.ones(len(first), dtype=np.int32)),
+                                      (hub_ids, last, np.full(len(last), -1, dtype=np.int32))]))
+        pending_events += len(pending[-1][0])
+        if pending_events > max(len(merged[0]), MERGE_MIN_EVENTS):
+            merged, pending, pending_events = _merge_events([merged] + pending), [], 0
+    event_hubs, event_minutes, changes = _merge_events([merged] + pending)
+
+    if first_minute is None:
+        # Nothing scheduled anywhere: one empty day, as horizon_bounds gives an empty schedule
+        origin, origin_minute, minutes = base, 0, 1440
+    else:
+        origin = pd.Timestamp(first_minute * NS_PER_MINUTE).normalize()
+        origin_minute = origin.value // NS_PER_MINUTE
+        # Whole days past the latest finish, so the horizon ends at a midnight
+        minutes = -(-(last_minute - origin_minute) // 1440) * 1440
+    n_hubs = len(index)
+    hourly = np.zeros((n_hubs, minutes // 60), dtype=np.int32)
+    hourly_average = np.zeros((n_hubs, minutes // 60))
+    peak = np.zeros(n_hubs, dtype=np.int64)
+    peak_minute = np.zeros(n_hubs, dtype=np.int64)
+    bounds = np.searchsorted(event_hubs, np.arange(n_hubs + 1))
+    diff = np.zeros(minutes + 1, dtype=np.int32)
+    for hub in range(n_hubs):
+        events = slice(bounds[hub], bounds[hub + 1])
+        diff[:] = 0
+        diff[event_minutes[events] - origin_minute] = changes[events]
+        occupancy = np.cumsum(diff[:-1], dtype=np.int32)
+        peak_minute[hub] = occupancy.argmax()
+        peak[hub] = occupancy[peak_minute[hub]]
+        bins = occupancy.reshape(-1, 60)
+        hourly[hub] = bins.max(axis=1)
+        hourly_average[hub] = bins.mean(axis=1).round(2)
+
+    hub_index = pd.Index(list(index), name="Hub Code", dtype=object)
+    # A hub with nothing scheduled has no peak
+    peak_at = pd.DatetimeIndex(origin + pd.to_timedelta(peak_minute, unit="min")).where(peak > 0)
+
+    summary = pd.DataFrame(totals, columns=HUB_TOTALS, index=hub_index)
+    summary = summary.astype({"Vehicles": np.int64, "Skipped": np.int64})
+    summary["Busy Hours"] = summary["Loading Hours"] + summary["Unloading Hours"]
+    summary["Peak Vehicles"] = peak
+    summary["Peak Time"] = peak_at
+    summary["Peak Hour"] = pd.array(peak_at.hour, dtype="Int64")
+
+    hour_starts = pd.date_range(origin, periods=minutes // 60, freq="60min", name="Time")
+    return {
+        "summary": summary.reset_index()[SUMMARY_COLUMNS],
+        "hourly": pd.DataFrame(hourly, index=hub_index, columns=hour_starts),
+        "hourly_average": pd.DataFrame(hourly_average, index=hub_index, columns=hour_starts),
+    }
+
+def hub_profile(overview, hub):
+    """One hub's hourly occupancy from a network_overview, in horizon_occupancy's timeline layout"""
+    return pd.DataFrame({
+        "Vehicles": overview["hourly"].loc[hub],
+        "Average Vehicles": overview["hourly_average"].loc[hub],
+    }).rename_axis("Time")
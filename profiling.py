@@ -0,0 +1,75 @@
+"""Per-stage timing of the analysis pipeline for the app's Performance panel and batch profiles"""
+import json
+import time
+
+import pandas as pd
+
+def figure_size(fig):
+    """Points drawn and JSON payload bytes of a plotly figure, roughly what the browser is sent"""
+    points = sum(len(trace.x) for trace in fig.data if trace.x is not None)
+    return {"points": points, "figure_bytes": len(fig.to_json())}
+
+class StageTimer:
+    """Wall time and counts of each named stage of one pipeline run.
+
+    lap(stage) charges the time since the previous lap to that stage, so a
+    run is instrumented with one call after each step; laps of a stage that
+    repeats (one per chunk, say) add up into one record. A disabled timer
+    returns from lap() straight away and records nothing, so the calls can
+    stay in the code paths for good.
+    """
+
+    def __init__(self, enabled=True, **context):
+        self.enabled = enabled
+        self.context = context
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def restart(self):
+        """Start the next lap now, leaving the time since the last one unrecorded"""
+        if self.enabled:
+            self._last = time.perf_counter()
+
+    def lap(self, stage, figure=None, **counts):
+        """Record the time since the previous lap against stage, with counts such as rows=...
+
+        figure adds the plotly figure's point count and payload size; sizing
+        it is not charged to any stage.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if figure is not None:
+            counts.update(figure_size(figure))
+        record = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+        record["seconds"] += now - self._last
+        record["calls"] += 1
+        for name, value in counts.items():
+            record[name] = record.get(name, 0) + value
+        self._last = time.perf_counter()
+
+    @property
+    def total_seconds(self):
+        return sum(record["seconds"] for record in self.stages.values())
+
+    def records(self):
+        """One dict per stage, with the timer's context (e.g. hub) on each"""
+        return [{**self.context, "stage": stage, **record} for stage, record in self.stages.items()]
+
+    def to_json(self):
+        return json.dumps(self.records())
+
+    def to_frame(self):
+        """Stages as a table for display, with each stage's share of the run"""
+        frame = pd.DataFrame(self.records(), columns=["stage", "seconds", "calls", "rows", "points", "figure_bytes"])
+        return pd.DataFrame({
+            "Stage": frame["stage"],
+            "Time (ms)": (frame["seconds"] * 1000).round(1),
+            "Share": (frame["seconds"] / max(self.total_seconds, 1e-12)).map("{:.0%}".format),
+            "Rows": frame["rows"].astype("Int64"),
+            "Points Drawn": frame["points"].astype("Int64"),
+            "Figure (KB)": (frame["figure_bytes"] / 1024).round(1),
+        })
+
+# Shared do-nothing timer for code paths called without one
+DISABLED = StageTimer(enabled=False)
@@ -0,0 +1,234 @@
+"""Persistent Arrow cache of costed schedules, one memory-mappable file per hub"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from gantt import (FATIGUE_THRESHOLDS, MACHINE_BUFFER, OPTIMIZED_PARAMS, VEHICLE_MAPPING, VEHICLES, build_schedule,
+                   compile_cost_model, compute_operation_times, map_vehicle_types, staff_schedule)
+from ingest import DEFAULT_CHUNKSIZE, read_arrival_chunks
+from profiling import DISABLED
+
+SCHEDULE_CACHE_DIR = os.environ.get("SCHEDULE_CACHE_DIR", ".schedule_cache")
+SCHEDULE_CACHE_MAX_ENTRIES = 20
+# Staging directories untouched for this long belong to a writer that was killed
+STAGING_MAX_AGE_SECONDS = 6 * 3600
+OPERATION_MODES = ["manual", "machine"]
+
+# Stored per row; hours/end_min/wraps depend on the worker count and are derived on load
+SCHEDULE_SCHEMA = pa.schema([
+    ("vehicle", pa.int64()),
+    ("arrival_time", pa.string()),
+    ("vehicle_type", pa.string()),
+    ("mapped_type", pa.string()),
+    ("operation", pa.string()),
+    ("parcels", pa.float64()),
+    ("default_parcels", pa.float64()),
+    ("start_min", pa.int64()),
+    ("arrival_date", pa.timestamp("ns")),
+    ("base_hours_manual", pa.float64()),
+    ("base_hours_machine", pa.float64()),
+])
+# Column order of build_schedule before staffing
+SCHEDULE_COLUMNS = ["vehicle", "arrival_time", "vehicle_type", "mapped_type", "operation", "parcels",
+                    "default_parcels", "base_hours", "start_min", "arrival_date"]
+
+# Schedule attrs kept per hub in the manifest
+SCHEDULE_ATTRS = ["malformed_arrivals", "unmapped_types"]
+
+def model_fingerprint(params=None):
+    """Hash of everything the costing depends on besides the arrival file"""
+    params = OPTIMIZED_PARAMS if params is None else params
+    model = {"params": params, "vehicles": VEHICLES, "mapping": VEHICLE_MAPPING,
+             "fatigue_thresholds": FATIGUE_THRESHOLDS.tolist(), "machine_buffer": MACHINE_BUFFER,
+             "schema": SCHEDULE_SCHEMA.names, "attrs": SCHEDULE_ATTRS}
+    return hashlib.sha256(json.dumps(model, sort_keys=True).encode()).hexdigest()
+
+def cache_entry_dir(file_hash, root=SCHEDULE_CACHE_DIR, params=None):
+    """Directory holding the cached schedules of one file under the current model"""
+    return os.path.join(root, f"{file_hash[:24]}-{model_fingerprint(params)[:16]}")
+
+def _hub_path(entry_dir, hub):
+    return os.path.join(entry_dir, f"hub={quote(str(hub), safe='')}.arrow")
+
+def _to_batch(schedule):
+    """Arrow record batch of a schedule's stored columns"""
+    return pa.RecordBatch.from_pandas(schedule[SCHEDULE_SCHEMA.names], schema=SCHEDULE_SCHEMA,
+                                      preserve_index=False)
+
+def write_schedule_cache(source, file_hash, root=SCHEDULE_CACHE_DIR, chunksize=DEFAULT_CHUNKSIZE, params=None,
+                         timer=DISABLED):
+    """Cost every hub of an arrival file once and store each hub's schedule.
+
+    Reads the file in chunks and appends each chunk's rows to per-hub Arrow
+    IPC files, so memory stays bounded by chunksize. Both operation modes'
+    base hours are stored, so either can be loaded. The entry is written to a
+    temporary directory and renamed into place whole; when another writer
+    published the same entry first, theirs is kept and this one discarded,
+    since entries are keyed by content. params replaces
+    OPTIMIZED_PARAMS and is part of the cache key. timer (a
+    profiling.StageTimer) gets the CSV read, time calculation and cache
+    write laps of every chunk. Returns its manifest.
+    """
+    entry_dir = cache_entry_dir(file_hash, root, params)
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=root, prefix=".staging-")
+    writers = {}
+    manifest = {"file_hash": file_hash, "model": model_fingerprint(params), "hubs": {}}
+    try:
+        timer.restart()
+        for chunk in read_arrival_chunks(source, chunksize=chunksize):
+            timer.lap("CSV read", rows=len(chunk))
+            schedule = build_schedule(chunk, "manual", params=params)
+            schedule["base_hours_manual"] = schedule["base_hours"]
+            schedule["base_hours_machine"] = compute_operation_times(
+                schedule["mapped_type"], schedule["operation"], "machine", schedule["parcels"], params
+            )
+            timer.lap("Time calculation", rows=len(schedule))
+            # Schedule rows carry their file row number, which finds their hub again
+            hub_ids, chunk_hubs = pd.factorize(chunk["Hub Code"])
+            hub_ids = pd.Series(hub_ids, index=chunk.index)
+            skipped = pd.DataFrame(schedule.attrs["malformed_arrivals"], columns=["Vehicle", "Arrival Time"])
+            skipped_ids = hub_ids.loc[skipped["Vehicle"] - 1].to_numpy()
+            kept_ids = hub_ids.loc[schedule["vehicle"] - 1].to_numpy()
+            unmapped = pd.Series(dtype=np.int64)
+            if schedule.attrs["unmapped_types"]:
+                unknown = compile_cost_model(params).vehicle_codes(map_vehicle_types(chunk["Vehicle Type"])) < 0
+                unmapped = pd.DataFrame({
+                    "hub": hub_ids.to_numpy()[unknown],
+                    "type": chunk["Vehicle Type"].to_numpy(dtype=object)[unknown],
+                }).fillna({"type": "(missing)"}).value_counts()
+            # Convert the chunk once, sorted by hub, and hand each hub a zero-copy slice
+            order = np.argsort(kept_ids, kind="stable")
+            bounds = np.searchsorted(kept_ids[order], np.arange(len(chunk_hubs) + 1))
+            batch = _to_batch(schedule.iloc[order])
+
+            for k, hub in enumerate(chunk_hubs):
+                info = manifest["hubs"].setdefault(str(hub), {"hub": hub, "rows": 0, "malformed_arrivals": [],
+                                                              "unmapped_types": {}})
+                if k in unmapped.index.get_level_values(0):
+                    for vehicle_type, count in unmapped.loc[k].items():
+                        info["unmapped_types"][str(vehicle_type)] = (info["unmapped_types"].get(str(vehicle_type), 0)
+                                                                     + int(count))
+                if np.any(skipped_ids == k):
+                    info["malformed_arrivals"].extend(
+                        {"Vehicle": int(v), "Arrival Time": str(t)}
+                        for v, t in skipped[skipped_ids == k].itertuples(index=False)
+                    )
+                if hub not in writers:
+                    writers[hub] = pa.ipc.new_file(_hub_path(staging, hub), SCHEDULE_SCHEMA)
+                rows = bounds[k + 1] - bounds[k]
+                if rows:
+                    writers[hub].write_batch(batch.slice(bounds[k], rows))
+                    info["rows"] += int(rows)
+            timer.lap("Cache write")
+        for writer in writers.values():
+            writer.close()
+        writers = {}
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f, default=str)
+        try:
+            # Renaming onto a missing directory is atomic: readers see the whole entry or none of it
+            os.rename(staging, entry_dir)
+        except OSError:
+            # Lost the race to a concurrent writer of the same file and model: a hit
+            if read_manifest(file_hash, root, params) is None:
+                raise
+        timer.lap("Cache write")
+    finally:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(staging, ignore_errors=True)
+    prune_schedule_cache(root)
+    return manifest
+
+def read_manifest(file_hash, root=SCHEDULE_CACHE_DIR, params=None):
+    """Manifest of a cached file, or None when it is not cached under the current model"""
+    path = os.path.join(cache_entry_dir(file_hash, root, params), "manifest.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def load_cached_schedule(file_hash, hub, operation_mode="manual", num_workers=1, root=SCHEDULE_CACHE_DIR,
+                         params=None, timer=DISABLED):
+    """One hub's schedule from the cache, or None on a miss.
+
+    The hub's Arrow file is memory-mapped and read without copying; only the
+    conversion to pandas touches the data, and other hubs are never read.
+    """
+    manifest = read_manifest(file_hash, root, params)
+    if manifest is None or str(hub) not in manifest["hubs"]:
+        return None
+    entry_dir = cache_entry_dir(file_hash, root, params)
+    try:
+        with pa.memory_map(_hub_path(entry_dir, hub)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        os.utime(entry_dir)  # most recently used, for pruning
+    except FileNotFoundError:
+        # Pruned by another process since the manifest was read
+        return None
+    schedule = table.to_pandas()
+    schedule["base_hours"] = schedule[f"base_hours_{operation_mode}"]
+    schedule = schedule[SCHEDULE_COLUMNS]
+    for name in SCHEDULE_ATTRS:
+        schedule.attrs[name] = manifest["hubs"][str(hub)][name]
+    schedule = staff_schedule(schedule, num_workers)
+    timer.lap("Hub load", rows=len(schedule))
+    return schedule
+
+def hub_schedule(source, file_hash, hub, operation_mode="manual", num_workers=1, root=SCHEDULE_CACHE_DIR,
+                 params=None, timer=DISABLED):
+    """One hub's schedule, costing and caching the whole file first on a miss"""
+    timer.restart()
+    schedule = load_cached_schedule(file_hash, hub, operation_mode, num_workers, root, params, timer)
+    if schedule is None:
+        timer.lap("Cache lookup")
+        write_schedule_cache(source, file_hash, root, params=params, timer=timer)
+        schedule = load_cached_schedule(file_hash, hub, operation_mode, num_workers, root, params, timer)
+    return schedule
+
+def _last_modified(path):
+    """Latest mtime of a directory and the files directly in it"""
+    with os.scandir(path) as entries:
+        return max([os.path.getmtime(path)] + [entry.stat().st_mtime for entry in entries])
+
+def prune_schedule_cache(root=SCHEDULE_CACHE_DIR, max_entries=SCHEDULE_CACHE_MAX_ENTRIES,
+                         staging_max_age=STAGING_MAX_AGE_SECONDS):
+    """Delete all but the max_entries most recently used cache entries.
+
+    An entry is renamed out of the way before it is deleted, so no reader
+    ever finds one half deleted. Staging directories of writers that were
+    killed (untouched for staging_max_age seconds) and trash left by an
+    interrupted delete are removed too.
+    """
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if name.startswith(".trash-"):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.startswith(".staging-"):
+                if time.time() - _last_modified(path) > staging_max_age:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif not name.startswith("."):
+                entries.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            continue  # published or pruned by another process meanwhile
+    entries.sort(reverse=True)
+    for _, entry in entries[max_entries:]:
+        trash = os.path.join(root, f".trash-{uuid.uuid4().hex}")
+        try:
+            os.rename(entry, trash)
+        except OSError:
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
@@ -0,0 +1,442 @@
+"""Local HTTP service answering cost model, occupancy and Gantt queries as JSON.
+
+Usage: python service.py [ARRIVALS.csv] [--port 8080] [--jobs 4] [--warm HUB1,HUB2]
+
+Endpoints (every response is JSON):
+  GET  /health                  status and request counters
+  POST /estimate                one arrival {"vehicle_type", "operation", "parcels"} or {"arrivals": [...]},
+                                with optional "mode", "workers" and "hub" (whose calibration to use)
+  GET  /hubs                    hub codes of the arrival file the service was started with
+  GET  /hubs/HUB/occupancy      ?mode=manual&workers=1&resolution=60&date=YYYY-MM-DD
+  GET  /hubs/HUB/gantt          ?mode=manual&workers=1&start=...&end=...&date=YYYY-MM-DD
+  POST /occupancy, POST /gantt  the same for {"arrivals": [...], ...} posted in the body
+
+Arrivals use the CSV columns in snake case: arrival_time, arrival_date,
+vehicle_type, operation (the 'Type' column) and parcels. Heavy requests run
+on a process pool; identical requests in flight at the same time are
+computed once; each worker keeps its most recently queried hub schedules.
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from calibration import CALIBRATION_DIR, model_params
+from gantt import build_schedule, compute_operation_times, file_digest, map_vehicle_types, pack_lanes, staff_schedule
+from ingest import list_hubs
+from schedule_cache import OPERATION_MODES, load_cached_schedule, read_manifest, write_schedule_cache
+from timeline import horizon_bounds, horizon_occupancy, window_rows
+
+DEFAULT_PORT = 8080
+# JSON arrival fields and the CSV columns they stand for
+ARRIVAL_FIELDS = {"arrival_time": "Arrival Time", "arrival_date": "Arrival Date", "vehicle_type": "Vehicle Type",
+                  "operation": "Type", "parcels": "Parcels"}
+# Requests with at most this many arrivals are answered on the event loop instead of the pool
+INLINE_MAX_ARRIVALS = 64
+# Hub schedules each worker keeps in memory, most recently queried first to stay
+HUB_CACHE_SIZE = 16
+MAX_BODY_BYTES = 64 * 2**20
+
+class ServiceError(Exception):
+    """A request the service cannot answer, with the HTTP status to answer it with"""
+
+    def __init__(self, status, message):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+# --- Work done per request, in the event loop or a pool worker ---
+
+_arrival_file = {"path": None, "file_hash": None, "build_lock": None}
+
+def init_worker(path, file_hash, warm_hubs=(), build_lock=None):
+    """Pool initializer: remember the arrival file and load the hubs to keep warm.
+
+    build_lock, shared by every process of the service, lets only one of
+    them cost the file into the schedule cache at a time.
+    """
+    _arrival_file.update(path=path, file_hash=file_hash, build_lock=build_lock)
+    for hub in warm_hubs:
+        for operation_mode in OPERATION_MODES:
+            cached_hub_schedule(hub, operation_mode, calibration_stamp())
+
+def calibration_stamp():
+    """Changes whenever a calibration is saved, so cached parameters and schedules are not stale"""
+    try:
+        return os.stat(CALIBRATION_DIR).st_mtime_ns
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=256)
+def hub_params(hub, stamp):
+    """model_params of a hub, read from disk once per calibration stamp"""
+    return model_params(hub)[0]
+
+@functools.lru_cache(maxsize=HUB_CACHE_SIZE)
+def cached_hub_schedule(hub, operation_mode, stamp):
+    """Single-worker schedule of one hub of the arrival file, through the on-disk schedule cache"""
+    if _arrival_file["path"] is None:
+        raise ServiceError(HTTPStatus.NOT_FOUND, "the service was started without an arrival file")
+    params = hub_params(hub, stamp)
+    schedule = load_cached_schedule(_arrival_file["file_hash"], hub, operation_mode, params=params)
+    if schedule is None and read_manifest(_arrival_file["file_hash"], params=params) is None:
+        # Costing the whole file is only worth doing once: the other processes wait, then find its entry
+        with _arrival_file["build_lock"] or contextlib.nullcontext():
+            if read_manifest(_arrival_file["file_hash"], params=params) is None:
+                write_schedule_cache(_arrival_file["path"], _arrival_file["file_hash"], params=params)
+        schedule = load_cached_schedule(_arrival_file["file_hash"], hub, operation_mode, params=params)
+    if schedule is None:
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"no hub {hub!r} in the arrival file")
+    return schedule
+
+def build_schedule_caches(path, file_hash, hubs):
+    """Cost the arrival file into the schedule cache once for every parameter set its hubs use.
+
+    Hubs without a calibration of their own share the network's parameters,
+    so this is usually a single pass over the file.
+    """
+    stamp = calibration_stamp()
+    param_sets = {json.dumps(hub_params(hub, stamp), sort_keys=True): hub_params(hub, stamp) for hub in hubs}
+    for params in param_sets.values():
+        if read_manifest(file_hash, params=params) is None:
+            write_schedule_cache(path, file_hash, params=params)
+    return len(param_sets)
+
+def arrivals_frame(arrivals):
+    """Posted arrivals as an arrival DataFrame with the CSV column names"""
+    if not isinstance(arrivals, list) or not all(isinstance(row, dict) for row in arrivals):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "'arrivals' must be a list of objects")
+    if not arrivals:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "'arrivals' is empty; post at least one arrival")
+    df = pd.DataFrame.from_records(arrivals, columns=[field for field in ARRIVAL_FIELDS
+                                                      if any(field in row for row in arrivals[:1000])])
+    return df.rename(columns=ARRIVAL_FIELDS)
+
+def query_schedule(query):
+    """Staffed schedule a query asks about: a hub of the arrival file or posted arrivals"""
+    stamp = calibration_stamp()
+    if query.get("arrivals") is not None:
+        df = arrivals_frame(query["arrivals"])
+        missing = [field for field in ("arrival_time", "vehicle_type", "operation")
+                   if ARRIVAL_FIELDS[field] not in df.columns]
+        if missing:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"arrivals need {', '.join(missing)}")
+        return build_schedule(df, query["mode"], query["workers"], params=hub_params(query.get("hub"), stamp))
+    return staff_schedule(cached_hub_schedule(query["hub"], query["mode"], stamp), query["workers"])
+
+def _parcel_count(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+def estimate(query):
+    """Hours of each arrival's own operation; null (and counted as unknown) where it cannot be costed.
+
+    Works on plain arrays rather than a DataFrame: a single estimate is
+    dominated by per-call overhead, not by the costing itself.
+    """
+    single = query.get("arrivals") is None
+    arrivals = [query["arrival"]] if single else query["arrivals"]
+    if not isinstance(arrivals, list) or not all(isinstance(row, dict) for row in arrivals):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "'arrivals' must be a list of objects")
+    vehicle_types = np.array([row.get("vehicle_type") for row in arrivals], dtype=object)
+    operations = np.array([row.get("operation") for row in arrivals], dtype=object)
+    parcels = np.array([_parcel_count(row.get("parcels")) for row in arrivals], dtype=float)
+    mapped = np.asarray(map_vehicle_types(vehicle_types), dtype=object)
+    hours = compute_operation_times(mapped, operations, query["mode"], parcels,
+                                    hub_params(query.get("hub"), calibration_stamp())) / query["workers"]
+    unknown = np.isnan(hours)
+    columns = {
+        "vehicle_type": vehicle_types,
+        "mapped_type": np.where(pd.isna(mapped), None, mapped),
+        "operation": operations,
+        "hours": np.where(unknown, None, np.round(hours, 4)),
+        "minutes": np.where(unknown, None, np.round(hours * 60, 1)),
+    }
+    estimates = [dict(zip(columns, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+    if single:
+        return {**estimates[0], "mode": query["mode"], "workers": query["workers"]}
+    return {
+        "mode": query["mode"],
+        "workers": query["workers"],
+        "count": len(estimates),
+        "unknown": int(unknown.sum()),
+        "total_hours": round(float(np.nansum(hours)), 2),
+        "estimates": estimates,
+    }
+
+def occupancy(query):
+    """Vehicles worked at once per bin over the schedule's horizon"""
+    schedule = query_schedule(query)
+    result = horizon_occupancy(schedule, query["resolution"], query["date"])
+    timeline = result["timeline"]
+    return {
+        "hub": query.get("hub"),
+        "mode": query["mode"],
+        "workers": query["workers"],
+        "resolution": query["resolution"],
+        "scheduled": len(schedule),
+        "peak": result["peak"],
+        "peak_at": result["peak_at"].isoformat(),
+        "timeline": pd.DataFrame({
+            "time": timeline.index.strftime("%Y-%m-%dT%H:%M"),
+            "vehicles": timeline["Vehicles"].to_numpy(),
+            "average_vehicles": timeline["Average Vehicles"].to_numpy(),
+        }).to_dict("records"),
+    }
+
+def gantt(query):
+    """Bars of one window (the horizon's first day by default), clipped to it and packed into lanes"""
+    schedule = query_schedule(query)
+    horizon_start, _ = horizon_bounds(schedule, query["date"])
+    window_start = query["start"] if query["start"] is not None else horizon_start
+    window_end = query["end"] if query["end"] is not None else window_start + pd.Timedelta(days=1)
+    if window_end <= window_start:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "end must be after start")
+    rows = window_rows(schedule, window_start, window_end, query["date"])
+    lanes = pack_lanes(rows["bar_start"].to_numpy().astype(np.int64), rows["bar_end"].to_numpy().astype(np.int64))
+    bars = pd.DataFrame({
+        "vehicle": rows["vehicle"].to_numpy(),
+        "vehicle_type": rows["vehicle_type"].to_numpy(dtype=object),
+        "operation": rows["operation"].to_numpy(dtype=object),
+        "start": pd.DatetimeIndex(rows["bar_start"]).strftime("%Y-%m-%dT%H:%M"),
+        "end": pd.DatetimeIndex(rows["bar_end"]).strftime("%Y-%m-%dT%H:%M"),
+        "lane": lanes,
+    })
+    return {
+        "hub": query.get("hub"),
+        "mode": query["mode"],
+        "workers": query["workers"],
+        "window_start": window_start.isoformat(),
+        "window_end": window_end.isoformat(),
+        "lanes": int(lanes.max()) + 1 if len(lanes) else 0,
+        "bars": bars.to_dict("records"),
+    }
+
+def answer(handler, query):
+    """Run a handler and encode its answer, so the pool sends back bytes rather than objects"""
+    return json.dumps(handler(query), allow_nan=False).encode()
+
+# --- Request parsing ---
+
+def _timestamp(value, name):
+    try:
+        return None if value in (None, "") else pd.Timestamp(value)
+    except (TypeError, ValueError):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"{name} is not a date-time: {value!r}") from None
+
+def parse_query(fields):
+    """Validate and normalise a request's options, from the URL query and/or a JSON body"""
+    mode = str(fields.get("mode", "manual")).lower()
+    if mode not in OPERATION_MODES:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"mode must be one of {', '.join(OPERATION_MODES)}")
+    try:
+        workers = int(fields.get("workers", 1))
+        resolution = int(fields.get("resolution", 60))
+    except (TypeError, ValueError):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "workers and resolution must be whole numbers") from None
+    if workers < 1:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "workers must be at least 1")
+    if resolution < 1 or 1440 % resolution:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "resolution must divide a day into whole minutes")
+    if not isinstance(fields.get("hub", ""), (str, type(None))):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "hub must be a hub code string")
+    date = _timestamp(fields.get("date"), "date")
+    return {
+        **fields,
+        "mode": mode,
+        "workers": workers,
+        "resolution": resolution,
+        "date": None if date is None else date.normalize(),
+        "start": _timestamp(fields.get("start"), "start"),
+        "end": _timestamp(fields.get("end"), "end"),
+    }
+
+def arrival_count(query):
+    return 1 if query.get("arrivals") is None else len(query["arrivals"])
+
+# --- HTTP server ---
+
+class ScheduleService:
+    """asyncio HTTP/1.1 server in front of a process pool of schedule workers.
+
+    Requests identical to one still being computed wait for its answer
+    instead of queueing a second computation.
+    """
+
+    def __init__(self, path=None, jobs=None, warm_hubs=(), log=print):
+        self.path = path
+        self.log = log
+        self.file_hash = None
+        self.hubs = []
+        if path is not None:
+            with open(path, "rb") as f:
+                self.file_hash = file_digest(f.read())
+            self.hubs = [str(hub) for hub in list_hubs(path)]
+            # Before any request, so the workers never all cost the same file at once
+            started = time.perf_counter()
+            param_sets = build_schedule_caches(path, self.file_hash, self.hubs)
+            log(f"Schedule cache ready for {len(self.hubs)} hub(s) and {param_sets} parameter set(s) "
+                f"in {time.perf_counter() - started:.1f}s")
+        build_lock = multiprocessing.Lock()
+        init_worker(path, self.file_hash, build_lock=build_lock)
+        self.jobs = jobs or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=init_worker,
+                                        initargs=(path, self.file_hash, tuple(warm_hubs), build_lock))
+        self.inflight = {}
+        self.counters = {"requests": 0, "computed": 0, "coalesced": 0, "errors": 0}
+        self.started = time.time()
+
+    async def compute(self, handler, query, key):
+        """A handler's encoded answer, shared with identical requests already in flight"""
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(future)
+        self.counters["computed"] += 1
+        if arrival_count(query) <= INLINE_MAX_ARRIVALS and (handler is estimate or query.get("arrivals")):
+            # Small costings are quicker here than a round trip to the pool
+            return answer(handler, query)
+        future = asyncio.get_running_loop().run_in_executor(self.pool, answer, handler, query)
+        self.inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.inflight.pop(key, None)
+
+    async def route(self, method, target, body):
+        """(status, JSON bytes) for one request"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        fields = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if body:
+            try:
+                posted = json.loads(body)
+            except ValueError:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, "the body is not valid JSON") from None
+            if not isinstance(posted, dict):
+                raise ServiceError(HTTPStatus.BAD_REQUEST, "the body must be a JSON object")
+            fields.update(posted)
+
+        if parts == ["health"] and method == "GET":
+            return HTTPStatus.OK, json.dumps({
+                "status": "ok", "arrival_file": self.path, "hubs": len(self.hubs),
+                "uptime_s": round(time.time() - self.started, 1), "in_flight": len(self.inflight),
+                **self.counters,
+            }).encode()
+        if parts == ["hubs"] and method == "GET":
+            return HTTPStatus.OK, json.dumps({"hubs": self.hubs}).encode()
+        if parts == ["estimate"] and method == "POST":
+            handler = estimate
+            if "arrivals" not in fields:
+                fields = {"arrival": {name: fields[name] for name in ARRIVAL_FIELDS if name in fields}, **fields}
+        elif len(parts) == 3 and parts[0] == "hubs" and parts[2] in ("occupancy", "gantt") and method == "GET":
+            handler = occupancy if parts[2] == "occupancy" else gantt
+            fields["hub"] = parts[1]
+            if self.path is not None and parts[1] not in self.hubs:
+                raise ServiceError(HTTPStatus.NOT_FOUND, f"no hub {parts[1]!r} in the arrival file")
+        elif parts in (["occupancy"], ["gantt"]) and method == "POST":
+            handler = occupancy if parts[0] == "occupancy" else gantt
+            if "arrivals" not in fields:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, "post {\"arrivals\": [...]} or GET /hubs/HUB/...")
+        elif parts and parts[0] in ("health", "hubs", "estimate", "occupancy", "gantt"):
+            raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not supported on {url.path}")
+        else:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"no endpoint {url.path}")
+
+        query = parse_query(fields)
+        key = (handler.__name__, json.dumps(fields, sort_keys=True, default=str))
+        return HTTPStatus.OK, await self.compute(handler, query, key)
+
+    async def handle(self, reader, writer):
+        """Serve one connection, keeping it open between requests unless the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, b'{"error": "request body too large"}'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.respond(method.upper(), target, body)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode("latin-1") + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target, body):
+        """route(), with errors turned into JSON error answers"""
+        self.counters["requests"] += 1
+        try:
+            return await self.route(method, target, body)
+        except ServiceError as e:
+            status, message = HTTPStatus(e.status), e.message
+        except Exception as e:  # a bug or bad data in one request must not take the service down
+            status, message = HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}"
+            self.log(f"{method} {target} failed: {message}")
+        self.counters["errors"] += 1
+        return status, json.dumps({"error": message}).encode()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        self.log(f"Serving on http://{host}:{port} with {self.jobs} worker(s)"
+                 + (f"; {len(self.hubs)} hub(s) from {self.path}" if self.path else ""))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve cost, occupancy and Gantt queries as JSON over HTTP.")
+    parser.add_argument("arrivals", nargs="?", default=None, help="arrival CSV whose hubs /hubs/... answers for")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--warm", default="", help="comma-separated hubs every worker loads at start")
+    args = parser.parse_args(argv)
+
+    service = ScheduleService(args.arrivals, args.jobs, [hub for hub in args.warm.split(",") if hub])
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
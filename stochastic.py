@@ -0,0 +1,150 @@
+"""Monte Carlo spread of a hub's durations and workload under uncertain parameters"""
+import numpy as np
+import pandas as pd
+
+from gantt import (FATIGUE_THRESHOLDS, MACHINE_BUFFER, OPTIMIZED_PARAMS, VEHICLES, lower_labels,
+                   minute_occupancy)
+from timeline import horizon_minutes
+
+# Log-scale standard deviation of each varying parameter around its value in
+# params, which becomes the median. Geometry (alpha) is not uncertain.
+PARAM_SPREAD = {"fatigue": 0.10, "v_walk": 0.15, "v_load": 0.15, "delay": 0.20, "tturn": 0.20}
+DEFAULT_PERCENTILES = (10, 50, 90)
+# Scenario rows are drawn in chunks of about this many (scenario, vehicle or minute) cells
+MAX_CHUNK_ELEMENTS = 2_000_000
+# Slower scenarios may run past the horizon's last midnight by up to this much; longer work is cut off
+SPILL_MINUTES = 1440
+
+def _vehicle_arrays(schedule):
+    """Per-row vehicle length, parcels, fatigue tier and operation (0 loading, 1 unloading)"""
+    types = pd.Index([v["type"] for v in VEHICLES]).get_indexer(schedule["mapped_type"])
+    length = np.array([v["L"] for v in VEHICLES], dtype=float)[types]
+    parcels = schedule["parcels"].to_numpy(dtype=float)
+    n = np.where(np.isnan(parcels), schedule["default_parcels"].to_numpy(dtype=float), parcels)
+    tier = np.minimum(np.searchsorted(FATIGUE_THRESHOLDS, n, side="left"), len(FATIGUE_THRESHOLDS))
+    operation = (lower_labels(schedule["operation"]) == "unloading").astype(np.int64)
+    return types, length, n, tier, operation
+
+def _hours_per_parcel(noise, length, tier, operation, operation_mode, params, spread):
+    """Hours per parcel for one worker, with noise[k] the standard normal draws of each PARAM_SPREAD entry.
+
+    Broadcasts: noise is (5, ...) and the vehicle arrays match its trailing shape.
+    """
+    fatigue = np.array([params["f1"], params["f2"], params["f3"], params["f4"]])[tier]
+    fm = fatigue * np.exp(spread["fatigue"] * noise[0])
+    delay = np.array([params["d_load"], params["d_unld"]])[operation] * np.exp(spread["delay"] * noise[3])
+    tturn = params["tturn"] * np.exp(spread["tturn"] * noise[4])
+    if operation_mode == "manual":
+        v_walk = params["v_walk"] * np.exp(spread["v_walk"] * noise[1])
+        v_load = params["v_load"] * np.exp(spread["v_load"] * noise[2])
+        walk = length * 0.3048 * params["alpha"] * (1 / v_walk + 1 / v_load)
+        return (walk + delay + tturn) * fm / 3600
+    return (delay + tturn) * fm / 3600 * MACHINE_BUFFER
+
+def _scenario_noise(seed, first, count, size, stream=0):
+    """Standard normal draws of scenarios first..first+count-1, shape (5, count, size).
+
+    Every scenario has its own stream derived from the seed, so results do
+    not depend on how scenarios are chunked.
+    """
+    noise = np.empty((len(PARAM_SPREAD), count, size))
+    for row, s in enumerate(range(first, first + count)):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(stream, s)))
+        noise[:, row] = rng.standard_normal((len(PARAM_SPREAD), size))
+    return noise
+
+def monte_carlo(schedule, operation_mode="manual", num_workers=1, params=None, scenarios=1000, seed=0,
+                spread=None, percentiles=DEFAULT_PERCENTILES, max_elements=MAX_CHUNK_ELEMENTS, base_date=None):
+    """Percentile bands of durations, hourly occupancy and peak concurrency.
+
+    Each scenario redraws fatigue, walking speeds, handling delay and turn
+    time independently for every vehicle of the schedule (lognormal, median
+    at params, log-sd from spread), so a scenario is one plausible run of
+    the schedule's horizon, counted in minutes from its first midnight
+    (plain clock times are placed on base_date, as in
+    timeline.absolute_times). The
+    scenarios x vehicles array is computed a chunk of scenarios at a time,
+    keeping memory near max_elements cells however many scenarios are run;
+    the same seed always gives the same result.
+
+    Returns {"vehicles": DataFrame, "hourly": DataFrame, "peak": dict,
+    "busy_hours": dict, "peaks": ndarray, "scenarios": int, "seed": int}.
+    vehicles has each row's deterministic hours and its percentiles (a
+    vehicle's duration is its parcel count times a per-parcel rate that is
+    shared by its type, operation and fatigue tier, so those are sampled per
+    cell). hourly has the most vehicles worked at once in each hour of the
+    horizon ("Time"), and of any later hour that slower scenarios reach;
+    peak and busy_hours map "P<p>" to percentiles of the peak over the
+    horizon and the total worker-adjusted busy hours.
+    """
+    if scenarios < 1:
+        raise ValueError("scenarios must be at least 1")
+    params = OPTIMIZED_PARAMS if params is None else params
+    spread = PARAM_SPREAD if spread is None else {**PARAM_SPREAD, **spread}
+    labels = [f"P{p:g}" for p in percentiles]
+    types, length, n, tier, operation = _vehicle_arrays(schedule)
+    origin, start, minutes = horizon_minutes(schedule, base_date)
+    deterministic = schedule["base_hours"].to_numpy(dtype=float) / num_workers
+    # Occupancy is counted over the whole horizon as one "day", so nothing folds back
+    horizon = minutes + SPILL_MINUTES
+
+    # Occupancy and peaks need every vehicle of a scenario at once
+    chunk = max(1, max_elements // max(len(start), 2 * horizon + 1))
+    hourly = np.zeros((scenarios, horizon // 60), dtype=np.int64)
+    busy_hours = np.zeros(scenarios)
+    for first in range(0, scenarios, chunk):
+        count = min(chunk, scenarios - first)
+        noise = _scenario_noise(seed, first, count, len(start))
+        hours = n * _hours_per_parcel(noise, length, tier, operation, operation_mode, params, spread) / num_workers
+        end = np.minimum(np.floor(start + hours * 60), horizon).astype(np.int64)
+        occupancy = minute_occupancy(np.broadcast_to(start, end.shape).ravel(), end.ravel(), horizon,
+                                     groups=np.repeat(np.arange(count), len(start)), n_groups=count)
+        hourly[first:first + count] = occupancy.reshape(count, -1, 60).max(axis=2)
+        busy_hours[first:first + count] = hours.sum(axis=1)
+    peaks = hourly.max(axis=1)
+
+    # Per-vehicle bands from per-parcel rates of each (type, operation, tier) cell
+    cells, cell_rows = pd.factorize(pd.MultiIndex.from_arrays([types, operation, tier]))
+    cell_types, cell_ops, cell_tiers = (np.asarray(cell_rows.get_level_values(k)) for k in range(3))
+    lengths = np.array([v["L"] for v in VEHICLES], dtype=float)[cell_types]
+    rates = np.empty((scenarios, len(cell_rows)))
+    cell_chunk = max(1, max_elements // max(len(cell_rows), 1))
+    for first in range(0, scenarios, cell_chunk):
+        count = min(cell_chunk, scenarios - first)
+        noise = _scenario_noise(seed, first, count, len(cell_rows), stream=1)
+        rates[first:first + count] = _hours_per_parcel(noise, lengths, cell_tiers, cell_ops,
+                                                       operation_mode, params, spread)
+    rate_bands = np.percentile(rates, percentiles, axis=0) if len(cell_rows) else np.zeros((len(labels), 0))
+
+    vehicles = pd.DataFrame({
+        "vehicle": schedule["vehicle"].to_numpy(),
+        "vehicle_type": schedule["vehicle_type"].to_numpy(),
+        "operation": schedule["operation"].to_numpy(),
+        "Deterministic (hours)": deterministic,
+    })
+    for label, band in zip(labels, rate_bands):
+        vehicles[f"{label} (hours)"] = n * band[cells] / num_workers
+
+    deterministic_hourly = minute_occupancy(start, np.minimum(np.floor(start + deterministic * 60), horizon),
+                                            horizon).reshape(-1, 60).max(axis=1)
+    hourly_table = pd.DataFrame({
+        "Time": pd.date_range(origin, periods=horizon // 60, freq="60min"),
+        "Start Minute": np.arange(0, horizon, 60),
+        "Deterministic": deterministic_hourly,
+    })
+    hourly_bands = np.percentile(hourly, percentiles, axis=0)
+    for label, band in zip(labels, hourly_bands):
+        hourly_table[label] = band
+    # Past the horizon, only hours that some band still reaches are kept
+    reached = np.flatnonzero(hourly_bands.max(axis=0, initial=0) > 0)
+    hourly_table = hourly_table.iloc[:max(minutes // 60, reached[-1] + 1 if len(reached) else 0)]
+
+    return {
+        "vehicles": vehicles,
+        "hourly": hourly_table,
+        "peak": dict(zip(labels, np.percentile(peaks, percentiles).tolist())),
+        "busy_hours": dict(zip(labels, np.percentile(busy_hours, percentiles).tolist())),
+        "peaks": peaks,
+        "scenarios": scenarios,
+        "seed": seed,
+    }
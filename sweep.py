@@ -0,0 +1,136 @@
+"""What-if sweeps over operation mode, worker count, machine buffer and parcel overrides"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from gantt import MACHINE_BUFFER, VEHICLE_MAPPING, compute_operation_times, minute_occupancy
+from timeline import horizon_minutes
+
+SWEEP_MODES = ["manual", "machine"]
+SWEEP_WORKERS = range(1, 21)
+# Default turnaround after which a vehicle counts as finishing late
+LATE_AFTER_HOURS = 4.0
+# Scenarios whose occupancy is counted in one pass hold about this many (scenario, vehicle or minute) cells
+MAX_CHUNK_ELEMENTS = 2_000_000
+
+def override_label(overrides):
+    """Readable name of a parcel override set"""
+    if not overrides:
+        return "none"
+    return "; ".join(f"{vehicle_type}={parcels:g}" for vehicle_type, parcels in overrides.items())
+
+def scenario_grid(modes=SWEEP_MODES, workers=SWEEP_WORKERS, machine_buffers=(MACHINE_BUFFER,),
+                  parcel_overrides=({},)):
+    """Every combination of the given settings, one row per scenario.
+
+    parcel_overrides is a list of {vehicle type: parcels} dicts; {} keeps the
+    file's parcel counts. The machine buffer only matters in machine mode,
+    so manual scenarios appear once per worker count and override set, with
+    a NaN buffer.
+    """
+    rows = []
+    for mode, (override_index, overrides), buffer, n_workers in itertools.product(
+            modes, enumerate(parcel_overrides), machine_buffers, workers):
+        if mode == "manual" and buffer != machine_buffers[0]:
+            continue
+        rows.append({
+            "Mode": mode,
+            "Workers": int(n_workers),
+            "Machine Buffer": float(buffer) if mode == "machine" else np.nan,
+            "Parcel Overrides": override_label(overrides),
+            "override_index": override_index,
+        })
+    return pd.DataFrame(rows)
+
+def _override_hours(schedule, overrides, params):
+    """Single-worker manual hours and unbuffered machine handling hours under one override set"""
+    parcels = schedule["parcels"].to_numpy(dtype=float).copy()
+    mapped = schedule["mapped_type"].to_numpy(dtype=object)
+    for vehicle_type, count in overrides.items():
+        parcels[mapped == VEHICLE_MAPPING.get(vehicle_type, vehicle_type)] = count
+    return {
+        "manual": compute_operation_times(mapped, schedule["operation"], "manual", parcels, params),
+        "machine": compute_operation_times(mapped, schedule["operation"], "machine", parcels, params,
+                                           machine_buffer=1.0),
+    }
+
+# Set once per worker process so each task only ships scenario settings
+_shared = {}
+
+def _init_worker(start, horizon, hours, late_after_hours, max_elements):
+    _shared.update(start=start, horizon=horizon, hours=hours, late_after_hours=late_after_hours,
+                   max_elements=max_elements)
+
+def _evaluate(tasks):
+    """Busy hours, worker hours, peak (and its minute) and late count of each (override, mode, buffer, workers) task"""
+    start, horizon, late_after = _shared["start"], _shared["horizon"], _shared["late_after_hours"]
+    chunk = max(1, _shared["max_elements"] // max(len(start), 2 * horizon + 1))
+    results = []
+    for first in range(0, len(tasks), chunk):
+        batch = tasks[first:first + chunk]
+        base = np.stack([
+            _shared["hours"][override_index][mode] * (1.0 if mode == "manual" else buffer)
+            for override_index, mode, buffer, _ in batch
+        ])
+        workers = np.array([n_workers for *_, n_workers in batch], dtype=float)[:, None]
+        hours = base / workers
+        end = np.floor(start + hours * 60).astype(np.int64)
+        # The horizon outlasts every task's last finish, so counting it as one "day" never folds work back
+        occupancy = minute_occupancy(np.broadcast_to(start, end.shape).ravel(), end.ravel(), horizon,
+                                     groups=np.repeat(np.arange(len(batch)), len(start)), n_groups=len(batch))
+        peak_minute = occupancy.argmax(axis=1)
+        for k in range(len(batch)):
+            results.append({
+                "Busy Hours": float(hours[k].sum()),
+                "Worker Hours": float(base[k].sum()),
+                "Peak Vehicles": int(occupancy[k, peak_minute[k]]),
+                "Peak Time": int(peak_minute[k]),
+                "Late Finishes": int(np.sum(hours[k] > late_after)),
+            })
+    return results
+
+def run_sweep(schedule, grid=None, params=None, parcel_overrides=({},), late_after_hours=LATE_AFTER_HOURS,
+              jobs=None, max_elements=MAX_CHUNK_ELEMENTS, base_date=None):
+    """Evaluate every scenario of a grid against one base schedule.
+
+    Times are parsed and vehicles mapped once, in the schedule; each
+    override set is costed once, and every scenario only rescales those
+    hours by its machine buffer and worker count before counting occupancy.
+    Scenarios are split across jobs worker processes (1 runs them here).
+    grid defaults to scenario_grid(parcel_overrides=parcel_overrides).
+    Arrivals are minutes from the horizon's first midnight, so a multi-day
+    file is not folded onto one day (plain clock times are placed on
+    base_date, as in timeline.absolute_times).
+
+    Returns the grid with "Busy Hours" (vehicle-hours at the docks),
+    "Worker Hours", "Peak Vehicles", "Peak Time" (as "Mon 01 Jan 10:00")
+    and "Late Finishes" (vehicles worked for longer than late_after_hours
+    after arriving).
+    """
+    grid = scenario_grid(parcel_overrides=parcel_overrides) if grid is None else grid
+    origin, start, minutes = horizon_minutes(schedule, base_date)
+    hours = [_override_hours(schedule, overrides, params) for overrides in parcel_overrides]
+    tasks = list(zip(grid["override_index"], grid["Mode"], grid["Machine Buffer"], grid["Workers"]))
+    # Long enough for the slowest task's last finish: the latest arrival plus its longest job
+    longest = max((np.max(hours[override_index][mode], initial=0) * (1.0 if mode == "manual" else buffer) / n_workers
+                   for override_index, mode, buffer, n_workers in tasks), default=0)
+    horizon = max(minutes, int(start.max(initial=0) + np.floor(longest * 60)) + 2)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) < 2:
+        _init_worker(start, horizon, hours, late_after_hours, max_elements)
+        results = _evaluate(tasks)
+    else:
+        # A few chunks per process balance the load without re-sending the schedule
+        size = max(1, -(-len(tasks) // (jobs * 4)))
+        chunks = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(start, horizon, hours, late_after_hours, max_elements)) as pool:
+            results = [row for rows in pool.map(_evaluate, chunks) for row in rows]
+    results = pd.DataFrame(results, columns=["Busy Hours", "Worker Hours", "Peak Vehicles", "Peak Time",
+                                             "Late Finishes"])
+    results["Peak Time"] = (origin + pd.to_timedelta(results["Peak Time"], unit="min")).dt.strftime("%a %d %b %H:%M")
+    return pd.concat([grid.drop(columns="override_index").reset_index(drop=True), results], axis=1)
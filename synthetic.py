@@ -0,0 +1,140 @@
+"""Synthetic arrival files with realistic hub and vehicle-type mixes, for benchmarking.
+
+Usage: python synthetic.py OUTPUT.csv [--rows 1000000] [--hubs 200] [--days 1] [--seed 0]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from gantt import VEHICLE_MAPPING, VEHICLES
+
+# Vehicle type labels as they appear in arrival exports, weighted by the sample file's mix
+VEHICLE_TYPE_MIX = {"32' MA": 11, "32'SXL": 9, "19'": 6, "20'": 6, "17'": 2, "14'": 1, "22'": 1}
+# Share of loading jobs (24 of the sample's 38 rows)
+LOADING_SHARE = 0.63
+# Relative arrivals per hour of the day: a night and early-morning rush, a quieter afternoon
+HOURLY_PROFILE = np.array([4, 4, 2, 2, 2, 6, 4, 1, 1, 1, 1, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 3], dtype=float)
+# Hub volumes follow a Zipf law: the k-th biggest hub sees about 1/k**HUB_SKEW of the biggest's arrivals
+HUB_SKEW = 0.8
+# Rows generated per block; each block draws from its own stream of the seed
+BLOCK_ROWS = 250_000
+
+def hub_codes(hubs):
+    """Hub code labels, HUB1..HUBn as in the sample file"""
+    return np.array([f"HUB{k}" for k in range(1, hubs + 1)], dtype=object)
+
+def _weights(values):
+    values = np.asarray(values, dtype=float)
+    return values / values.sum()
+
+def _block(rng, rows, first_row, hub_weights, days, start_date, parcels_share, unmapped_share, malformed_share):
+    """One block of arrivals as a DataFrame"""
+    labels = np.array(list(VEHICLE_TYPE_MIX), dtype=object)
+    vehicle_type = labels[rng.choice(len(labels), rows, p=_weights(list(VEHICLE_TYPE_MIX.values())))]
+    if unmapped_share:
+        # Labels the cost model does not know, as exports occasionally carry
+        vehicle_type[rng.random(rows) < unmapped_share] = "Unknown"
+
+    hour = rng.choice(24, rows, p=_weights(HOURLY_PROFILE))
+    minute = hour * 60 + rng.integers(0, 60, rows)
+    # Arrivals are bunched on the quarter hour more often than not
+    minute = np.where(rng.random(rows) < 0.6, minute - minute % 15, minute)
+    clock = np.array([f"{m // 60}:{m % 60:02d}" for m in range(1440)], dtype=object)
+    if days > 1:
+        day = rng.integers(0, days, rows)
+        dates = (pd.Timestamp(start_date) + pd.to_timedelta(np.arange(days), unit="D")).strftime("%Y-%m-%d ")
+        arrival = np.asarray(dates, dtype=object)[day] + clock[minute]
+    else:
+        arrival = clock[minute]
+    if malformed_share:
+        arrival[rng.random(rows) < malformed_share] = "not a time"
+
+    frame = pd.DataFrame({
+        "Arrival Time": arrival,
+        "Vehicle Type": vehicle_type,
+        "Type": np.where(rng.random(rows) < LOADING_SHARE, "Loading", "Unloading"),
+        "Hub Code": hub_codes(len(hub_weights))[rng.choice(len(hub_weights), rows, p=hub_weights)],
+    }, index=pd.RangeIndex(first_row, first_row + rows))
+
+    if parcels_share:
+        # Counted parcels scatter around the vehicle's default capacity
+        defaults = {v["type"]: v["parcels"] for v in VEHICLES}
+        capacity = np.array([defaults.get(VEHICLE_MAPPING.get(t, t), 0) for t in labels] + [0], dtype=float)
+        codes = pd.Index(labels).get_indexer(vehicle_type)
+        parcels = np.round(capacity[codes] * rng.uniform(0.5, 1.1, rows))
+        parcels[(rng.random(rows) >= parcels_share) | (parcels <= 0)] = np.nan
+        frame["Parcels"] = pd.array(parcels, dtype="Int64")
+    return frame
+
+def generate_arrival_blocks(rows, hubs=None, days=1, seed=0, start_date="2024-01-01", parcels_share=0.0,
+                            unmapped_share=0.0, malformed_share=0.0):
+    """Yield a synthetic arrival file as DataFrames of at most block_rows rows.
+
+    hubs defaults to one hub per ~5,000 arrivals (at least 5), sized by a
+    Zipf law. With days > 1 arrival times are full date-times spread
+    evenly over that many days from start_date; otherwise plain H:MM clock
+    times. parcels_share of rows get a 'Parcels' count (the column is left
+    out when 0), and unmapped_share / malformed_share of rows get an
+    unknown vehicle type / an unreadable arrival time. The same arguments
+    always give the same file.
+    """
+    if rows < 0:
+        raise ValueError("rows must not be negative")
+    hubs = hubs or max(5, rows // 5000)
+    hub_weights = _weights(1.0 / np.arange(1, hubs + 1) ** HUB_SKEW)
+    for block, first in enumerate(range(0, rows, BLOCK_ROWS)):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+        yield _block(rng, min(BLOCK_ROWS, rows - first), first, hub_weights, days, start_date,
+                     parcels_share, unmapped_share, malformed_share)
+
+def generate_arrivals(rows, **kwargs):
+    """A whole synthetic arrival file in memory; see generate_arrival_blocks for the options"""
+    blocks = list(generate_arrival_blocks(rows, **kwargs))
+    if not blocks:
+        return pd.DataFrame(columns=["Arrival Time", "Vehicle Type", "Type", "Hub Code"])
+    return pd.concat(blocks)
+
+def write_arrivals(path, rows, **kwargs):
+    """Write a synthetic arrival CSV block by block, so 10M rows never sit in memory at once"""
+    for block_index, block in enumerate(generate_arrival_blocks(rows, **kwargs)):
+        block.to_csv(path, mode="w" if block_index == 0 else "a", header=block_index == 0, index=False)
+    if rows == 0:
+        generate_arrivals(0).to_csv(path, index=False)
+    return path
+
+def parse_rows(text):
+    """Row counts like 1000, 10k or 2.5M"""
+    text = str(text).strip().lower().replace("_", "").replace(",", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic arrival CSV.")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("-n", "--rows", type=parse_rows, default=parse_rows("100k"),
+                        help="arrivals to generate, e.g. 1k, 250k or 10M (default: 100k)")
+    parser.add_argument("--hubs", type=int, default=None, help="hub count (default: one per 5,000 rows, at least 5)")
+    parser.add_argument("--days", type=int, default=1,
+                        help="days to spread arrivals over; above 1 times are full date-times (default: 1)")
+    parser.add_argument("--start-date", default="2024-01-01", help="first day when --days > 1")
+    parser.add_argument("--parcels", type=float, default=0.0, metavar="SHARE",
+                        help="share of rows with a 'Parcels' count (default: 0, no column)")
+    parser.add_argument("--unmapped", type=float, default=0.0, metavar="SHARE",
+                        help="share of rows with an unknown vehicle type (default: 0)")
+    parser.add_argument("--malformed", type=float, default=0.0, metavar="SHARE",
+                        help="share of rows with an unreadable arrival time (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    write_arrivals(args.output, args.rows, hubs=args.hubs, days=args.days, seed=args.seed,
+                   start_date=args.start_date, parcels_share=args.parcels, unmapped_share=args.unmapped,
+                   malformed_share=args.malformed)
+    print(f"Wrote {args.rows:,} arrivals to {args.output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
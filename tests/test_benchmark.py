@@ -0,0 +1,7 @@
+from benchmark import STAGES, run_benchmarks
+
+def test_every_file_stage_runs_on_its_own():
+    for name, (_, _, _, reads_file) in STAGES.items():
+        if reads_file:
+            results = run_benchmarks([200], [name], repeat=1, memory=False, log=lambda message: None)
+            assert [result["stage"] for result in results] == [name]
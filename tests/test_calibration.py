@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from calibration import (PARAM_NAMES, benchmark_stats, calibrate, loss_and_gradient, observation_stats,
+                         start_points)
+from gantt import VEHICLES, compute_operation_times
+
+TRUE_PARAMS = {
+    "f1": 1.05, "f2": 1.15, "f3": 1.35, "f4": 1.6,
+    "alpha": 0.7, "tturn": 3.0,
+    "v_walk": 1.1, "v_load": 0.8,
+    "d_load": 12.0, "d_unld": 8.0
+}
+
+def _observations(params, rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    types = rng.choice([v["type"] for v in VEHICLES], rows)
+    operations = rng.choice(["Loading", "Unloading"], rows)
+    # Parcel counts spanning every fatigue tier
+    parcels = rng.integers(10, 1600, rows).astype(float)
+    return types, operations, parcels, compute_operation_times(types, operations, "manual", parcels, params)
+
+@pytest.mark.parametrize("theta", list(start_points(4, seed=3)))
+def test_gradient_matches_finite_differences(theta):
+    stats = benchmark_stats()
+    _, gradient = loss_and_gradient(theta, stats)
+    step = 1e-6
+    numeric = [
+        (loss_and_gradient(theta + step * e, stats)[0] - loss_and_gradient(theta - step * e, stats)[0]) / (2 * step)
+        for e in np.eye(len(theta))
+    ]
+    assert gradient == pytest.approx(numeric, rel=1e-5, abs=1e-8)
+
+def test_fit_recovers_the_generating_model():
+    types, operations, parcels, hours = _observations(TRUE_PARAMS)
+    (stats,), dropped = observation_stats(types, operations, hours, parcels)
+    assert dropped == 0
+    assert loss_and_gradient([TRUE_PARAMS[name] for name in PARAM_NAMES], stats)[0] == pytest.approx(0, abs=1e-12)
+
+    result = calibrate(stats, starts=4, jobs=1)
+    assert result["loss"] < 1e-8
+    # Fatigue scales every per-parcel time, and tturn adds to both delays, so only
+    # these combinations of the parameters are identifiable from durations
+    fitted = result["params"]
+    for tier in ("f2", "f3", "f4"):
+        assert fitted[tier] / fitted["f1"] == pytest.approx(TRUE_PARAMS[tier] / TRUE_PARAMS["f1"], rel=1e-4)
+    assert compute_operation_times(types, operations, "manual", parcels, fitted) == pytest.approx(hours, rel=1e-4)
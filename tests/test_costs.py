@@ -0,0 +1,12 @@
+import io
+
+from costs import network_costs
+
+def test_network_costs_skips_rows_without_a_hub():
+    csv = ("Arrival Time,Vehicle Type,Type,Hub Code\n"
+           "1:00,19',Loading,H1\n"
+           "2:00,19',Loading,\n"
+           "3:00,32' MA,Unloading,H2\n"
+           "4:00,19',Loading,H1\n")
+    table = network_costs(io.StringIO(csv))
+    assert table.set_index("Hub Code")["Vehicles"].to_dict() == {"H1": 2, "H2": 1}
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+import pytest
+
+from gantt import VEHICLES, compute_times, compute_times_batch, map_vehicle_types
+
+def test_map_vehicle_types_maps_and_passes_through():
+    mapped = map_vehicle_types(pd.Series(["19'", "Unknown", None, "19'"]))
+    assert list(mapped[[0, 1, 3]]) == ["Eicher 19 ft", "Unknown", "Eicher 19 ft"]
+    assert pd.isna(mapped[2])
+
+def test_map_vehicle_types_all_missing():
+    # Every value missing used to raise IndexError
+    mapped = map_vehicle_types(pd.Series([np.nan, None], dtype=object))
+    assert len(mapped) == 2 and mapped.isna().all()
+
+@pytest.mark.parametrize("mode", ["manual", "Machine"])
+@pytest.mark.parametrize("parcels", [None, 100, 101, 300.5, "250", "not a number"])
+def test_compute_times_matches_batch(mode, parcels):
+    for vehicle in VEHICLES:
+        batch = compute_times_batch([vehicle["type"]], mode, parcels)
+        assert compute_times(vehicle["type"], mode, parcels) == pytest.approx(
+            {operation: hours[0] for operation, hours in batch.items()})
+
+def test_compute_times_unknown_type():
+    assert compute_times("Unknown") is None
@@ -0,0 +1,45 @@
+import pandas as pd
+
+from gantt import build_schedule, staff_schedule
+from incremental import IncrementalSchedule
+from synthetic import generate_arrivals
+from timeline import create_horizon_gantt, horizon_occupancy
+
+BASE_DATE = pd.Timestamp("2024-01-01")
+
+def _bars(fig):
+    return {trace.name: sorted(tuple(map(str, row)) for row in trace.customdata) for trace in fig.data}
+
+def _assert_matches_rebuild(incremental, df, num_workers, base_date):
+    schedule = staff_schedule(build_schedule(df, num_workers=num_workers), num_workers)
+    pd.testing.assert_frame_equal(incremental.schedule, schedule)
+    assert incremental.schedule.attrs["malformed_arrivals"] == schedule.attrs["malformed_arrivals"]
+    assert incremental.schedule.attrs["unmapped_types"] == schedule.attrs["unmapped_types"]
+
+    patched, rebuilt = incremental.occupancy(60), horizon_occupancy(schedule, 60, base_date)
+    pd.testing.assert_frame_equal(patched["timeline"], rebuilt["timeline"], check_freq=False)
+    assert (patched["peak"], patched["peak_at"]) == (rebuilt["peak"], rebuilt["peak_at"])
+    # Patched windows may pack bars into other lanes; the bars themselves must match
+    window = (base_date, base_date + pd.Timedelta(days=1))
+    assert _bars(incremental.gantt(*window, "patched")) == _bars(create_horizon_gantt(
+        schedule, *window, "rebuilt", base_date=base_date))
+
+def test_patches_in_out_and_reconfigure_match_a_rebuild():
+    original = generate_arrivals(200, hubs=1, seed=6, parcels_share=0.3, unmapped_share=0.05, malformed_share=0.02)
+    extra = generate_arrivals(6, hubs=1, seed=7, parcels_share=0.5, unmapped_share=0.3, malformed_share=0.3)
+    edited = pd.concat([original.iloc[:100], extra, original.iloc[103:]], ignore_index=True)
+
+    incremental = IncrementalSchedule(original, base_date=BASE_DATE)
+    incremental.gantt(BASE_DATE, BASE_DATE + pd.Timedelta(days=1), "first draw")
+
+    incremental.update(edited)
+    assert incremental.last_update == {"added": 6, "removed": 3, "rebuilt": False}
+    _assert_matches_rebuild(incremental, edited, 1, BASE_DATE)
+
+    incremental.update(original)
+    assert incremental.last_update == {"added": 3, "removed": 6, "rebuilt": False}
+    _assert_matches_rebuild(incremental, original, 1, BASE_DATE)
+
+    later = BASE_DATE + pd.Timedelta(days=2)
+    incremental.configure(num_workers=3, base_date=later)
+    _assert_matches_rebuild(incremental, original, 3, later)
@@ -0,0 +1,29 @@
+import io
+
+import pandas as pd
+
+from gantt import build_schedule
+from ingest import list_hubs, load_hub
+from schedule_cache import hub_schedule
+
+BLANK_HUB_CSV = (
+    "Arrival Time,Vehicle Type,Type,Hub Code\n"
+    "1:00,19',Loading,H1\n"
+    "2:00,19',Loading,\n"
+    "4:00,32' MA,Unloading,H2\n"
+)
+
+FRACTIONAL_PARCELS_CSV = (
+    "Arrival Time,Vehicle Type,Type,Hub Code,Parcels\n"
+    "1:00,19',Loading,H1,300.4\n"
+    "2:00,19',Unloading,H1,120.6\n"
+)
+
+def test_list_hubs_skips_blank_hub_codes():
+    assert list_hubs(io.StringIO(BLANK_HUB_CSV)) == ["H1", "H2"]
+
+def test_chunked_reads_keep_fractional_parcels(tmp_path):
+    assert load_hub(io.StringIO(FRACTIONAL_PARCELS_CSV), "H1")["Parcels"].tolist() == [300.4, 120.6]
+    cached = hub_schedule(io.StringIO(FRACTIONAL_PARCELS_CSV), "fractional", "H1", root=str(tmp_path))
+    in_memory = build_schedule(pd.read_csv(io.StringIO(FRACTIONAL_PARCELS_CSV)))
+    assert cached["base_hours"].tolist() == in_memory["base_hours"].tolist()
@@ -0,0 +1,33 @@
+import io
+
+import pandas as pd
+import pytest
+
+import network
+from gantt import build_schedule
+from network import hub_profile, network_overview
+from synthetic import generate_arrivals
+from timeline import horizon_occupancy
+
+@pytest.mark.parametrize("merge_min_events", [10, network.MERGE_MIN_EVENTS])
+def test_overview_matches_each_hubs_own_occupancy(monkeypatch, merge_min_events):
+    monkeypatch.setattr(network, "MERGE_MIN_EVENTS", merge_min_events)
+    # Later days first, so chunks move the origin back
+    arrivals = generate_arrivals(600, hubs=4, days=3, seed=5).sort_values("Arrival Time", ascending=False)
+    overview = network_overview(io.StringIO(arrivals.to_csv(index=False)), chunksize=100)
+    summary = overview["summary"].set_index("Hub Code")
+    for hub, hub_arrivals in arrivals.groupby("Hub Code"):
+        occupancy = horizon_occupancy(build_schedule(hub_arrivals.reset_index(drop=True)))
+        assert summary.loc[hub, "Peak Vehicles"] == occupancy["peak"]
+        assert summary.loc[hub, "Peak Time"] == occupancy["peak_at"]
+        profile = hub_profile(overview, hub)
+        assert profile["Vehicles"].loc[occupancy["timeline"].index].tolist() == \
+            occupancy["timeline"]["Vehicles"].tolist()
+        # Outside the hub's own days nothing is at the docks
+        assert profile["Vehicles"].drop(occupancy["timeline"].index).eq(0).all()
+
+def test_overview_of_a_file_with_nothing_scheduled():
+    csv = "Arrival Time,Vehicle Type,Type,Hub Code\nnot a time,19',Loading,H1\n"
+    overview = network_overview(io.StringIO(csv), base_date="2024-01-01")
+    assert overview["summary"]["Skipped"].tolist() == [1]
+    assert overview["hourly"].shape == (1, 24) and pd.isna(overview["summary"]["Peak Time"].iloc[0])
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import schedule_cache
+from schedule_cache import (hub_schedule, load_cached_schedule, model_fingerprint, prune_schedule_cache,
+                            read_manifest, write_schedule_cache)
+from synthetic import write_arrivals
+
+def _arrival_file(tmp_path):
+    path = write_arrivals(str(tmp_path / "arrivals.csv"), 2000, seed=0)
+    with open(path, "rb") as f:
+        return path, hashlib.sha256(f.read()).hexdigest()
+
+def test_rewriting_a_cached_file_keeps_the_live_entry(tmp_path):
+    path, file_hash = _arrival_file(tmp_path)
+    root = str(tmp_path / "cache")
+    first = write_schedule_cache(path, file_hash, root)
+    second = write_schedule_cache(path, file_hash, root)
+    assert second["hubs"].keys() == first["hubs"].keys() == read_manifest(file_hash, root)["hubs"].keys()
+    hub = next(iter(first["hubs"]))
+    assert len(load_cached_schedule(file_hash, hub, root=root)) == first["hubs"][hub]["rows"]
+
+def test_concurrent_cold_requests_all_get_the_schedule(tmp_path):
+    path, file_hash = _arrival_file(tmp_path)
+    root = str(tmp_path / "cache")
+    with ThreadPoolExecutor(8) as pool:
+        schedules = list(pool.map(lambda _: hub_schedule(path, file_hash, "HUB1", root=root), range(12)))
+    assert all(schedule is not None and len(schedule) == len(schedules[0]) for schedule in schedules)
+
+def test_fingerprint_covers_the_cost_model_constants(monkeypatch):
+    fingerprint = model_fingerprint()
+    monkeypatch.setattr(schedule_cache, "MACHINE_BUFFER", 2.0)
+    assert model_fingerprint() != fingerprint
+    monkeypatch.undo()
+    monkeypatch.setattr(schedule_cache, "FATIGUE_THRESHOLDS", np.array([100, 250, 300]))
+    assert model_fingerprint() != fingerprint
+
+def test_prune_removes_stale_staging_directories(tmp_path):
+    stale, fresh = tmp_path / ".staging-killed", tmp_path / ".staging-running"
+    for staging in (stale, fresh):
+        staging.mkdir()
+        (staging / "hub=H1.arrow").write_bytes(b"")
+    day_ago = time.time() - 24 * 3600
+    for path in (stale / "hub=H1.arrow", stale):
+        os.utime(path, (day_ago, day_ago))
+    prune_schedule_cache(str(tmp_path))
+    assert not stale.exists() and fresh.exists()
@@ -0,0 +1,22 @@
+import pytest
+
+from service import ServiceError, estimate, gantt, occupancy, parse_query
+
+@pytest.mark.parametrize("hub", [["HUB1"], {"code": "HUB1"}, 7])
+def test_parse_query_rejects_a_hub_that_is_not_a_string(hub):
+    with pytest.raises(ServiceError) as error:
+        parse_query({"hub": hub})
+    assert error.value.status == 400
+
+def test_parse_query_keeps_a_hub_code():
+    assert parse_query({"hub": "HUB1"})["hub"] == "HUB1"
+
+def test_posted_schedules_reject_an_empty_arrival_list():
+    query = parse_query({"arrivals": []})
+    for handler in (occupancy, gantt):
+        with pytest.raises(ServiceError, match="empty") as error:
+            handler(query)
+        assert error.value.status == 400
+
+def test_an_empty_estimate_has_no_rows():
+    assert estimate(parse_query({"arrivals": []}))["count"] == 0
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from gantt import build_schedule
+from simulation import simulate_docks
+
+def _queue(minutes):
+    """Four vehicles arriving ten minutes apart from 10:00, with the given single-crew durations"""
+    schedule = build_schedule(pd.DataFrame({
+        "Arrival Time": ["2024-01-01 10:00", "2024-01-01 10:10", "2024-01-01 10:20", "2024-01-01 10:30"],
+        "Vehicle Type": ["19'"] * 4,
+        "Type": ["Loading"] * 4,
+        "Hub Code": ["H1"] * 4,
+    }))
+    return schedule.assign(base_hours=[m / 60 for m in minutes])
+
+def test_fifo_waits_on_one_dock():
+    result = simulate_docks(_queue([60, 30, 10, 20]), num_docks=1)
+    vehicles = result["vehicles"]
+    # 10:00-11:00, then 11:00-11:30, 11:30-11:40 and 11:40-12:00 in arrival order
+    assert vehicles["start_min"].tolist() == [600, 660, 690, 700]
+    assert vehicles["wait_min"].tolist() == [0, 50, 70, 70]
+    assert result["max_queue"] == 3 and result["max_wait"] == 70
+    assert vehicles["start_at"].iloc[1] == pd.Timestamp("2024-01-01 11:00")
+
+def test_fifo_waits_on_two_docks():
+    vehicles = simulate_docks(_queue([60, 30, 10, 20]), num_docks=2)["vehicles"]
+    # The second dock frees at 10:40 and 10:50
+    assert vehicles["wait_min"].tolist() == [0, 0, 20, 20]
+    assert vehicles["dock"].tolist() == [0, 1, 1, 1]
+
+def test_priority_serves_the_shortest_job_first():
+    vehicles = simulate_docks(_queue([60, 30, 10, 20]), num_docks=1, discipline="priority")["vehicles"]
+    # At 11:00 all three wait: 10 min, then 20 min, then 30 min
+    assert vehicles["start_min"].tolist() == [600, 690, 660, 670]
+
+def test_priority_follows_given_values():
+    vehicles = simulate_docks(_queue([60, 30, 10, 20]), num_docks=1, discipline="priority",
+                              priority=[0, 0, 2, 1])["vehicles"]
+    assert vehicles["start_min"].tolist() == [600, 660, 710, 690]
+    assert vehicles["wait_min"].tolist() == pytest.approx([0, 50, 90, 60])
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from gantt import build_schedule
+from stochastic import _scenario_noise, monte_carlo
+from synthetic import generate_arrivals
+
+def _schedule():
+    return build_schedule(generate_arrivals(60, hubs=1, days=2, seed=4))
+
+def _assert_same(a, b):
+    pd.testing.assert_frame_equal(a["vehicles"], b["vehicles"])
+    pd.testing.assert_frame_equal(a["hourly"], b["hourly"])
+    np.testing.assert_array_equal(a["peaks"], b["peaks"])
+    assert a["peak"] == b["peak"] and a["busy_hours"] == b["busy_hours"]
+
+def test_monte_carlo_is_reproducible_for_a_seed():
+    schedule = _schedule()
+    _assert_same(monte_carlo(schedule, scenarios=30, seed=7), monte_carlo(schedule, scenarios=30, seed=7))
+    assert not np.array_equal(monte_carlo(schedule, scenarios=30, seed=8)["peaks"],
+                              monte_carlo(schedule, scenarios=30, seed=7)["peaks"])
+
+def test_monte_carlo_does_not_depend_on_chunking():
+    schedule = _schedule()
+    whole = monte_carlo(schedule, scenarios=30, seed=7)
+    # max_elements=1 runs one scenario (and one cell) per chunk
+    _assert_same(whole, monte_carlo(schedule, scenarios=30, seed=7, max_elements=1))
+    _assert_same(whole, monte_carlo(schedule, scenarios=30, seed=7, max_elements=50_000))
+
+def test_scenarios_do_not_depend_on_their_order_or_count():
+    noise = _scenario_noise(3, 0, 10, 5)
+    np.testing.assert_array_equal(_scenario_noise(3, 6, 4, 5), noise[:, 6:])
+    schedule = _schedule()
+    np.testing.assert_array_equal(monte_carlo(schedule, scenarios=40, seed=7)["peaks"][:25],
+                                  monte_carlo(schedule, scenarios=25, seed=7)["peaks"])
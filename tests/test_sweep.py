@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from gantt import MACHINE_BUFFER, VEHICLE_MAPPING, build_schedule, staff_schedule
+from sweep import run_sweep, scenario_grid
+from synthetic import generate_arrivals
+from timeline import horizon_occupancy
+
+LATE_AFTER_HOURS = 2.0
+OVERRIDE = {"19'": 350}
+
+@pytest.mark.parametrize("mode,workers,overrides", [
+    ("manual", 3, {}),
+    ("machine", 2, {}),
+    ("manual", 1, OVERRIDE),
+])
+def test_sweep_row_matches_a_direct_run(mode, workers, overrides):
+    arrivals = generate_arrivals(80, hubs=1, days=2, seed=2, parcels_share=0.3)
+    base = build_schedule(arrivals)
+    grid = scenario_grid([mode], [workers], (MACHINE_BUFFER,), [{}, OVERRIDE])
+    sweep = run_sweep(base, grid, parcel_overrides=[{}, OVERRIDE], late_after_hours=LATE_AFTER_HOURS, jobs=1)
+    row = sweep[sweep["Parcel Overrides"] == ("none" if not overrides else "19'=350")].iloc[0]
+
+    edited = arrivals.copy()
+    for vehicle_type, parcels in overrides.items():
+        mapped = edited["Vehicle Type"].map(lambda t: VEHICLE_MAPPING.get(t, t))
+        edited.loc[mapped == VEHICLE_MAPPING[vehicle_type], "Parcels"] = parcels
+    direct = staff_schedule(build_schedule(edited, mode), workers)
+    occupancy = horizon_occupancy(direct)
+
+    assert row["Busy Hours"] == pytest.approx(direct["hours"].sum())
+    assert row["Worker Hours"] == pytest.approx(direct["base_hours"].sum())
+    assert row["Peak Vehicles"] == occupancy["peak"]
+    assert row["Peak Time"] == occupancy["peak_at"].strftime("%a %d %b %H:%M")
+    assert row["Late Finishes"] == np.sum(direct["hours"] > LATE_AFTER_HOURS)
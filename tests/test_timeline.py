@@ -0,0 +1,54 @@
+import pandas as pd
+
+from gantt import build_schedule
+from simulation import simulate_docks
+from stochastic import monte_carlo
+from sweep import run_sweep, scenario_grid
+from timeline import horizon_minutes, horizon_occupancy
+from workforce import optimize_workforce
+
+# One truck a day at 10:00: nothing ever overlaps
+THREE_DAYS = pd.DataFrame({
+    "Arrival Time": ["2024-01-01 10:00", "2024-01-02 10:00", "2024-01-03 10:00"],
+    "Vehicle Type": ["19'"] * 3,
+    "Type": ["Loading"] * 3,
+    "Hub Code": ["H1"] * 3,
+})
+
+def test_horizon_minutes_counts_from_the_first_midnight():
+    origin, start, minutes = horizon_minutes(build_schedule(THREE_DAYS))
+    assert origin == pd.Timestamp("2024-01-01")
+    assert start.tolist() == [600, 2040, 3480]
+    assert minutes == 3 * 1440
+
+def test_minute_analyses_do_not_fold_days_together():
+    schedule = build_schedule(THREE_DAYS)
+    assert horizon_occupancy(schedule)["peak"] == 1
+
+    docks = simulate_docks(schedule, num_docks=1)
+    assert docks["max_wait"] == 0 and docks["max_queue"] == 0
+
+    staffing = optimize_workforce(schedule, target_hours=4)
+    one_day = optimize_workforce(build_schedule(THREE_DAYS.iloc[:1]), target_hours=4)
+    assert staffing["allocation"]["Workers"].max() == one_day["allocation"]["Workers"].max()
+
+    assert monte_carlo(schedule, scenarios=50)["peak"]["P90"] == 1
+    sweep = run_sweep(schedule, scenario_grid(workers=[1]), jobs=1)
+    assert (sweep["Peak Vehicles"] == 1).all()
+
+def test_out_of_range_and_time_only_arrivals():
+    arrivals = pd.DataFrame({
+        "Arrival Time": ["9:5", "0001-01-01 10:00", "10:00 PM", "2024-01-02 10:00"],
+        "Vehicle Type": ["19'"] * 4,
+        "Type": ["Loading"] * 4,
+        "Hub Code": ["H1"] * 4,
+    })
+    schedule = build_schedule(arrivals)
+    # Out-of-range datetimes are reported, not fatal
+    assert [row["Arrival Time"] for row in schedule.attrs["malformed_arrivals"]] == ["9:5", "0001-01-01 10:00"]
+    assert schedule["arrival_time"].tolist() == ["10:00 PM", "2024-01-02 10:00"]
+    # A time-only fallback is undated, so it lands on base_date rather than the day of the upload
+    assert pd.isna(schedule["arrival_date"].iloc[0])
+    origin, start, _ = horizon_minutes(schedule, base_date="2024-01-01")
+    assert origin == pd.Timestamp("2024-01-01")
+    assert start.tolist() == [22 * 60, 1440 + 600]
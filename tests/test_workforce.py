@@ -0,0 +1,27 @@
+import math
+
+import pandas as pd
+
+from gantt import build_schedule
+from workforce import optimize_workforce
+
+ONE_TRUCK = pd.DataFrame({
+    "Arrival Time": ["2024-01-01 10:00"],
+    "Vehicle Type": ["19'"],
+    "Type": ["Loading"],
+    "Hub Code": ["H1"],
+})
+
+def test_workforce_meets_a_target_within_max_crew():
+    schedule = build_schedule(ONE_TRUCK)
+    hours = schedule["base_hours"].iloc[0]
+    staffing = optimize_workforce(schedule, target_hours=1)
+    assert staffing["allocation"]["Workers"].tolist()[-1] == math.ceil(hours)
+    assert staffing["too_long"] == 0
+    assert staffing["max_turnaround_hours"] <= 1
+
+def test_workforce_caps_crews_at_max_crew():
+    schedule = build_schedule(ONE_TRUCK)
+    staffing = optimize_workforce(schedule, target_hours=1, max_crew=2)
+    assert staffing["allocation"]["Workers"].max() == 2
+    assert staffing["too_long"] == 1
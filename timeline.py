@@ -0,0 +1,162 @@
+"""Continuous multi-day timeline: absolute timestamps, datetime occupancy and paged Gantt windows"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from gantt import DEFAULT_COLORS, GANTT_MAX_HEIGHT, GANTT_MAX_TASKS, pack_lanes
+
+# Window lengths offered for paging through a horizon
+GANTT_WINDOWS = {"1 day": pd.Timedelta(days=1), "3 days": pd.Timedelta(days=3), "1 week": pd.Timedelta(days=7)}
+
+def absolute_times(schedule, base_date=None):
+    """Start and end of every schedule row as timestamps on one continuous timeline.
+
+    Rows without an arrival_date (plain clock times) are placed on base_date,
+    today by default. Ends are never folded back: work past midnight lands on
+    the next day, and jobs longer than a day run for as many days as they take.
+    Returns (start, end) as datetime64[ns] arrays.
+    """
+    base = pd.Timestamp(base_date if base_date is not None else pd.Timestamp.today()).normalize()
+    day = schedule["arrival_date"].to_numpy(dtype="datetime64[ns]")
+    day = np.where(np.isnat(day), base.to_datetime64(), day)
+    start = day + schedule["start_min"].to_numpy(dtype=np.int64).astype("timedelta64[m]")
+    end = day + schedule["end_min"].to_numpy(dtype=np.int64).astype("timedelta64[m]")
+    return start.astype("datetime64[ns]"), end.astype("datetime64[ns]")
+
+def horizon_bounds(schedule, base_date=None):
+    """Midnight before the first arrival and midnight after the last finish"""
+    start, end = absolute_times(schedule, base_date)
+    if not len(start):
+        origin = pd.Timestamp(base_date if base_date is not None else pd.Timestamp.today()).normalize()
+        return origin, origin + pd.Timedelta(days=1)
+    origin = pd.Timestamp(start.min()).normalize()
+    last = pd.Timestamp(np.maximum(end, start + np.timedelta64(1, "m")).max())
+    return origin, (last - pd.Timedelta(minutes=1)).normalize() + pd.Timedelta(days=1)
+
+def horizon_minutes(schedule, base_date=None):
+    """Arrival of every row in minutes from the horizon's first midnight.
+
+    The minute-based analyses (dock queue, workforce, Monte Carlo, what-if
+    grid) count from here, so arrivals on different days never fold onto
+    one. Returns (origin, start, minutes): the origin of horizon_bounds, the
+    int64 arrival minutes and the horizon's length in minutes.
+    """
+    origin, horizon_end = horizon_bounds(schedule, base_date)
+    start, _ = absolute_times(schedule, base_date)
+    first = ((start - origin.to_datetime64()) // np.timedelta64(1, "m")).astype(np.int64)
+    return origin, first, int((horizon_end - origin) / pd.Timedelta(minutes=1))
+
+def horizon_occupancy(schedule, resolution=60, base_date=None):
+    """Vehicles being worked at once across the whole horizon, indexed by real datetime.
+
+    Minutes are counted from the first arrival day's midnight with one
+    difference array as long as the horizon, so a week at one-minute
+    resolution is ~10k cells. Returns {"timeline": DataFrame, "peak": int,
+    "peak_at": Timestamp}; the timeline has a DatetimeIndex of bin starts
+    and the most ("Vehicles") and average vehicles per bin.
+    """
+    if resolution < 1 or 1440 % resolution:
+        raise ValueError(f"resolution must divide a day into whole bins, got {resolution} minutes")
+    origin, horizon_end = horizon_bounds(schedule, base_date)
+    minutes = int((horizon_end - origin) / pd.Timedelta(minutes=1))
+    start, end = absolute_times(schedule, base_date)
+    first = ((start - origin.to_datetime64()) // np.timedelta64(1, "m")).astype(np.int64)
+    last = np.maximum(((end - origin.to_datetime64()) // np.timedelta64(1, "m")).astype(np.int64), first + 1)
+    occupancy = np.cumsum(np.bincount(first, minlength=minutes + 1) - np.bincount(last, minlength=minutes + 1))
+    bins = occupancy[:minutes].reshape(-1, resolution)
+    timeline = pd.DataFrame({
+        "Vehicles": bins.max(axis=1),
+        "Average Vehicles": bins.mean(axis=1).round(2),
+    }, index=pd.date_range(origin, periods=len(bins), freq=f"{resolution}min", name="Time"))
+    peak_minute = int(np.argmax(occupancy[:minutes]))
+    return {
+        "timeline": timeline,
+        "peak": int(occupancy[peak_minute]),
+        "peak_at": origin + pd.Timedelta(minutes=peak_minute),
+    }
+
+def window_rows(schedule, window_start, window_end, base_date=None):
+    """Rows of a schedule that overlap [window_start, window_end), with clipped bar ends.
+
+    Rows are found by binary search on start time (widened by the longest
+    job) instead of a scan, so paging through a long horizon stays cheap.
+    Returns the rows with "bar_start"/"bar_end" timestamps added.
+    """
+    start, end = absolute_times(schedule, base_date)
+    window_start, window_end = pd.Timestamp(window_start).to_datetime64(), pd.Timestamp(window_end).to_datetime64()
+    order = np.argsort(start, kind="stable")
+    longest = (end - start).max() if len(start) else np.timedelta64(0, "ns")
+    lo, hi = np.searchsorted(start[order], [window_start - longest, window_end], side="left")
+    candidates = order[lo:hi]
+    candidates = np.sort(candidates[np.maximum(end[candidates], start[candidates] + np.timedelta64(1, "m"))
+                                    > window_start])
+    rows = schedule.iloc[candidates].copy()
+    rows["bar_start"] = np.maximum(start[candidates], window_start)
+    rows["bar_end"] = np.minimum(np.maximum(end[candidates], start[candidates] + np.timedelta64(1, "m")), window_end)
+    return rows
+
+def horizon_bar_trace(rows, lanes, name, color=None):
+    """One batched horizontal bar trace of window rows (from window_rows) drawn in the given lanes"""
+    bar_start = rows["bar_start"].to_numpy()
+    bar_end = rows["bar_end"].to_numpy()
+    return go.Bar(
+        orientation='h', y=np.asarray(lanes), base=bar_start,
+        # Widths on a date axis are milliseconds
+        x=(bar_end - bar_start) / np.timedelta64(1, "ms"),
+        name=name, marker_color=color,
+        customdata=bar_customdata(rows),
+        hovertemplate="Vehicle %{customdata[0]} (%{customdata[1]})<br>%{customdata[2]} – %{customdata[3]}<extra>%{fullData.name}</extra>"
+    )
+
+def bar_customdata(rows):
+    """Hover fields of window rows: vehicle, vehicle type, start and end"""
+    return np.column_stack([
+        rows["vehicle"], rows["vehicle_type"],
+        pd.DatetimeIndex(rows["bar_start"]).strftime("%a %d %b %H:%M"),
+        pd.DatetimeIndex(rows["bar_end"]).strftime("%a %d %b %H:%M"),
+    ])
+
+def set_lane_height(fig, n_lanes):
+    """Size a lane-packed Gantt to its lane count, up to GANTT_MAX_HEIGHT"""
+    fig.update_layout(height=min(200 + n_lanes * 15, GANTT_MAX_HEIGHT))
+
+def create_horizon_gantt(schedule, window_start, window_end, title, color_by="operation", colors=None,
+                         base_date=None, max_tasks=GANTT_MAX_TASKS):
+    """Gantt chart of one window of a multi-day horizon on a real date axis.
+
+    Only rows overlapping the window are drawn, clipped to it, as batched
+    horizontal bars packed into lanes. Above max_tasks rows the window shows
+    vehicles worked at once per 5 minutes for each colour instead. Returns
+    None when nothing happens in the window.
+    """
+    rows = window_rows(schedule, window_start, window_end, base_date)
+    if rows.empty:
+        return None
+    groups = rows[color_by] if color_by else pd.Series("Vehicle", index=rows.index)
+    if isinstance(colors, dict):
+        palette = colors
+    else:
+        palette = dict(zip(pd.unique(groups), itertools.cycle(colors or DEFAULT_COLORS)))
+
+    fig = go.Figure()
+    if len(rows) > max_tasks:
+        for key, group in rows.groupby(groups, sort=False):
+            occupancy = horizon_occupancy(group, 5, base_date)["timeline"]
+            occupancy = occupancy.loc[pd.Timestamp(window_start):pd.Timestamp(window_end) - pd.Timedelta(minutes=1)]
+            fig.add_trace(go.Scatter(
+                x=occupancy.index, y=occupancy["Vehicles"], name=str(key), mode='lines',
+                line=dict(shape='hv', color=palette.get(key)), fill='tozeroy'
+            ))
+        fig.update_layout(title=f"{title} ({len(rows):,} bars aggregated)", yaxis_title="Vehicles at Once",
+                          height=400)
+    else:
+        lanes = pack_lanes(rows["bar_start"].to_numpy().astype(np.int64), rows["bar_end"].to_numpy().astype(np.int64))
+        for key, idx in rows.groupby(groups, sort=False).indices.items():
+            fig.add_trace(horizon_bar_trace(rows.iloc[idx], lanes[idx], str(key), palette.get(key)))
+        fig.update_layout(title=title, barmode='overlay', bargap=0.3)
+        fig.update_yaxes(showticklabels=False, autorange='reversed')
+        set_lane_height(fig, int(lanes.max()) + 1)
+    fig.update_xaxes(type='date', range=[pd.Timestamp(window_start), pd.Timestamp(window_end)], side='top')
+    return fig
@@ -0,0 +1,206 @@
+"""Smallest window-by-window worker allocation that meets a service target"""
+import numpy as np
+import pandas as pd
+
+from timeline import horizon_minutes
+
+# Work arriving late on the last day can spill into the next one
+SPILL_MINUTES = 1440
+# Relative slack for comparing cumulative sums of work that differ only by rounding
+RELATIVE_TOLERANCE = 1e-9
+
+def _arrival_work(schedule, arrival, horizon):
+    """Worker-minutes of work arriving in each minute, plus each vehicle's FIFO position.
+
+    arrival is each vehicle's minute on the horizon. Vehicles are served
+    first come, first served; prefix_after is the cumulative work queued up
+    to and including each vehicle.
+    """
+    work = schedule["base_hours"].to_numpy(dtype=float) * 60
+    order = np.argsort(arrival, kind="stable")
+    prefix_after = np.cumsum(work[order])
+    per_minute = np.bincount(arrival, weights=work, minlength=horizon)[:horizon]
+    return per_minute, arrival[order], prefix_after
+
+def _served(per_minute, capacity):
+    """Cumulative work done by the end of each minute by a work-conserving pool"""
+    net = np.cumsum(per_minute - capacity)
+    backlog = net - np.minimum(np.minimum.accumulate(net), 0)
+    return np.cumsum(per_minute) - backlog
+
+class _TurnaroundProbe:
+    """Turnaround checks of one window at a time, with the windows before it fixed.
+
+    FIFO fluid condition: for every s <= t, the work arriving in [s, t] fits
+    in the capacity of [s, t + target]. With cumulative arrivals A and
+    capacity C that is A[t] - C[t + T] <= min over s <= t of A[s - 1] - C[s].
+    A window's crew only moves C after the window starts, so each probe
+    checks just the arrivals whose deadline falls inside the window, against
+    a running minimum kept for the fixed minutes before it.
+    """
+
+    def __init__(self, per_minute, target_min):
+        self.arrived = np.cumsum(per_minute)
+        self.before = np.concatenate([[0.0], self.arrived])  # before[x] = work arrived before minute x
+        self.cap = np.zeros(len(per_minute) + 1)  # cap[x] = capacity before minute x
+        self.low = np.zeros(len(per_minute) + 1)  # low[x] = min over s <= x of before[s] - cap[s]
+        self.target_min = target_min
+        self.tolerance = RELATIVE_TOLERANCE * max(self.arrived[-1] if len(self.arrived) else 0.0, 1.0)
+
+    def _cap(self, start, crew, x):
+        return np.where(x <= start, self.cap[np.minimum(x, start)], self.cap[start] + crew * (x - start))
+
+    def ok(self, start, end, crew):
+        """Whether crew workers in [start, end) meet every deadline inside the window"""
+        t = np.arange(max(0, start - self.target_min + 1), end - self.target_min + 1)
+        if not len(t):
+            return True
+        slack = self.low[np.minimum(t, start)]
+        inside = t > start
+        if inside.any():
+            s = t[inside]
+            slack[inside] = np.minimum(slack[inside], np.minimum.accumulate(
+                self.before[s] - self.cap[start] - crew * (s - start)))
+        due = self.arrived[t] - self._cap(start, crew, t + self.target_min)
+        return bool(np.all(due <= slack + self.tolerance))
+
+    def fix(self, start, end, crew):
+        """Commit crew workers to [start, end)"""
+        x = np.arange(start + 1, end + 1)
+        self.cap[x] = self.cap[start] + crew * (x - start)
+        self.low[x] = np.minimum(self.low[start], np.minimum.accumulate(self.before[x] - self.cap[x]))
+
+class _QueueProbe:
+    """Queue-length checks of one window at a time, carrying the backlog from the fixed windows before it"""
+
+    def __init__(self, per_minute, arrivals, prefix_after, max_queue, tolerance):
+        self.per_minute = per_minute
+        self.arrived = np.cumsum(per_minute)
+        self.vehicles = np.searchsorted(arrivals, np.arange(len(per_minute)), side="right")
+        self.prefix_after = prefix_after
+        self.max_queue = max_queue
+        self.tolerance = tolerance
+        self.backlog = 0.0
+
+    def _backlog(self, start, end, crew):
+        # Lindley recursion B[x] = max(0, B[x - 1] + work[x] - crew) from the carried backlog
+        net = self.backlog + np.cumsum(self.per_minute[start:end] - crew)
+        return net - np.minimum(np.minimum.accumulate(net), 0)
+
+    def ok(self, start, end, crew):
+        """Whether crew workers in [start, end) keep at most max_queue vehicles unfinished"""
+        served = self.arrived[start:end] - self._backlog(start, end, crew)
+        arrived = self.vehicles[start:end]
+        finished = np.searchsorted(self.prefix_after, served + self.tolerance, side="right")
+        return bool(np.all(arrived - np.minimum(finished, arrived) <= self.max_queue))
+
+    def fix(self, start, end, crew):
+        """Commit crew workers to [start, end)"""
+        self.backlog = float(self._backlog(start, end, crew)[-1])
+
+def _in_yard(per_minute, capacity, arrivals, prefix_after, tolerance):
+    """Vehicles that have arrived but are not finished, per minute"""
+    served = _served(per_minute, capacity)
+    minutes = np.arange(len(per_minute))
+    arrived = np.searchsorted(arrivals, minutes, side="right")
+    finished = np.searchsorted(prefix_after, served + tolerance, side="right")
+    return arrived - np.minimum(finished, arrived)
+
+def optimize_workforce(schedule, target_hours=None, max_queue=None, window=60, max_crew=20, base_date=None):
+    """Fewest workers per window so that vehicles meet a service target.
+
+    Work is each vehicle's single-worker base_hours, served first come,
+    first served by a pool whose size is fixed within each window (60 for
+    hourly staffing, 480 for 8-hour shifts). The target is a turnaround of
+    at most target_hours from arrival, or at most max_queue vehicles at the
+    hub with unfinished work. Windows are staffed in time order, each by
+    binary search up to max_crew for the smallest pool that keeps every
+    constraint due inside the window; earlier windows are fixed by then, so
+    each probe is a vectorized check of that window (plus the target) only.
+    Windows run from the first arrival day's midnight through every day of
+    the horizon (plain clock times are placed on base_date, as in
+    timeline.absolute_times), plus a day for work spilling past the last.
+
+    Returns {"allocation": DataFrame, "worker_hours": float,
+    "max_turnaround_hours": float, "peak_queue": int, "too_long": int,
+    "origin": Timestamp}, where too_long counts vehicles that would exceed
+    the target even with a crew of max_crew to themselves.
+    """
+    if (target_hours is None) == (max_queue is None):
+        raise ValueError("give exactly one of target_hours or max_queue")
+    if window < 1 or 1440 % window:
+        raise ValueError(f"window must divide a day into whole windows, got {window} minutes")
+
+    origin, arrival, minutes = horizon_minutes(schedule, base_date)
+    horizon = minutes + SPILL_MINUTES
+    if target_hours is not None:
+        # Deadlines must fall inside the horizon; longer targets act as a day
+        target_min = min(max(int(round(target_hours * 60)), 1), SPILL_MINUTES)
+    per_minute, arrivals, prefix_after = _arrival_work(schedule, arrival, horizon)
+    staff = np.zeros(horizon // window, dtype=np.int64)
+    total = per_minute.sum()
+    tolerance = RELATIVE_TOLERANCE * max(total, 1.0)
+    if target_hours is not None:
+        probe = _TurnaroundProbe(per_minute, target_min)
+    else:
+        probe = _QueueProbe(per_minute, arrivals, prefix_after, max_queue, tolerance)
+    arrived = np.cumsum(per_minute)
+
+    for w in range(len(staff)):
+        start, end = w * window, (w + 1) * window
+        if arrived[end - 1] > 0:
+            # A window no crew up to max_crew can satisfy gets max_crew
+            lo, hi = 0, max_crew
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if probe.ok(start, end, mid):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            staff[w] = lo
+        probe.fix(start, end, staff[w])
+
+    if max_queue is not None and len(arrivals):
+        # A queue bound alone never forces the last vehicles out; clear them
+        # with the lowest flat staffing over the windows after the last arrival
+        tail = arrivals[-1] // window + 1
+        floor = staff[tail:].copy()
+        lo, hi = 0, max_crew
+        while lo < hi:
+            staff[tail:] = np.maximum(floor, (lo + hi) // 2)
+            if _served(per_minute, np.repeat(staff, window).astype(float))[-1] >= total - tolerance:
+                hi = (lo + hi) // 2
+            else:
+                lo = (lo + hi) // 2 + 1
+        staff[tail:] = np.maximum(floor, lo)
+
+    # Nobody is needed once all the work is done
+    served = _served(per_minute, np.repeat(staff, window).astype(float))
+    done_at = np.searchsorted(served, total - tolerance, side="left")
+    staff[done_at // window + 1:] = 0
+
+    capacity = np.repeat(staff, window).astype(float)
+    served = _served(per_minute, capacity)
+    finish = np.searchsorted(served, prefix_after - tolerance, side="left") + 1
+    turnaround = (finish - arrivals) / 60
+    in_yard = _in_yard(per_minute, capacity, arrivals, prefix_after, tolerance)
+    too_long = 0
+    if target_hours is not None:
+        too_long = int(np.sum(schedule["base_hours"].to_numpy() / max_crew > target_hours))
+
+    used = np.flatnonzero(staff)
+    last = used[-1] + 1 if len(used) else 0
+    starts = np.arange(last) * window
+    allocation = pd.DataFrame({
+        "Window": (origin + pd.to_timedelta(starts, unit="min")).strftime("%a %d %b %H:%M"),
+        "Start Minute": starts,
+        "Workers": staff[:last],
+    })
+    return {
+        "allocation": allocation,
+        "worker_hours": float(staff.sum() * window / 60),
+        "max_turnaround_hours": float(turnaround.max()) if len(turnaround) else 0.0,
+        "peak_queue": int(in_yard.max()) if len(in_yard) else 0,
+        "too_long": too_long,
+        "origin": origin,
+    }